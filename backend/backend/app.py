@@ -1,10 +1,11 @@
 import os
 import logging
-from flask import Flask, render_template, redirect, url_for, jsonify
+from flask import Flask, render_template, redirect, url_for, jsonify, g, request
 from flask_jwt_extended import JWTManager
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_cors import CORS, cross_origin
 from flasgger import Swagger
+from mysql.connector.errors import PoolError
 
 from .config import Config
 from .utils.logger import setup_logging
@@ -90,6 +91,20 @@ def create_app():
     # Initialize background task manager
     app.background_tasks = BackgroundTaskManager()
     
+    # One pooled database connection per API request, shared by every repository
+    # call and checked out only once the request first touches the database
+    @app.before_request
+    def checkout_db_connection():
+        if request.path.startswith('/api/'):
+            g.db_connection = db_manager.connection(lazy=True)
+            g.db_connection.__enter__()
+    
+    @app.teardown_request
+    def release_db_connection(exc):
+        db_connection = g.pop('db_connection', None)
+        if db_connection is not None:
+            db_connection.__exit__(None, None, None)
+    
     # Main routes
     @app.route('/')
     def index():
@@ -151,6 +166,12 @@ def create_app():
         logging.error(f"Internal server error: {error}")
         return {'error': 'Internal server error'}, 500
     
+    @app.errorhandler(PoolError)
+    def database_busy(error):
+        """Handle an exhausted database connection pool."""
+        logging.error(f"Database connection pool exhausted: {error}")
+        return {'error': 'Database is busy, please retry'}, 503
+    
     # JWT error handlers
     @jwt.expired_token_loader
     @cross_origin()
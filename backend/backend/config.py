@@ -16,6 +16,12 @@ class Config:
     # Database configuration
     DATABASE_PATH = os.environ.get('DATABASE_PATH') or 'email_automation.db'
     
+    # Raw message store configuration
+    RAW_STORE_BACKEND = os.environ.get('RAW_STORE_BACKEND', 'filesystem')
+    RAW_STORE_PATH = os.environ.get('RAW_STORE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_store')  # not relative to the working directory
+    RAW_STORE_COMPRESSION = os.environ.get('RAW_STORE_COMPRESSION', 'zstd')  # zstd (if installed) or gzip
+    RAW_STORE_DELETE_GRACE = int(os.environ.get('RAW_STORE_DELETE_GRACE', 120))  # seconds a just-(re)stored blob survives deletion of its last email
+    
     # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -25,6 +31,29 @@ class Config:
     
     # Background task configuration
     BACKGROUND_TASK_INTERVAL = int(os.environ.get('BACKGROUND_TASK_INTERVAL', 30))  # 30 seconds for debug
+    SYNC_MIN_INTERVAL = int(os.environ.get('SYNC_MIN_INTERVAL', BACKGROUND_TASK_INTERVAL))  # fastest fetch cadence for busy accounts
+    SYNC_MAX_INTERVAL = int(os.environ.get('SYNC_MAX_INTERVAL', 1800))  # slowest fetch cadence for dormant accounts
+    SYNC_TARGET_EMAILS_PER_FETCH = float(os.environ.get('SYNC_TARGET_EMAILS_PER_FETCH', 1))  # new emails expected per fetch at the adapted interval
+    SYNC_READ_STATUS_INTERVAL = int(os.environ.get('SYNC_READ_STATUS_INTERVAL', 300))  # seconds between read status syncs per account
+    SYNC_JITTER = float(os.environ.get('SYNC_JITTER', 0.1))  # +/- fraction applied to every per-account interval
+    SYNC_LEASES_ENABLED = os.environ.get('SYNC_LEASES_ENABLED', 'true').lower() == 'true'  # shard accounts across sync workers through account_leases
+    SYNC_LEASE_TTL = int(os.environ.get('SYNC_LEASE_TTL', 60))  # seconds before a dead worker's accounts are taken over
+    SYNC_LEASE_HEARTBEAT_INTERVAL = int(os.environ.get('SYNC_LEASE_HEARTBEAT_INTERVAL', 15))  # seconds between lease renewals and rebalancing
+    SYNC_SHUTDOWN_TIMEOUT = int(os.environ.get('SYNC_SHUTDOWN_TIMEOUT', 60))  # seconds a stopping worker waits for accounts being synced
+    
+    # IMAP sync configuration
+    IMAP_FETCH_CHUNK_SIZE = int(os.environ.get('IMAP_FETCH_CHUNK_SIZE', 50))  # messages per UID FETCH
+    IMAP_FETCH_CHUNK_BYTES = int(os.environ.get('IMAP_FETCH_CHUNK_BYTES', 10 * 1024 * 1024))  # message bytes per UID FETCH; larger messages are fetched alone
+    IMAP_TIMEOUT = int(os.environ.get('IMAP_TIMEOUT', 30))  # socket timeout in seconds
+    SYNC_MAX_WORKERS = int(os.environ.get('SYNC_MAX_WORKERS', 10))  # accounts synced concurrently
+    SYNC_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('SYNC_MAX_CONNECTIONS_PER_HOST', 4))
+    SYNC_ACCOUNT_TIMEOUT = int(os.environ.get('SYNC_ACCOUNT_TIMEOUT', 120))  # seconds per account
+    IMAP_KEEPALIVE_INTERVAL = int(os.environ.get('IMAP_KEEPALIVE_INTERVAL', 240))  # NOOP idle sessions after this
+    IMAP_SESSION_MAX_IDLE = int(os.environ.get('IMAP_SESSION_MAX_IDLE', 1800))  # log out unused sessions after this
+    IMAP_RECONNECT_MAX_BACKOFF = int(os.environ.get('IMAP_RECONNECT_MAX_BACKOFF', 300))  # seconds
+    IMAP_IDLE_ENABLED = os.environ.get('IMAP_IDLE_ENABLED', 'true').lower() == 'true'
+    IMAP_IDLE_TIMEOUT = int(os.environ.get('IMAP_IDLE_TIMEOUT', 1500))  # re-issue IDLE before the 29 min server limit
+    IMAP_IDLE_SAFETY_INTERVAL = int(os.environ.get('IMAP_IDLE_SAFETY_INTERVAL', 600))  # full poll even for idling accounts
     
     # CORS configuration
     CORS_ORIGINS = [
@@ -38,8 +67,26 @@ class Config:
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'email_automation.log')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    PERSISTENCE_TRACE_ALL = os.environ.get('PERSISTENCE_TRACE_ALL', 'false').lower() == 'true'
+    PERSISTENCE_TRACE_ACCOUNTS = os.environ.get('PERSISTENCE_TRACE_ACCOUNTS', '')  # comma-separated account emails
+    PERSISTENCE_TRACE_EMAIL_IDS = os.environ.get('PERSISTENCE_TRACE_EMAIL_IDS', '')  # comma-separated email ids
+    PERSISTENCE_TRACE_SAMPLE_RATE = float(os.environ.get('PERSISTENCE_TRACE_SAMPLE_RATE', 1.0))  # fraction of matching writes
 
     MYSQL_HOST = 'localhost'
     MYSQL_USER = 'root'
     MYSQL_PASSWORD = 'Root@123'
-    MYSQL_DB = 'EmailAutomation' 
\ No newline at end of file
+    MYSQL_DB = 'EmailAutomation' 
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 20))  # max open connections per process
+    MYSQL_POOL_TIMEOUT = int(os.environ.get('MYSQL_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+    MYSQL_POOL_PING_INTERVAL = int(os.environ.get('MYSQL_POOL_PING_INTERVAL', 30))  # ping connections idle longer than this
+    MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE', 3600))  # reopen connections older than this
+    DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE', 100))  # rows per multi-row INSERT
+    EMAIL_COUNT_CACHE_TTL = int(os.environ.get('EMAIL_COUNT_CACHE_TTL', 30))  # seconds an email list total is reused; 0 disables
+    SEARCH_MIN_TOKEN_SIZE = int(os.environ.get('SEARCH_MIN_TOKEN_SIZE', 3))  # innodb_ft_min_token_size; shorter words are matched with LIKE
+    COUNTER_RECONCILE_INTERVAL = int(os.environ.get('COUNTER_RECONCILE_INTERVAL', 3600))  # seconds between email_counters rebuilds; 0 disables
+    SYSTEM_METRICS_CACHE_TTL = int(os.environ.get('SYSTEM_METRICS_CACHE_TTL', 10))  # seconds admin dashboard totals are reused
+    CATEGORY_RULES_RELOAD_INTERVAL = int(os.environ.get('CATEGORY_RULES_RELOAD_INTERVAL', 30))  # seconds between checks for a newer stored rule set
+    RECATEGORIZE_CHUNK_SIZE = int(os.environ.get('RECATEGORIZE_CHUNK_SIZE', 500))  # emails read and updated per re-categorization step
+    RECATEGORIZE_MAX_WRITES_PER_SEC = int(os.environ.get('RECATEGORIZE_MAX_WRITES_PER_SEC', 1000))  # email rows re-categorization may update per second; 0 disables the limit
+    FETCH_JOB_HISTORY = int(os.environ.get('FETCH_JOB_HISTORY', 50))  # finished manual fetch jobs kept for status polling
+    ACCOUNT_HEALTH_TTL = int(os.environ.get('ACCOUNT_HEALTH_TTL', 60))  # seconds an account connectivity check result is reused
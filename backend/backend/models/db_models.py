@@ -3,21 +3,101 @@ from typing import Optional, List, Dict
 import mysql.connector
 from mysql.connector import Error
 from dataclasses import dataclass, field
-from .email_models import EmailAccount, Email
+from .email_models import EmailAccount, Email, EmailSummary, make_snippet
 from .user_models import User
+from .db_pool import ConnectionPool
+from .migrations import apply_migrations, get_migration_status, EMAIL_COUNTERS_SELECT
+from .email_search import build_search_sql
+from ..utils.persistence_trace import persistence_trace
+from ..services.raw_store import raw_store
 from email.utils import parsedate_to_datetime
 import json
+import base64
+import threading
+import time
 from ..config import Config
 import logging
 
+# Column order shared by save_email and save_emails_batch
+EMAIL_COLUMNS = (
+    'id', 'account_email', 'subject', 'sender', 'date', 'body', 'raw_data', 'category',
+    'main_category', 'sub_category', 'is_read', 'is_starred', 'is_archived', 'is_spam', 'is_trashed',
+    'folder', 'tags', 'metadata', 'created_at', 'email_hash', 'verification_hash', 'message_id', 'imap_uid',
+    'raw_ref', 'snippet', 'rules_version'
+)
+EMAIL_ROW_PLACEHOLDERS = '(' + ', '.join(['%s'] * len(EMAIL_COLUMNS)) + ')'
+EMAIL_UPSERT_UPDATES = '''
+    is_read=VALUES(is_read),
+    category=VALUES(category),
+    main_category=VALUES(main_category),
+    sub_category=VALUES(sub_category),
+    is_starred=VALUES(is_starred),
+    is_archived=VALUES(is_archived),
+    is_spam=VALUES(is_spam),
+    is_trashed=VALUES(is_trashed),
+    folder=VALUES(folder),
+    tags=VALUES(tags),
+    metadata=VALUES(metadata),
+    created_at=VALUES(created_at),
+    email_hash=VALUES(email_hash),
+    verification_hash=VALUES(verification_hash),
+    message_id=VALUES(message_id),
+    imap_uid=COALESCE(VALUES(imap_uid), imap_uid),
+    raw_ref=COALESCE(VALUES(raw_ref), raw_ref),
+    snippet=COALESCE(snippet, VALUES(snippet)),
+    rules_version=COALESCE(VALUES(rules_version), rules_version)
+'''
+
+# List projection: EmailSummary columns only; rows saved before snippets
+# existed get a bounded body prefix to build one from
+EMAIL_SUMMARY_SELECT = '''
+    id, account_email, subject, sender, date, category, main_category, sub_category,
+    is_read, is_starred, is_archived, is_spam, is_trashed, folder, tags, created_at,
+    snippet, IF(snippet IS NULL, LEFT(body, 640), NULL) AS body_prefix
+'''
+
+# job_checkpoints row and MySQL named lock of reconcile_email_counters
+COUNTER_RECONCILE_JOB = 'reconcile_email_counters'
+
+def encode_email_cursor(date: Optional[datetime], email_id: str) -> str:
+    """Opaque list cursor pointing just after the email with this (date, id)."""
+    value = json.dumps([date.isoformat() if date else None, str(email_id)])
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_email_cursor(token: str) -> (Optional[datetime], str):
+    """
+    Decode a cursor made by encode_email_cursor.
+    
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_value, email_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (datetime.fromisoformat(date_value) if date_value else None), str(email_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
 class DatabaseManager:
     """Simple MySQL database manager for storing email accounts and emails."""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.pool = ConnectionPool(
+            self._connect,
+            size=Config.MYSQL_POOL_SIZE,
+            timeout=Config.MYSQL_POOL_TIMEOUT,
+            ping_interval=Config.MYSQL_POOL_PING_INTERVAL,
+            recycle=Config.MYSQL_POOL_RECYCLE
+        )
+        # (where_sql, params) -> (expires_at, total) for list page totals
+        self._count_cache = {}
+        self._count_cache_lock = threading.Lock()
+        # (expires_at, metrics) from get_system_metrics
+        self._metrics_cache = None
         self.init_database()
     
-    def get_connection(self):
+    def _connect(self):
         return mysql.connector.connect(
             host=Config.MYSQL_HOST,
             user=Config.MYSQL_USER,
@@ -25,6 +105,41 @@ class DatabaseManager:
             database=Config.MYSQL_DB
         )
     
+    def get_connection(self):
+        """Check out a pooled connection; conn.close() returns it to the pool."""
+        return self.pool.get()
+    
+    def connection(self, lazy: bool = False):
+        """
+        Context manager holding one pooled connection for the current thread.
+        
+        DatabaseManager calls made inside the block share it, e.g.:
+        
+            with db_manager.connection():
+                for email in emails:
+                    if not db_manager.email_exists(email.message_id):
+                        db_manager.save_email(email)
+        
+        With lazy=True the connection is checked out on the first call.
+        """
+        return self.pool.connection(lazy)
+    
+    def release_connection(self):
+        """Return the connection shared by the current connection() block before slow non-database work."""
+        self.pool.release_shared()
+    
+    def get_pool_status(self) -> dict:
+        """Get connection pool usage and counters."""
+        return self.pool.get_status()
+    
+    def get_schema_status(self) -> List[Dict]:
+        """Get every schema migration with whether and when it was applied."""
+        conn = self.get_connection()
+        try:
+            return get_migration_status(conn)
+        finally:
+            conn.close()
+    
     def init_database(self):
         """Initialize database tables."""
         try:
@@ -44,7 +159,9 @@ class DatabaseManager:
                     last_checked DATETIME,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                     last_fetched_uid INT DEFAULT 0,
-                    last_fetched_date DATETIME
+                    last_fetched_date DATETIME,
+                    uid_validity BIGINT,
+                    highest_modseq BIGINT
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             ''')
             
@@ -73,6 +190,10 @@ class DatabaseManager:
                     email_hash VARCHAR(255),
                     verification_hash VARCHAR(255),
                     message_id VARCHAR(255),
+                    imap_uid BIGINT,
+                    raw_ref VARCHAR(80),
+                    snippet VARCHAR(255),
+                    rules_version INT,
                     FOREIGN KEY (account_email) REFERENCES email_accounts (email)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             ''')
@@ -107,27 +228,10 @@ class DatabaseManager:
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             ''')
             
-            # Create indexes for better performance
-            try:
-                cursor.execute('CREATE INDEX idx_emails_account ON emails(account_email)')
-            except Exception as e:
-                if 'Duplicate key name' not in str(e):
-                    raise
-            try:
-                cursor.execute('CREATE INDEX idx_emails_category ON emails(category)')
-            except Exception as e:
-                if 'Duplicate key name' not in str(e):
-                    raise
-            try:
-                cursor.execute('CREATE INDEX idx_emails_date ON emails(date)')
-            except Exception as e:
-                if 'Duplicate key name' not in str(e):
-                    raise
-            try:
-                cursor.execute('CREATE INDEX idx_emails_message_id ON emails(message_id)')
-            except Exception as e:
-                if 'Duplicate key name' not in str(e):
-                    raise
+            # Columns and indexes added since the tables above were first created
+            applied = apply_migrations(conn)
+            if applied:
+                self.logger.info(f"Applied schema migrations: {applied}")
             
             conn.commit()
             conn.close()
@@ -199,7 +303,9 @@ class DatabaseManager:
                     last_checked=row[7],  # Direct use of datetime or None
                     created_at=row[8] or datetime.now(),  # Direct use, fallback to now
                     last_fetched_uid=row[9] if row[9] is not None else 0,
-                    last_fetched_date=row[10]  # Direct use of datetime or None
+                    last_fetched_date=row[10],  # Direct use of datetime or None
+                    uid_validity=row[11] if len(row) > 11 else None,
+                    highest_modseq=row[12] if len(row) > 12 else None
                 )
                 accounts.append(account)
             return accounts
@@ -227,7 +333,9 @@ class DatabaseManager:
                     last_checked=row[7],  # Direct use of datetime or None
                     created_at=row[8] or datetime.now(),  # Direct use, fallback to now
                     last_fetched_uid=row[9] if row[9] is not None else 0,
-                    last_fetched_date=row[10]  # Direct use of datetime or None
+                    last_fetched_date=row[10],  # Direct use of datetime or None
+                    uid_validity=row[11] if len(row) > 11 else None,
+                    highest_modseq=row[12] if len(row) > 12 else None
                 )
                 return account
             return None
@@ -250,6 +358,11 @@ class DatabaseManager:
                 conn.close()
                 return False
             
+            cursor.execute('''
+                SELECT DISTINCT raw_ref FROM emails WHERE account_email = %s AND raw_ref IS NOT NULL
+            ''', (email,))
+            raw_refs = [row[0] for row in cursor.fetchall()]
+            
             # Delete child records first (emails) to avoid foreign key constraint
             cursor.execute('DELETE FROM emails WHERE account_email = %s', (email,))
             deleted_emails = cursor.rowcount
@@ -260,6 +373,7 @@ class DatabaseManager:
             deleted_accounts = cursor.rowcount
             
             conn.commit()
+            self._delete_unreferenced_raw(cursor, raw_refs)
             conn.close()
             
             if deleted_accounts > 0:
@@ -274,71 +388,274 @@ class DatabaseManager:
             return False
 
     def delete_email(self, email_id: str) -> bool:
-        """Permanently delete an email by ID."""
+        """Permanently delete an email by ID, with its raw source unless another email shares it."""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            cursor.execute('SELECT raw_ref FROM emails WHERE id = %s AND raw_ref IS NOT NULL', (email_id,))
+            raw_refs = [row[0] for row in cursor.fetchall()]
             cursor.execute('DELETE FROM emails WHERE id = %s', (email_id,))
-            conn.commit()
             deleted = cursor.rowcount
+            conn.commit()
+            self._delete_unreferenced_raw(cursor, raw_refs)
             conn.close()
             return deleted > 0
         except Exception as e:
             self.logger.error(f"Failed to delete email: {str(e)}")
             return False
     
+    def _delete_unreferenced_raw(self, cursor, raw_refs: List[str], chunk_size: int = 1000):
+        """
+        Remove raw message blobs of deleted emails that no remaining email references.
+        
+        Blobs are content-addressed, so identical messages (e.g. the same mail
+        in two accounts) share one; it goes with the last email using it.
+        Failures are logged, not raised: the emails are already deleted.
+        """
+        raw_refs = list(dict.fromkeys(raw_refs))
+        try:
+            referenced = set()
+            for i in range(0, len(raw_refs), chunk_size):
+                chunk = raw_refs[i:i + chunk_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'SELECT DISTINCT raw_ref FROM emails WHERE raw_ref IN ({placeholders})', chunk)
+                referenced.update(row[0] for row in cursor.fetchall())
+            kept = 0
+            for raw_ref in raw_refs:
+                if raw_ref not in referenced and not raw_store.delete(raw_ref):
+                    kept += 1
+            if kept:
+                self.logger.info(f"Kept {kept} raw message blobs stored again within the deletion grace period")
+        except Exception as e:
+            self.logger.error(f"Failed to delete raw message blobs: {str(e)}")
+    
+    def _email_filter_sql(self, filters: dict, accounts: List[str] = None) -> (str, dict):
+        """
+        Build the WHERE clause shared by the email list queries.
+        
+        Args:
+            filters: List filters (category, account, search, main_category,
+                sub_category and is_* flags)
+            accounts: Restrict to these account emails (access control)
+            
+        Returns:
+            (where_sql, params) with named parameters; where_sql is '' without filters
+        """
+        where_clauses = []
+        params = {}
+        
+        if accounts is not None:
+            placeholders = []
+            for i, account_email in enumerate(accounts):
+                params[f'access_{i}'] = account_email
+                placeholders.append(f'%(access_{i})s')
+            where_clauses.append(f"account_email IN ({', '.join(placeholders)})")
+        
+        if 'category' in filters and filters['category']:
+            if filters['category'] == 'unread':
+                where_clauses.append("is_read = 0")
+            elif filters['category'] != 'all':
+                where_clauses.append("category = %(category)s")
+                params['category'] = filters['category']
+        
+        if 'account' in filters and filters['account']:
+            where_clauses.append("account_email = %(account)s")
+            params['account'] = filters['account']
+        
+        if 'search' in filters and filters['search']:
+            search_clauses, search_params, _ = build_search_sql(filters['search'])
+            where_clauses.extend(search_clauses)
+            params.update(search_params)
+        
+        if 'main_category' in filters and filters['main_category']:
+            where_clauses.append("main_category = %(main_category)s")
+            params['main_category'] = filters['main_category']
+        
+        if 'sub_category' in filters and filters['sub_category']:
+            where_clauses.append("sub_category = %(sub_category)s")
+            params['sub_category'] = filters['sub_category']
+        
+        # Handle boolean filters (convert to int for MySQL)
+        for bool_key in ['is_trashed', 'is_starred', 'is_read', 'is_archived', 'is_spam']:
+            if bool_key in filters:
+                where_clauses.append(f"{bool_key} = %({bool_key})s")
+                params[bool_key] = int(filters[bool_key]) if isinstance(filters[bool_key], bool) else filters[bool_key]
+        
+        where_sql = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+        return where_sql, params
+    
+    def _accessible_accounts(self, cursor, user_id: int) -> List[str]:
+        """Account emails a user has been granted access to (dictionary cursor)."""
+        cursor.execute('SELECT account_email FROM user_email_access WHERE user_id = %s', (user_id,))
+        return [row['account_email'] for row in cursor.fetchall()]
+    
+    def _count_emails(self, cursor, where_sql: str, params: dict) -> int:
+        """
+        COUNT(*) for a list filter, reused for EMAIL_COUNT_CACHE_TTL seconds.
+        
+        Paging through one filtered list then counts it once instead of once
+        per page; the total may lag new mail by up to the TTL.
+        """
+        key = (where_sql, tuple(sorted((k, str(v)) for k, v in params.items())))
+        now = time.monotonic()
+        with self._count_cache_lock:
+            cached = self._count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        cursor.execute("SELECT COUNT(*) as total FROM emails" + where_sql, params)
+        total = cursor.fetchone()['total']
+        
+        if Config.EMAIL_COUNT_CACHE_TTL > 0:
+            with self._count_cache_lock:
+                if len(self._count_cache) >= 1024:
+                    self._count_cache = {k: v for k, v in self._count_cache.items() if v[0] > now}
+                self._count_cache[key] = (now + Config.EMAIL_COUNT_CACHE_TTL, total)
+        return total
+    
+    def get_email_page(self, filters: dict = {}, per_page: int = 20, cursor: str = None,
+                       user_id: int = None, summary: bool = True) -> (List[Email], int, Optional[str]):
+        """
+        Get one page of emails, newest first, by keyset pagination on (date, id).
+        
+        Each page seeks past the last row of the previous one through the
+        (date, id) index, so deep pages cost the same as the first. Emails
+        without a date come after all dated ones, ordered by id.
+        
+        Args:
+            filters: See _email_filter_sql
+            per_page: Emails per page
+            cursor: next_cursor of the previous page; None for the first page
+            user_id: Restrict to the accounts this user has access to
+            summary: Return EmailSummary rows (list columns and snippet, no body)
+        
+        Returns:
+            (emails, total, next_cursor); total is cached (see _count_emails)
+            and next_cursor is None on the last page
+        
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        seek = decode_email_cursor(cursor) if cursor else None
+        try:
+            conn = self.get_connection()
+            db_cursor = conn.cursor(dictionary=True)
+            
+            accounts = None
+            if user_id is not None:
+                accounts = self._accessible_accounts(db_cursor, user_id)
+                if not accounts:
+                    conn.close()
+                    return [], 0, None
+            
+            where_sql, params = self._email_filter_sql(filters, accounts=accounts)
+            total = self._count_emails(db_cursor, where_sql, params)
+            
+            # Dated rows first, then the NULL-date tail (last in DESC order) as
+            # its own query: an OR across "date IS NULL" would keep MySQL from
+            # seeking the (date, id) index as a single range
+            columns = EMAIL_SUMMARY_SELECT if summary else "*"
+            where_sql = where_sql + " AND " if where_sql else " WHERE "
+            # One extra row tells whether another page follows
+            limit = per_page + 1
+            rows = []
+            if seek:
+                params['cursor_id'] = seek[1]
+            if not seek or seek[0] is not None:
+                if seek:
+                    params['cursor_date'] = seek[0]
+                    seek_sql = "date <= %(cursor_date)s AND (date < %(cursor_date)s OR id < %(cursor_id)s)"
+                else:
+                    seek_sql = "date IS NOT NULL"
+                params['limit'] = limit
+                db_cursor.execute(f"SELECT {columns} FROM emails{where_sql}{seek_sql} "
+                                  f"ORDER BY date DESC, id DESC LIMIT %(limit)s", params)
+                rows = db_cursor.fetchall()
+            if len(rows) < limit:
+                seek_sql = "date IS NULL AND id < %(cursor_id)s" if seek and seek[0] is None else "date IS NULL"
+                params['limit'] = limit - len(rows)
+                db_cursor.execute(f"SELECT {columns} FROM emails{where_sql}{seek_sql} "
+                                  f"ORDER BY id DESC LIMIT %(limit)s", params)
+                rows += db_cursor.fetchall()
+            conn.close()
+            
+            next_cursor = None
+            if len(rows) > per_page:
+                rows = rows[:per_page]
+                next_cursor = encode_email_cursor(rows[-1]['date'], rows[-1]['id'])
+            
+            if summary:
+                return [EmailSummary.from_row(row) for row in rows], total, next_cursor
+            return [Email.from_dict(row) for row in rows], total, next_cursor
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get email page: {str(e)}")
+            return [], 0, None
+
+    def search_emails(self, query: str, page: int = 1, per_page: int = 20, filters: dict = {},
+                      user_id: int = None) -> (List[tuple], int):
+        """
+        Full-text search ranked by relevance.
+        
+        Args:
+            query: Search text (see email_search.parse_search for the syntax)
+            page: 1-based page number
+            per_page: Results per page
+            filters: Additional list filters, see _email_filter_sql
+            user_id: Restrict to the accounts this user has access to
+            
+        Returns:
+            ([(EmailSummary, score), ...], total), best matches first
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            accounts = None
+            if user_id is not None:
+                accounts = self._accessible_accounts(cursor, user_id)
+                if not accounts:
+                    conn.close()
+                    return [], 0
+            
+            where_sql, params = self._email_filter_sql(
+                {key: value for key, value in filters.items() if key != 'search'}, accounts=accounts)
+            search_clauses, search_params, score_sql = build_search_sql(query)
+            if not search_clauses:
+                conn.close()
+                return [], 0
+            where_sql = (where_sql + " AND " if where_sql else " WHERE ") + " AND ".join(search_clauses)
+            params.update(search_params)
+            
+            total = self._count_emails(cursor, where_sql, params)
+            
+            params['limit'] = per_page
+            params['offset'] = (page - 1) * per_page
+            cursor.execute(f"SELECT {EMAIL_SUMMARY_SELECT}, {score_sql} AS score FROM emails{where_sql} "
+                           "ORDER BY score DESC, date DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s", params)
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [(EmailSummary.from_row(row), float(row['score'] or 0)) for row in rows], total
+            
+        except Exception as e:
+            self.logger.error(f"Failed to search emails: {str(e)}")
+            return [], 0
+    
     def get_all_emails(self, filters: dict = {}) -> (List[Email], int):
         """Get all emails from the database with optional filters."""
         try:
             conn = self.get_connection()
             cursor = conn.cursor(dictionary=True)
-
-            query = "SELECT * FROM emails"
-            count_query = "SELECT COUNT(*) as total FROM emails"
-            where_clauses = []
-            params = {}
-
-            if 'category' in filters and filters['category']:
-                if filters['category'] == 'unread':
-                    where_clauses.append("is_read = 0")
-                elif filters['category'] != 'all':
-                    where_clauses.append("category = %(category)s")
-                    params['category'] = filters['category']
-            
-            if 'account' in filters and filters['account']:
-                where_clauses.append("account_email = %(account)s")
-                params['account'] = filters['account']
-
-            if 'search' in filters and filters['search']:
-                where_clauses.append("(subject LIKE %(search)s OR sender LIKE %(search)s)")
-                params['search'] = f"%{filters['search']}%"
-
-            if 'main_category' in filters and filters['main_category']:
-                where_clauses.append("main_category = %(main_category)s")
-                params['main_category'] = filters['main_category']
-
-            if 'sub_category' in filters and filters['sub_category']:
-                where_clauses.append("sub_category = %(sub_category)s")
-                params['sub_category'] = filters['sub_category']
-
-            # Handle boolean filters (convert to int for MySQL)
-            for bool_key in ['is_trashed', 'is_starred', 'is_read', 'is_archived', 'is_spam']:
-                if bool_key in filters:
-                    where_clauses.append(f"{bool_key} = %({bool_key})s")
-                    params[bool_key] = int(filters[bool_key]) if isinstance(filters[bool_key], bool) else filters[bool_key]
-
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-                count_query += " WHERE " + " AND ".join(where_clauses)
-
-            query += " ORDER BY date DESC"
-
+            
+            where_sql, params = self._email_filter_sql(filters)
+            
             # Get total count
-            cursor.execute(count_query, params)
+            cursor.execute("SELECT COUNT(*) as total FROM emails" + where_sql, params)
             total = cursor.fetchone()['total']
-
+            
             # Get all emails
-            cursor.execute(query, params)
+            cursor.execute("SELECT * FROM emails" + where_sql + " ORDER BY date DESC", params)
             rows = cursor.fetchall()
             
             conn.close()
@@ -408,172 +725,510 @@ class DatabaseManager:
                 conn.close()
                 return False
             
-            # Ensure date and created_at are datetime objects
-            self.logger.debug(f"Input email.date: {email.date} (type: {type(email.date)})")
-            date_val = self._ensure_datetime(email.date)
-            if not isinstance(date_val, datetime):
-                self.logger.error(f"date_val is not datetime, got {type(date_val)}: {date_val}")
-                date_val = datetime.now()
-            created_at_val = self._ensure_datetime(getattr(email, 'created_at', datetime.now()))
-            if not isinstance(created_at_val, datetime):
-                self.logger.error(f"created_at_val is not datetime, got {type(created_at_val)}: {created_at_val}")
-                created_at_val = datetime.now()
-            # Ensure all fields are not None
-            subject = email.subject if email.subject is not None else ''
-            sender = email.sender if email.sender is not None else ''
-            body = email.body if email.body is not None else ''
-            raw_data = email.raw_data if email.raw_data is not None else ''
-            category = email.category if email.category is not None else 'general'
-            main_category = email.main_category if email.main_category is not None else 'general'
-            sub_category = email.sub_category if email.sub_category is not None else 'general'
-            tags = email.tags if isinstance(email.tags, list) else []
-            metadata = email.metadata if isinstance(email.metadata, dict) else {}
-            email_hash = email.email_hash if email.email_hash is not None else ''
-            verification_hash = email.verification_hash if email.verification_hash is not None else ''
-            message_id = email.message_id if email.message_id is not None else ''
-            # Ensure id is always a plain string
-            if isinstance(email.id, bytes):
-                email_id = email.id.decode('utf-8')
-            elif isinstance(email.id, str) and email.id.startswith("b'") and email.id.endswith("'"):
-                email_id = email.id[2:-1]
-            else:
-                email_id = str(email.id)
-            self.logger.info(f"[DEBUG] id (cleaned): {email_id} ({type(email_id)})")
-            # Log all field types and values before insert
-            self.logger.info(f"[DEBUG] account_email: {email.account_email} ({type(email.account_email)})")
-            self.logger.info(f"[DEBUG] subject: {subject} ({type(subject)})")
-            self.logger.info(f"[DEBUG] sender: {sender} ({type(sender)})")
-            self.logger.info(f"[DEBUG] date_val: {date_val} ({type(date_val)})")
-            self.logger.info(f"[DEBUG] body: {body} ({type(body)})")
-            self.logger.info(f"[DEBUG] raw_data: {raw_data} ({type(raw_data)})")
-            self.logger.info(f"[DEBUG] category: {category} ({type(category)})")
-            self.logger.info(f"[DEBUG] main_category: {main_category} ({type(main_category)})")
-            self.logger.info(f"[DEBUG] sub_category: {sub_category} ({type(sub_category)})")
-            self.logger.info(f"[DEBUG] is_read: {email.is_read} ({type(email.is_read)})")
-            tags_json = json.dumps(tags)
-            metadata_json = json.dumps(metadata)
-            self.logger.info(f"[DEBUG] tags_json: {tags_json} ({type(tags_json)})")
-            self.logger.info(f"[DEBUG] metadata_json: {metadata_json} ({type(metadata_json)})")
-            self.logger.info(f"[DEBUG] created_at_val: {created_at_val} ({type(created_at_val)})")
-            self.logger.info(f"[DEBUG] email_hash: {email_hash} ({type(email_hash)})")
-            self.logger.info(f"[DEBUG] verification_hash: {verification_hash} ({type(verification_hash)})")
-            self.logger.info(f"[DEBUG] message_id: {message_id} ({type(message_id)})")
-            cursor.execute('''
-                INSERT INTO emails 
-                (id, account_email, subject, sender, date, body, raw_data, category, 
-                 main_category, sub_category, is_read, is_starred, is_archived, is_spam, is_trashed, folder, tags, metadata, created_at, email_hash, verification_hash, message_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    is_read=VALUES(is_read),
-                    category=VALUES(category),
-                    main_category=VALUES(main_category),
-                    sub_category=VALUES(sub_category),
-                    is_starred=VALUES(is_starred),
-                    is_archived=VALUES(is_archived),
-                    is_spam=VALUES(is_spam),
-                    is_trashed=VALUES(is_trashed),
-                    folder=VALUES(folder),
-                    tags=VALUES(tags),
-                    metadata=VALUES(metadata),
-                    created_at=VALUES(created_at),
-                    email_hash=VALUES(email_hash),
-                    verification_hash=VALUES(verification_hash),
-                    message_id=VALUES(message_id)
-            ''', (
-                email_id,
-                email.account_email,
-                subject,
-                sender,
-                date_val.isoformat(),
-                body,
-                raw_data,
-                category,
-                main_category,
-                sub_category,
-                int(email.is_read),
-                int(email.is_starred),
-                int(email.is_archived),
-                int(email.is_spam),
-                int(email.is_trashed),
-                email.folder,
-                tags_json,
-                metadata_json,
-                created_at_val.isoformat(),
-                email_hash,
-                verification_hash,
-                message_id
-            ))
-            self.logger.info(f"[DEBUG] Executed email UPSERT for id={email_id}, account_email={email.account_email}, is_trashed={email.is_trashed}, folder={email.folder}")
-            self.logger.info(f"[DEBUG] cursor.rowcount after UPSERT: {cursor.rowcount}")
+            row = self._email_row(email)
+            cursor.execute(f'''
+                INSERT INTO emails ({', '.join(EMAIL_COLUMNS)})
+                VALUES {EMAIL_ROW_PLACEHOLDERS}
+                ON DUPLICATE KEY UPDATE {EMAIL_UPSERT_UPDATES}
+            ''', row)
+            rowcount = cursor.rowcount
             conn.commit()
-            if cursor.rowcount == 0:
-                self.logger.warning(f"[WARNING] Email UPSERT did not affect any rows for id={email_id}, account_email={email.account_email}")
             conn.close()
-            self.logger.info(f"Email saved: {subject[:50]}...")
+            
+            if persistence_trace.should_trace(email.account_email, row[0]):
+                persistence_trace.trace('save_email', email.account_email, row[0],
+                                        dict(zip(EMAIL_COLUMNS, row)), rowcount=rowcount)
+            self.logger.debug(f"Email saved: {row[2][:50]}...")
             return True
         except Exception as e:
             self.logger.error(f"Failed to save email: {str(e)}")
             return False
     
-    def get_emails(self, filters: dict = {}, page: int = 1, per_page: int = 20) -> (List[Email], int):
-        """Get emails from the database with filtering and pagination."""
+    def _email_row(self, email: Email) -> tuple:
+        """Normalize an Email into the parameter tuple for EMAIL_COLUMNS."""
+        date_val = self._ensure_datetime(email.date)
+        if not isinstance(date_val, datetime):
+            date_val = datetime.now()
+        created_at_val = self._ensure_datetime(getattr(email, 'created_at', datetime.now()))
+        if not isinstance(created_at_val, datetime):
+            created_at_val = datetime.now()
+        # Ensure id is always a plain string
+        if isinstance(email.id, bytes):
+            email_id = email.id.decode('utf-8')
+        elif isinstance(email.id, str) and email.id.startswith("b'") and email.id.endswith("'"):
+            email_id = email.id[2:-1]
+        else:
+            email_id = str(email.id)
+        return (
+            email_id,
+            email.account_email,
+            email.subject if email.subject is not None else '',
+            email.sender if email.sender is not None else '',
+            date_val.isoformat(),
+            email.body if email.body is not None else '',
+            email.raw_data if email.raw_data is not None else '',
+            email.category if email.category is not None else 'general',
+            email.main_category if email.main_category is not None else 'general',
+            email.sub_category if email.sub_category is not None else 'general',
+            int(email.is_read),
+            int(email.is_starred),
+            int(email.is_archived),
+            int(email.is_spam),
+            int(email.is_trashed),
+            email.folder,
+            json.dumps(email.tags if isinstance(email.tags, list) else []),
+            json.dumps(email.metadata if isinstance(email.metadata, dict) else {}),
+            created_at_val.isoformat(),
+            email.email_hash if email.email_hash is not None else '',
+            email.verification_hash if email.verification_hash is not None else '',
+            email.message_id if email.message_id is not None else '',
+            email.imap_uid,
+            email.raw_ref,
+            make_snippet(email.body),
+            email.rules_version
+        )
+    
+    def save_emails_batch(self, emails: List[Email], chunk_size: int = None) -> List[str]:
+        """
+        Insert or update many emails in one transaction.
+        
+        Account existence is checked once per distinct account and rows are
+        written with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements
+        of chunk_size rows each.
+        
+        Args:
+            emails: Emails to save
+            chunk_size: Rows per INSERT statement (defaults to Config.DB_BATCH_SIZE)
+            
+        Returns:
+            Status per input email, in order: 'inserted', 'updated',
+            'skipped' (account does not exist) or 'failed'
+        """
+        if not emails:
+            return []
+        chunk_size = chunk_size or Config.DB_BATCH_SIZE
+        statuses = ['failed'] * len(emails)
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            accounts = sorted({email.account_email for email in emails})
+            placeholders = ', '.join(['%s'] * len(accounts))
+            cursor.execute(f'SELECT email FROM email_accounts WHERE email IN ({placeholders})', accounts)
+            known_accounts = {row[0] for row in cursor.fetchall()}
+            
+            pending = []
+            for index, email in enumerate(emails):
+                if email.account_email not in known_accounts:
+                    statuses[index] = 'skipped'
+                    continue
+                pending.append((index, self._email_row(email)))
+            missing = set(accounts) - known_accounts
+            if missing:
+                self.logger.warning(f"Cannot save emails for unknown accounts: {', '.join(sorted(missing))}")
+            
+            seen_ids = set()
+            for i in range(0, len(pending), chunk_size):
+                chunk = pending[i:i + chunk_size]
+                ids = sorted({row[0] for _, row in chunk} - seen_ids)
+                if ids:
+                    id_placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f'SELECT id FROM emails WHERE id IN ({id_placeholders})', ids)
+                    seen_ids.update(row[0] for row in cursor.fetchall())
+                for index, row in chunk:
+                    statuses[index] = 'updated' if row[0] in seen_ids else 'inserted'
+                    seen_ids.add(row[0])
+                values = ', '.join([EMAIL_ROW_PLACEHOLDERS] * len(chunk))
+                params = [value for _, row in chunk for value in row]
+                cursor.execute(f'''
+                    INSERT INTO emails ({', '.join(EMAIL_COLUMNS)})
+                    VALUES {values}
+                    ON DUPLICATE KEY UPDATE {EMAIL_UPSERT_UPDATES}
+                ''', params)
+                if persistence_trace.active:
+                    for index, row in chunk:
+                        if persistence_trace.should_trace(row[1], row[0]):
+                            persistence_trace.trace('save_emails_batch', row[1], row[0],
+                                                    dict(zip(EMAIL_COLUMNS, row)), status=statuses[index])
+            
+            conn.commit()
+            conn.close()
+            self.logger.info(f"Saved {len(pending)} emails in batch "
+                             f"({statuses.count('inserted')} new, {statuses.count('updated')} updated)")
+            return statuses
+        except Exception as e:
+            self.logger.error(f"Failed to save email batch: {str(e)}")
+            return [status if status == 'skipped' else 'failed' for status in statuses]
+    
+    def find_existing_email_ids(self, message_ids: List[str] = None, email_hashes: List[str] = None,
+                                account_email: str = None, imap_uids: List[int] = None) -> Dict:
+        """
+        Bulk counterpart of email_exists.
+        
+        Args:
+            message_ids: Message-ID values to look up
+            email_hashes: Email hashes to look up
+            account_email: Only match emails of this account
+            imap_uids: IMAP UIDs to look up within account_email
+            
+        Returns:
+            Dictionary mapping each found message_id, email_hash or imap_uid
+            (as int) to the stored email id
+        """
+        found = {}
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            lookups = [('message_id', message_ids), ('email_hash', email_hashes)]
+            if account_email is not None:
+                lookups.append(('imap_uid', imap_uids))
+            account_sql = ' AND account_email = %s' if account_email is not None else ''
+            account_params = [account_email] if account_email is not None else []
+            for column, keys in lookups:
+                keys = sorted({key for key in keys or [] if key})
+                for i in range(0, len(keys), 1000):
+                    chunk = keys[i:i + 1000]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f'SELECT {column}, id FROM emails WHERE {column} IN ({placeholders}){account_sql}',
+                                   chunk + account_params)
+                    for key, email_id in cursor.fetchall():
+                        found.setdefault(int(key) if column == 'imap_uid' else key, email_id)
+            conn.close()
+        except Exception as e:
+            self.logger.error(f"Error looking up existing emails: {str(e)}")
+        return found
+    
+    def get_inline_raw_data(self, limit: int = 100) -> List[tuple]:
+        """Get (id, raw_data) for emails whose raw source is still stored inline."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, raw_data FROM emails
+                WHERE raw_ref IS NULL AND raw_data IS NOT NULL AND raw_data != ''
+                LIMIT %s
+            ''', (limit,))
+            rows = cursor.fetchall()
+            conn.close()
+            return rows
+        except Exception as e:
+            self.logger.error(f"Failed to get inline raw data: {str(e)}")
+            return []
+
+    def set_raw_ref(self, email_id: str, raw_ref: str) -> bool:
+        """Point an email at its stored raw source and drop the inline copy."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("UPDATE emails SET raw_ref = %s, raw_data = '' WHERE id = %s", (raw_ref, email_id))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to set raw_ref for email {email_id}: {str(e)}")
+            return False
+
+    def get_emails_for_recategorization(self, rules_version: int, after_id: str = '', limit: int = 500,
+                                        email_ids: List[str] = None) -> Optional[List[Email]]:
+        """
+        Get the next chunk of emails categorized under an older rule set.
+        
+        Emails are returned in id order after after_id, so a caller can page
+        through them with the last id of each chunk. Only the columns the
+        category rules read are loaded; body is left empty.
+        
+        Args:
+            rules_version: Active rule set version; emails already at it are skipped
+            after_id: Return emails with an id above this one
+            limit: Chunk size
+            email_ids: Only consider these emails, whatever their version
+            
+        Returns:
+            List of Email objects, or None on failure
+        """
         try:
             conn = self.get_connection()
             cursor = conn.cursor(dictionary=True)
+            
+            if email_ids:
+                placeholders = ', '.join(['%s'] * len(email_ids))
+                where_sql = f"id IN ({placeholders})"
+                params = list(email_ids)
+            else:
+                where_sql = "(rules_version IS NULL OR rules_version < %s)"
+                params = [rules_version]
+            cursor.execute(f'''
+                SELECT id, account_email, subject, sender, date
+                FROM emails
+                WHERE id > %s AND {where_sql}
+                ORDER BY id
+                LIMIT %s
+            ''', [after_id] + params + [limit])
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return [Email(
+                id=str(row['id']),
+                account_email=row['account_email'] or '',
+                subject=row['subject'] or '',
+                sender=row['sender'] or '',
+                date=row['date'],
+                body=''
+            ) for row in rows]
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get emails for recategorization: {str(e)}")
+            return None
 
-            query = "SELECT * FROM emails"
-            count_query = "SELECT COUNT(*) as total FROM emails"
-            where_clauses = []
-            params = {}
+    def count_emails_for_recategorization(self, rules_version: int) -> int:
+        """Count emails categorized under a rule set older than rules_version."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM emails
+                WHERE rules_version IS NULL OR rules_version < %s
+            ''', (rules_version,))
+            count = cursor.fetchone()[0]
+            conn.close()
+            return count
+        except Exception as e:
+            self.logger.error(f"Failed to count emails for recategorization: {str(e)}")
+            return 0
 
-            if 'category' in filters and filters['category']:
-                if filters['category'] == 'unread':
-                    where_clauses.append("is_read = 0")
-                elif filters['category'] != 'all':
-                    where_clauses.append("category = %(category)s")
-                    params['category'] = filters['category']
+    def update_email_categories(self, categories: List[tuple], rules_version: int) -> int:
+        """
+        Write new categories for many emails in one UPDATE.
+        
+        Only category, main_category, sub_category and rules_version are
+        written. Emails already categorized under a newer rule set are left
+        alone; emails at rules_version itself are rewritten, so explicitly
+        re-categorizing chosen emails works even when they are current.
+        
+        Args:
+            categories: (email_id, main_category, sub_category) tuples
+            rules_version: Rule set version the categories came from
+            
+        Returns:
+            Number of emails updated, or -1 on failure
+        """
+        if not categories:
+            return 0
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            rows_sql = ' UNION ALL '.join(['SELECT %s AS id, %s AS main_category, %s AS sub_category'] * len(categories))
+            params = [value for row in categories for value in row]
+            cursor.execute(f'''
+                UPDATE emails e
+                JOIN ({rows_sql}) AS c ON e.id = c.id
+                SET e.category = CONCAT(c.main_category, '_', c.sub_category),
+                    e.main_category = c.main_category,
+                    e.sub_category = c.sub_category,
+                    e.rules_version = %s
+                WHERE e.rules_version IS NULL OR e.rules_version <= %s
+            ''', params + [rules_version, rules_version])
+            updated = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return updated
+        except Exception as e:
+            self.logger.error(f"Failed to update email categories: {str(e)}")
+            return -1
 
-            if 'account' in filters and filters['account']:
-                where_clauses.append("account_email = %(account)s")
-                params['account'] = filters['account']
+    def get_job_checkpoint(self, name: str) -> Optional[Dict]:
+        """Get the saved state of a background job, or None."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT state FROM job_checkpoints WHERE name = %s', (name,))
+            row = cursor.fetchone()
+            conn.close()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            self.logger.error(f"Failed to get checkpoint for job {name}: {str(e)}")
+            return None
 
-            if 'search' in filters and filters['search']:
-                where_clauses.append("(subject LIKE %(search)s OR sender LIKE %(search)s)")
-                params['search'] = f"%{filters['search']}%"
+    def save_job_checkpoint(self, name: str, state: Dict) -> bool:
+        """Save the state of a background job, replacing the previous one."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO job_checkpoints (name, state)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE state = VALUES(state)
+            ''', (name, json.dumps(state)))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to save checkpoint for job {name}: {str(e)}")
+            return False
 
-            if 'main_category' in filters and filters['main_category']:
-                where_clauses.append("main_category = %(main_category)s")
-                params['main_category'] = filters['main_category']
+    def heartbeat_sync_worker(self, worker_id: str, ttl: int) -> Optional[List[str]]:
+        """
+        Record that a sync worker is alive and forget workers that stopped.
 
-            if 'sub_category' in filters and filters['sub_category']:
-                where_clauses.append("sub_category = %(sub_category)s")
-                params['sub_category'] = filters['sub_category']
+        Args:
+            worker_id: The calling worker
+            ttl: Seconds without a heartbeat after which a worker is gone
 
-            # Handle boolean filters (convert to int for MySQL)
-            for bool_key in ['is_trashed', 'is_starred', 'is_read', 'is_archived', 'is_spam']:
-                if bool_key in filters:
-                    where_clauses.append(f"{bool_key} = %({bool_key})s")
-                    params[bool_key] = int(filters[bool_key]) if isinstance(filters[bool_key], bool) else filters[bool_key]
+        Returns:
+            Ids of the live workers, or None on failure
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO sync_workers (worker_id, heartbeat_at)
+                VALUES (%s, NOW())
+                ON DUPLICATE KEY UPDATE heartbeat_at = NOW()
+            ''', (worker_id,))
+            cursor.execute('DELETE FROM sync_workers WHERE heartbeat_at < NOW() - INTERVAL %s SECOND', (ttl,))
+            cursor.execute('SELECT worker_id FROM sync_workers ORDER BY worker_id')
+            workers = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            conn.close()
+            return workers
+        except Exception as e:
+            self.logger.error(f"Failed to record heartbeat for sync worker {worker_id}: {str(e)}")
+            return None
 
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-                count_query += " WHERE " + " AND ".join(where_clauses)
+    def get_account_leases(self) -> Optional[Dict[str, Dict]]:
+        """
+        Get every account lease.
 
+        Returns:
+            Dictionary keyed by account email with owner, expires_at and
+            expired (judged by the database clock), or None on failure
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('SELECT account_email, owner, expires_at, expires_at < NOW() AS expired FROM account_leases')
+            rows = cursor.fetchall()
+            conn.close()
+            return {
+                row['account_email']: {
+                    'owner': row['owner'],
+                    'expires_at': row['expires_at'],
+                    'expired': bool(row['expired'])
+                }
+                for row in rows
+            }
+        except Exception as e:
+            self.logger.error(f"Failed to get account leases: {str(e)}")
+            return None
+
+    def acquire_account_leases(self, owner: str, account_emails: List[str], ttl: int) -> Optional[List[str]]:
+        """
+        Renew the owner's leases and take over the given accounts where free.
+
+        An account is taken only if it has no lease or its lease expired; a
+        lease held by another owner is left alone, so concurrent workers
+        never both win an account.
+
+        Args:
+            owner: Worker taking the leases
+            account_emails: Accounts to take over if their lease is free
+            ttl: Seconds until the leases expire without renewal
+
+        Returns:
+            Every account the owner now holds, or None on failure
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE account_leases SET expires_at = NOW() + INTERVAL %s SECOND
+                WHERE owner = %s
+            ''', (ttl, owner))
+            if account_emails:
+                # owner is assigned first, so expires_at moves only when the lease is (now) the owner's
+                placeholders = ', '.join(['(%s, %s, NOW() + INTERVAL %s SECOND)'] * len(account_emails))
+                params = []
+                for account_email in account_emails:
+                    params.extend([account_email, owner, ttl])
+                cursor.execute(f'''
+                    INSERT INTO account_leases (account_email, owner, expires_at)
+                    VALUES {placeholders}
+                    ON DUPLICATE KEY UPDATE
+                        owner = IF(expires_at < NOW(), VALUES(owner), owner),
+                        expires_at = IF(owner = VALUES(owner), VALUES(expires_at), expires_at)
+                ''', params)
+            cursor.execute('SELECT account_email FROM account_leases WHERE owner = %s', (owner,))
+            held = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            conn.close()
+            return held
+        except Exception as e:
+            self.logger.error(f"Failed to acquire account leases for {owner}: {str(e)}")
+            return None
+
+    def release_account_leases(self, owner: str, account_emails: List[str] = None) -> bool:
+        """
+        Give up the owner's leases on the given accounts, or all of them.
+
+        Args:
+            owner: Worker holding the leases
+            account_emails: Accounts to release; None releases every lease
+                and removes the worker from sync_workers
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            if account_emails is None:
+                cursor.execute('DELETE FROM account_leases WHERE owner = %s', (owner,))
+                cursor.execute('DELETE FROM sync_workers WHERE worker_id = %s', (owner,))
+            elif account_emails:
+                placeholders = ', '.join(['%s'] * len(account_emails))
+                cursor.execute(f'''
+                    DELETE FROM account_leases WHERE owner = %s AND account_email IN ({placeholders})
+                ''', [owner] + list(account_emails))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to release account leases for {owner}: {str(e)}")
+            return False
+
+    def get_emails(self, filters: dict = {}, page: int = 1, per_page: int = 20, summary: bool = False) -> (List[Email], int):
+        """
+        Get emails from the database with filtering and pagination.
+        
+        Args:
+            filters: See _email_filter_sql
+            page: 1-based page number
+            per_page: Emails per page
+            summary: Return EmailSummary rows (list columns and snippet, no body)
+            
+        Returns:
+            (emails, total) tuple
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            where_sql, params = self._email_filter_sql(filters)
+            
             # Get total count
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()['total']
+            total = self._count_emails(cursor, where_sql, params)
             
             # Add pagination
-            offset = (page - 1) * per_page
-            query += " ORDER BY date DESC LIMIT %(limit)s OFFSET %(offset)s"
+            columns = EMAIL_SUMMARY_SELECT if summary else "*"
+            query = f"SELECT {columns} FROM emails{where_sql} ORDER BY date DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s"
             params['limit'] = per_page
-            params['offset'] = offset
+            params['offset'] = (page - 1) * per_page
             
             cursor.execute(query, params)
             rows = cursor.fetchall()
             
             conn.close()
             
+            if summary:
+                return [EmailSummary.from_row(row) for row in rows], total
             emails = [Email.from_dict(row) for row in rows]
             return emails, total
             
@@ -582,40 +1237,39 @@ class DatabaseManager:
             return [], 0
     
     def get_email_stats(self) -> dict:
-        """Get email statistics from the database."""
+        """Get email statistics from the email_counters aggregates."""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Total emails
-            cursor.execute('SELECT COUNT(*) FROM emails')
-            total_emails = cursor.fetchone()[0]
-            
             # Total accounts
             cursor.execute('SELECT COUNT(*) FROM email_accounts WHERE is_active = 1')
             total_accounts = cursor.fetchone()[0]
             
-            # Emails by category
-            cursor.execute('SELECT category, COUNT(*) FROM emails GROUP BY category')
-            category_rows = cursor.fetchall()
-            emails_by_category = {row[0]: row[1] for row in category_rows}
-            
-            # Emails by account
-            cursor.execute('SELECT account_email, COUNT(*) FROM emails GROUP BY account_email')
-            account_rows = cursor.fetchall()
-            emails_by_account = {row[0]: row[1] for row in account_rows}
-            
-            # Read/unread counts
-            cursor.execute('SELECT COUNT(*) FROM emails WHERE is_read = 1')
-            read_emails = cursor.fetchone()[0]
-            unread_emails = total_emails - read_emails
-            
-            # Last fetch time (from last email created)
-            cursor.execute('SELECT MAX(created_at) FROM emails')
-            last_fetch = cursor.fetchone()[0]
-            
+            # One row per (account, category) group; a handful per account
+            cursor.execute('''
+                SELECT account_email, category, total, unread, last_created_at
+                FROM email_counters WHERE total > 0
+            ''')
+            rows = cursor.fetchall()
             conn.close()
             
+            emails_by_category = {}
+            emails_by_account = {}
+            total_emails = 0
+            unread_emails = 0
+            last_fetch = None
+            for account_email, category, total, unread, last_created_at in rows:
+                # Rows without a category count as 'general', like Email does
+                category = category or 'general'
+                emails_by_category[category] = emails_by_category.get(category, 0) + total
+                emails_by_account[account_email] = emails_by_account.get(account_email, 0) + total
+                total_emails += total
+                unread_emails += unread
+                if last_created_at and (last_fetch is None or last_created_at > last_fetch):
+                    last_fetch = last_created_at
+            read_emails = total_emails - unread_emails
+            
             return {
                 'total_emails': total_emails,
                 'total_accounts': total_accounts,
@@ -640,6 +1294,165 @@ class DatabaseManager:
                 'fetch_errors': 0
             }
     
+    def get_system_metrics(self, max_age: float = None) -> dict:
+        """
+        Get email, user and account totals for the admin dashboard.
+        
+        Everything comes from one query: email figures from email_counters,
+        user and account figures from their (small) tables. The result is
+        reused for SYSTEM_METRICS_CACHE_TTL seconds.
+        
+        Args:
+            max_age: Override the cache TTL in seconds; 0 forces a fresh query
+            
+        Returns:
+            Dictionary with 'emails', 'users' and 'accounts' sections
+        """
+        max_age = Config.SYSTEM_METRICS_CACHE_TTL if max_age is None else max_age
+        cached = self._metrics_cache
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('''
+                SELECT
+                    (SELECT COALESCE(SUM(total), 0) FROM email_counters) AS emails_total,
+                    (SELECT COALESCE(SUM(unread), 0) FROM email_counters) AS emails_unread,
+                    (SELECT COALESCE(SUM(total), 0) FROM email_counters
+                     WHERE category NOT IN ('', 'general')) AS emails_categorized,
+                    (SELECT JSON_OBJECTAGG(category, count) FROM (
+                        SELECT IF(category = '', 'general', category) AS category, SUM(total) AS count
+                        FROM email_counters GROUP BY 1 HAVING count > 0
+                     ) AS by_category) AS emails_by_category,
+                    (SELECT COUNT(*) FROM users) AS users_total,
+                    (SELECT COALESCE(SUM(is_active = 1), 0) FROM users) AS users_active,
+                    (SELECT COUNT(*) FROM email_accounts) AS accounts_total,
+                    (SELECT COALESCE(SUM(is_active = 1), 0) FROM email_accounts) AS accounts_active
+            ''')
+            row = cursor.fetchone()
+            conn.close()
+            
+            by_category = row['emails_by_category']
+            if isinstance(by_category, (bytes, str)):
+                by_category = json.loads(by_category)
+            metrics = {
+                'emails': {
+                    'total': int(row['emails_total']),
+                    'unread': int(row['emails_unread']),
+                    'categorized': int(row['emails_categorized']),
+                    'categories': {category: int(count) for category, count in (by_category or {}).items()}
+                },
+                'users': {
+                    'total': int(row['users_total']),
+                    'active': int(row['users_active']),
+                    'inactive': int(row['users_total']) - int(row['users_active'])
+                },
+                'accounts': {
+                    'total': int(row['accounts_total']),
+                    'active': int(row['accounts_active']),
+                    'inactive': int(row['accounts_total']) - int(row['accounts_active'])
+                }
+            }
+            self._metrics_cache = (time.monotonic(), metrics)
+            return metrics
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get system metrics: {str(e)}")
+            return {
+                'emails': {'total': 0, 'unread': 0, 'categorized': 0, 'categories': {}},
+                'users': {'total': 0, 'active': 0, 'inactive': 0},
+                'accounts': {'total': 0, 'active': 0, 'inactive': 0}
+            }
+    
+    def reconcile_email_counters(self, min_interval: int = 0) -> Optional[int]:
+        """
+        Correct drift in email_counters against the emails table.
+        
+        The triggers keep the counters exact; this repairs drift from writes
+        made while the triggers were missing (e.g. a restore without them).
+        The true per-group counts and the counters are read from one
+        consistent snapshot without locking anything, and only the groups
+        that differ are corrected, each by adding the difference in its own
+        short statement. Writes committed after the snapshot have already
+        added their own deltas through the triggers, so they are kept.
+        
+        A MySQL named lock lets one process reconcile at a time, and each
+        run is checkpointed so other processes skip it if one started
+        within min_interval seconds.
+        
+        Args:
+            min_interval: Skip if any process reconciled this recently
+            
+        Returns:
+            Number of counter groups that were corrected, None if skipped,
+            or -1 on failure
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT GET_LOCK(%s, 0)', (COUNTER_RECONCILE_JOB,))
+            if not cursor.fetchone()[0]:
+                conn.close()
+                return None
+            
+            try:
+                state = self.get_job_checkpoint(COUNTER_RECONCILE_JOB)
+                if state and min_interval and state.get('started_at'):
+                    last_started = datetime.fromisoformat(state['started_at'])
+                    if (datetime.now() - last_started).total_seconds() < min_interval:
+                        return None
+                started_at = datetime.now().isoformat()
+                
+                conn.commit()
+                conn.start_transaction(consistent_snapshot=True, readonly=True)
+                cursor.execute(EMAIL_COUNTERS_SELECT)
+                actual = {row[:4]: row[4:] for row in cursor.fetchall()}
+                cursor.execute('SELECT account_email, category, main_category, sub_category, '
+                               'total, unread, trashed, last_created_at FROM email_counters')
+                stored = {row[:4]: row[4:] for row in cursor.fetchall()}
+                conn.commit()
+                
+                drifted = 0
+                for key in actual.keys() | stored.keys():
+                    total, unread, trashed, last_created_at = actual.get(key, (0, 0, 0, None))
+                    have_total, have_unread, have_trashed, _ = stored.get(key, (0, 0, 0, None))
+                    delta = (int(total) - have_total, int(unread) - have_unread, int(trashed) - have_trashed)
+                    if delta == (0, 0, 0):
+                        continue
+                    drifted += 1
+                    cursor.execute('''
+                        INSERT INTO email_counters
+                            (account_email, category, main_category, sub_category, total, unread, trashed, last_created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                            total = total + VALUES(total),
+                            unread = unread + VALUES(unread),
+                            trashed = trashed + VALUES(trashed),
+                            last_created_at = GREATEST(IFNULL(last_created_at, VALUES(last_created_at)),
+                                                       IFNULL(VALUES(last_created_at), last_created_at))
+                    ''', key + delta + (last_created_at,))
+                    conn.commit()
+                
+                self.save_job_checkpoint(COUNTER_RECONCILE_JOB, {
+                    'started_at': started_at,
+                    'finished_at': datetime.now().isoformat(),
+                    'drifted_groups': drifted
+                })
+            finally:
+                cursor.execute('SELECT RELEASE_LOCK(%s)', (COUNTER_RECONCILE_JOB,))
+                cursor.fetchone()
+                conn.close()
+            
+            if drifted:
+                self.logger.warning(f"Reconciled {drifted} drifted email counter groups")
+            return drifted
+            
+        except Exception as e:
+            self.logger.error(f"Failed to reconcile email counters: {str(e)}")
+            return -1
+    
     def get_email_by_id(self, email_id: str) -> Optional[Email]:
         try:
             conn = self.get_connection()
@@ -689,7 +1502,10 @@ class DatabaseManager:
                     created_at=self._ensure_datetime(row['created_at']) if row['created_at'] else datetime.now(),
                     email_hash=row.get('email_hash'),
                     verification_hash=row.get('verification_hash'),
-                    message_id=row.get('message_id')
+                    message_id=row.get('message_id'),
+                    imap_uid=row.get('imap_uid'),
+                    raw_ref=row.get('raw_ref'),
+                    rules_version=row.get('rules_version')
                 )
             return None
         except Exception as e:
@@ -720,6 +1536,123 @@ class DatabaseManager:
             self.logger.error(f"Failed to update last_fetched_uid: {str(e)}")
             return False
 
+    def update_uid_sync_state(self, account_email: str, uid_validity: int, last_uid: int) -> bool:
+        """
+        Record the INBOX UIDVALIDITY and highest UID fetched for an account.
+        
+        Under an unchanged UIDVALIDITY the stored UID only moves forward, so
+        a slower concurrent fetch of the same account (a manual fetch job and
+        the sync worker) cannot roll the cursor back.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            # A new UIDVALIDITY invalidates the stored HIGHESTMODSEQ and UID as well;
+            # MySQL applies SET assignments left to right, so compare first.
+            cursor.execute('''
+                UPDATE email_accounts
+                SET highest_modseq = IF(uid_validity <=> %s, highest_modseq, NULL),
+                    last_fetched_uid = IF(uid_validity <=> %s, GREATEST(IFNULL(last_fetched_uid, 0), %s), %s),
+                    uid_validity = %s, last_fetched_date = %s
+                WHERE email = %s
+            ''', (uid_validity, uid_validity, last_uid, last_uid, uid_validity, datetime.now().isoformat(), account_email))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to update UID sync state: {str(e)}")
+            return False
+
+    def update_flag_sync_state(self, account_email: str, highest_modseq: Optional[int]) -> bool:
+        """Record the INBOX HIGHESTMODSEQ that flags were last synced up to."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('UPDATE email_accounts SET highest_modseq = %s WHERE email = %s', (highest_modseq, account_email))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to update flag sync state: {str(e)}")
+            return False
+
+    def get_read_status_by_uid(self, account_email: str, uids: Optional[List[int]] = None,
+                               chunk_size: int = 1000) -> Dict[int, bool]:
+        """
+        Get the local read state of an account's emails keyed by IMAP UID.
+        
+        Args:
+            account_email: Account to load
+            uids: Only these IMAP UIDs (e.g. those whose flags changed); None loads every email
+            chunk_size: Maximum UIDs per SELECT statement
+            
+        Returns:
+            Dictionary mapping imap_uid to is_read; emails without a UID are left out
+        """
+        if uids is not None and not uids:
+            return {}
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            rows = []
+            if uids is None:
+                cursor.execute('''
+                    SELECT imap_uid, is_read FROM emails
+                    WHERE account_email = %s AND imap_uid IS NOT NULL
+                ''', (account_email,))
+                rows = cursor.fetchall()
+            else:
+                uids = list(uids)
+                for i in range(0, len(uids), chunk_size):
+                    chunk = uids[i:i + chunk_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f'''
+                        SELECT imap_uid, is_read FROM emails
+                        WHERE account_email = %s AND imap_uid IN ({placeholders})
+                    ''', [account_email] + chunk)
+                    rows.extend(cursor.fetchall())
+            conn.close()
+            return {int(row[0]): bool(row[1]) for row in rows}
+        except Exception as e:
+            self.logger.error(f"Failed to get read status for {account_email}: {str(e)}")
+            return {}
+
+    def bulk_update_read_status(self, account_email: str, read_uids: List[int], unread_uids: List[int],
+                                chunk_size: int = 1000) -> int:
+        """
+        Set is_read for many emails of one account in a single transaction.
+        
+        Args:
+            account_email: Account the UIDs belong to
+            read_uids: IMAP UIDs to mark as read
+            unread_uids: IMAP UIDs to mark as unread
+            chunk_size: Maximum UIDs per UPDATE statement
+            
+        Returns:
+            Number of rows changed, or -1 on failure
+        """
+        if not read_uids and not unread_uids:
+            return 0
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            updated = 0
+            for is_read, uids in ((1, list(read_uids)), (0, list(unread_uids))):
+                for i in range(0, len(uids), chunk_size):
+                    chunk = uids[i:i + chunk_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f'''
+                        UPDATE emails SET is_read = %s
+                        WHERE account_email = %s AND imap_uid IN ({placeholders})
+                    ''', [is_read, account_email] + chunk)
+                    updated += cursor.rowcount
+            conn.commit()
+            conn.close()
+            return updated
+        except Exception as e:
+            self.logger.error(f"Failed to bulk update read status for {account_email}: {str(e)}")
+            return -1
+
     def update_last_fetched_date(self, account_email: str, last_date: datetime) -> bool:
         try:
             conn = self.get_connection()
@@ -953,7 +1886,9 @@ class DatabaseManager:
                     created_at=self._ensure_datetime(row[18]) if len(row) > 18 else datetime.now(),
                     email_hash=row[19] if len(row) > 19 else None,
                     verification_hash=row[20] if len(row) > 20 else None,
-                    message_id=row[21] if len(row) > 21 else None
+                    message_id=row[21] if len(row) > 21 else None,
+                    imap_uid=row[22] if len(row) > 22 else None,
+                    raw_ref=row[23] if len(row) > 23 else None
                 )
                 emails.append(email)
             return emails
@@ -967,10 +1902,11 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT main_category, COUNT(*) as count
-                FROM emails
-                WHERE main_category IS NOT NULL AND main_category != 'general'
+                SELECT main_category, SUM(total) as count
+                FROM email_counters
+                WHERE main_category NOT IN ('', 'general')
                 GROUP BY main_category
+                HAVING count > 0
                 ORDER BY count DESC
             ''')
             
@@ -992,10 +1928,11 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT sub_category, COUNT(*) as count
-                FROM emails
-                WHERE main_category = %s AND sub_category IS NOT NULL AND sub_category != 'general'
+                SELECT sub_category, SUM(total) as count
+                FROM email_counters
+                WHERE main_category = %s AND sub_category NOT IN ('', 'general')
                 GROUP BY sub_category
+                HAVING count > 0
                 ORDER BY count DESC
             ''', (main_category,))
             
@@ -1226,6 +2163,109 @@ class DatabaseManager:
             self.logger.error(f"Failed to update system settings: {str(e)}")
             return False
     
+    def get_latest_category_rule_set(self, newer_than: int = 0) -> Optional[Dict]:
+        """
+        Get the newest stored category rule set.
+        
+        Args:
+            newer_than: Only return it if its version is above this one
+            
+        Returns:
+            Dict with version, rules, created_by and created_at, or None
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute('''
+                SELECT version, rules, created_by, created_at
+                FROM category_rule_sets
+                WHERE version > %s
+                ORDER BY version DESC
+                LIMIT 1
+            ''', (newer_than,))
+            row = cursor.fetchone()
+            conn.close()
+            
+            if not row:
+                return None
+            row['rules'] = json.loads(row['rules'])
+            return row
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get category rule set: {str(e)}")
+            return None
+    
+    def get_category_rule_set(self, version: int) -> Optional[Dict]:
+        """Get one stored category rule set version, or None."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute('''
+                SELECT version, rules, created_by, created_at
+                FROM category_rule_sets
+                WHERE version = %s
+            ''', (version,))
+            row = cursor.fetchone()
+            conn.close()
+            
+            if not row:
+                return None
+            row['rules'] = json.loads(row['rules'])
+            return row
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get category rule set {version}: {str(e)}")
+            return None
+    
+    def get_category_rule_set_history(self, limit: int = 50) -> List[Dict]:
+        """Get stored category rule set versions, newest first, without their rules."""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute('''
+                SELECT version, created_by, created_at
+                FROM category_rule_sets
+                ORDER BY version DESC
+                LIMIT %s
+            ''', (limit,))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            return rows
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get category rule set history: {str(e)}")
+            return []
+    
+    def save_category_rule_set(self, version: int, rules: List[Dict], created_by: str = None) -> bool:
+        """
+        Store a new category rule set version.
+        
+        Versions are never overwritten: if the version already exists,
+        because another rule set was published concurrently, nothing is
+        stored and False is returned.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO category_rule_sets (version, rules, created_by)
+                VALUES (%s, %s, %s)
+            ''', (version, json.dumps(rules), created_by))
+            
+            conn.commit()
+            conn.close()
+            
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to save category rule set version {version}: {str(e)}")
+            return False
+    
     def get_reply_templates(self) -> List[dict]:
         """Get all reply templates from database."""
         try:
@@ -1517,7 +2557,8 @@ class DatabaseManager:
             self.logger.error(f"Failed to update email access level: {str(e)}")
             return False
     
-    def get_user_accessible_emails(self, user_id: int, filters: dict = {}, page: int = 1, per_page: int = 20) -> (List[Email], int):
+    def get_user_accessible_emails(self, user_id: int, filters: dict = {}, page: int = 1, per_page: int = 20,
+                                   summary: bool = False) -> (List[Email], int):
         """Get emails that a user has access to based on their email access permissions."""
         try:
             conn = self.get_connection()
@@ -1535,59 +2576,23 @@ class DatabaseManager:
                 conn.close()
                 return [], 0
             
-            # Build query with account filter
-            query = "SELECT * FROM emails WHERE account_email IN ({})".format(
-                ','.join(['%s'] * len(accessible_accounts))
-            )
-            count_query = "SELECT COUNT(*) as total FROM emails WHERE account_email IN ({})".format(
-                ','.join(['%s'] * len(accessible_accounts))
-            )
-            
-            where_clauses = []
-            params = accessible_accounts.copy()
-            
-            if 'category' in filters and filters['category']:
-                if filters['category'] == 'unread':
-                    where_clauses.append("is_read = 0")
-                elif filters['category'] != 'all':
-                    where_clauses.append("category = %s")
-                    params.append(filters['category'])
-            
-            if 'search' in filters and filters['search']:
-                where_clauses.append("(subject LIKE %s OR sender LIKE %s)")
-                params.append(f"%{filters['search']}%")
-                params.append(f"%{filters['search']}%")
-            
-            if 'main_category' in filters and filters['main_category']:
-                where_clauses.append("main_category = %s")
-                params.append(filters['main_category'])
-            
-            if 'sub_category' in filters and filters['sub_category']:
-                where_clauses.append("sub_category = %s")
-                params.append(filters['sub_category'])
-            
-            # Handle boolean filters
-            for bool_key in ['is_trashed', 'is_starred', 'is_read', 'is_archived', 'is_spam']:
-                if bool_key in filters:
-                    where_clauses.append(f"{bool_key} = %s")
-                    params.append(int(filters[bool_key]) if isinstance(filters[bool_key], bool) else filters[bool_key])
-            
-            if where_clauses:
-                query += " AND " + " AND ".join(where_clauses)
-                count_query += " AND " + " AND ".join(where_clauses)
-            
-            query += " ORDER BY date DESC LIMIT %s OFFSET %s"
-            params.extend([per_page, (page - 1) * per_page])
+            where_sql, params = self._email_filter_sql(filters, accounts=accessible_accounts)
             
             # Get total count
-            cursor.execute(count_query, params[:-2])  # Exclude LIMIT and OFFSET
-            total = cursor.fetchone()['total']
+            total = self._count_emails(cursor, where_sql, params)
             
             # Get emails
+            columns = EMAIL_SUMMARY_SELECT if summary else "*"
+            query = f"SELECT {columns} FROM emails{where_sql} ORDER BY date DESC, id DESC LIMIT %(limit)s OFFSET %(offset)s"
+            params['limit'] = per_page
+            params['offset'] = (page - 1) * per_page
             cursor.execute(query, params)
             rows = cursor.fetchall()
             conn.close()
             
+            if summary:
+                return [EmailSummary.from_row(row) for row in rows], total
+            
             emails = []
             for row in rows:
                 tags = json.loads(row['tags']) if row['tags'] else []
@@ -1615,7 +2620,10 @@ class DatabaseManager:
                     created_at=self._ensure_datetime(row['created_at']) if row['created_at'] else datetime.now(),
                     email_hash=row.get('email_hash'),
                     verification_hash=row.get('verification_hash'),
-                    message_id=row.get('message_id')
+                    message_id=row.get('message_id'),
+                    imap_uid=row.get('imap_uid'),
+                    raw_ref=row.get('raw_ref'),
+                    rules_version=row.get('rules_version')
                 )
                 emails.append(email)
             
@@ -1641,3 +2649,5 @@ class EmailAccount:
     last_fetched_uid: int = 0  # UID tracking
     last_fetched_date: Optional[datetime] = None  # Timestamp tracking
     last_fetched_hash: Optional[str] = None  # Email hash tracking
+    uid_validity: Optional[int] = None  # UIDVALIDITY tracking
+    highest_modseq: Optional[int] = None  # CONDSTORE flag sync tracking
@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+from mysql.connector import errors
+
+logger = logging.getLogger(__name__)
+
+class PooledConnection:
+    """
+    Connection checked out of a ConnectionPool.
+
+    Behaves like the underlying mysql.connector connection, except that
+    close() rolls back anything uncommitted and hands the connection back to
+    the pool instead of disconnecting. A connection that is garbage collected
+    without close() (e.g. a repository method that raised before reaching
+    conn.close()) is logged and disconnected instead: the finalizer may run on
+    any thread, at any point, so its state is not trusted for reuse.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __del__(self):
+        try:
+            if not self._released:
+                self._released = True
+                self._pool._leaked(self._raw)
+        except Exception:
+            pass
+
+class _BorrowedConnection:
+    """Connection handed to get_connection() calls inside a ConnectionPool.connection() block."""
+
+    def __init__(self, conn: PooledConnection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        # The enclosing connection() block owns the checkout; like a pooled
+        # close(), drop uncommitted work so the next call starts a fresh snapshot
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of MySQL connections with health checks."""
+
+    def __init__(self, connect: Callable, size: int, timeout: float, ping_interval: float, recycle: float):
+        """
+        Initialize the pool.
+
+        Args:
+            connect: Zero-argument callable opening a new raw connection
+            size: Maximum number of open connections
+            timeout: Seconds a checkout waits for a free connection before raising PoolError
+            ping_interval: Idle seconds after which a connection is pinged before reuse
+            recycle: Age in seconds after which a connection is closed instead of reused
+        """
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.recycle = recycle
+        self._idle = deque()  # (raw, created_at, returned_at), most recently returned last
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.stats = {
+            'checkouts': 0, 'created': 0, 'reused': 0, 'discarded': 0,
+            'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0, 'leaked': 0, 'peak_in_use': 0
+        }
+
+    def _healthy(self, raw, created_at: float, returned_at: float) -> bool:
+        now = time.monotonic()
+        if self.recycle and now - created_at > self.recycle:
+            return False
+        if now - returned_at < self.ping_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        with self._cond:
+            self.stats['discarded'] += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def get(self) -> PooledConnection:
+        """
+        Check out a connection, waiting up to timeout seconds for one to free up.
+
+        Inside a connection() block on the same thread the block's connection
+        is returned, and closing it is a no-op.
+        """
+        if getattr(self._local, 'scoped', False):
+            return _BorrowedConnection(self._shared())
+        return self._checkout()
+
+    def _checkout(self) -> PooledConnection:
+        deadline = None
+        with self._cond:
+            self.stats['checkouts'] += 1
+        while True:
+            candidate = None
+            with self._cond:
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._open < self.size:
+                    self._open += 1
+                else:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.timeout
+                        self.stats['waits'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise errors.PoolError(f"No database connection available within {self.timeout}s "
+                                               f"(pool size {self.size})")
+                    started = time.monotonic()
+                    self._cond.wait(remaining)
+                    self.stats['wait_seconds'] += time.monotonic() - started
+                    continue
+
+            # Health checks and connects happen outside the lock so a slow
+            # server does not block other threads releasing connections
+            if candidate is not None:
+                raw, created_at, returned_at = candidate
+                if self._healthy(raw, created_at, returned_at):
+                    with self._cond:
+                        self.stats['reused'] += 1
+                        return self._checked_out(raw, created_at)
+                self._discard(raw)
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                continue
+
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.stats['created'] += 1
+                return self._checked_out(raw, time.monotonic())
+
+    def _checked_out(self, raw, created_at: float) -> PooledConnection:
+        in_use = self._open - len(self._idle)
+        self.stats['peak_in_use'] = max(self.stats['peak_in_use'], in_use)
+        return PooledConnection(self, raw, created_at)
+
+    def _leaked(self, raw):
+        logger.warning("Pooled connection garbage collected without close(); disconnecting it")
+        with self._cond:
+            self.stats['leaked'] += 1
+            self._open -= 1
+            self._cond.notify()
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _release(self, raw, created_at: float):
+        try:
+            raw.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append((raw, created_at, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not reusable:
+            self._discard(raw)
+
+    def _shared(self) -> PooledConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._checkout()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def connection(self, lazy: bool = False):
+        """
+        Share one connection for the current thread for the duration of the block.
+
+        Repository calls made inside the block reuse it instead of taking
+        their own, so a request or sync cycle costs a single checkout. A
+        block nested in another shares the outer block's connection.
+
+        Args:
+            lazy: Check the connection out on first use rather than on entry
+                (the block then yields None), so a block that never touches
+                the database never holds one
+        """
+        if getattr(self._local, 'scoped', False):
+            yield None if lazy else self._shared()
+            return
+        self._local.scoped = True
+        try:
+            yield None if lazy else self._shared()
+        finally:
+            self._local.scoped = False
+            self.release_shared()
+
+    def release_shared(self):
+        """
+        Return the current thread's shared connection to the pool early.
+
+        Meant for a connection() block about to do slow non-database work
+        (e.g. IMAP round trips); later calls in the block check out again.
+        """
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones are returned to the pool as usual."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def get_status(self) -> Dict:
+        """Get pool size, usage and counters."""
+        with self._cond:
+            idle = len(self._idle)
+            stats = dict(self.stats)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._open - idle,
+                'idle': idle,
+                'stats': stats
+            }
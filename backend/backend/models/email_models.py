@@ -2,6 +2,9 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from dataclasses import dataclass, field
 import json
+import re
+
+_TAG_RE = re.compile(r'<[^>]*>')
 
 @dataclass
 class EmailAccount:
@@ -16,6 +19,12 @@ class EmailAccount:
     created_at: datetime = field(default_factory=datetime.now)
     last_fetched_uid: int = 0
     last_fetched_date: Optional[datetime] = None
+    uid_validity: Optional[int] = None  # UIDVALIDITY of INBOX when last_fetched_uid was recorded
+    highest_modseq: Optional[int] = None  # HIGHESTMODSEQ of INBOX when flags were last synced
+
+def account_fingerprint(account: EmailAccount) -> tuple:
+    """The settings an IMAP login depends on; a change means connections and results for the old ones are stale."""
+    return (account.imap_server, account.imap_port, account.email, account.password)
 
 @dataclass
 class Email:
@@ -42,6 +51,9 @@ class Email:
     email_hash: Optional[str] = None
     verification_hash: Optional[str] = None  # For UID+timestamp+hash verification
     message_id: Optional[str] = None
+    imap_uid: Optional[int] = None  # IMAP UID within the account's INBOX
+    raw_ref: Optional[str] = None  # raw source in the raw message store; raw_data is empty when set
+    rules_version: Optional[int] = None  # category rule set version the categories came from
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Email":
@@ -83,7 +95,10 @@ class Email:
             created_at=data.get('created_at'),
             email_hash=data.get('email_hash'),
             verification_hash=data.get('verification_hash'),
-            message_id=data.get('message_id')
+            message_id=data.get('message_id'),
+            imap_uid=data.get('imap_uid'),
+            raw_ref=data.get('raw_ref'),
+            rules_version=data.get('rules_version')
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -108,6 +123,91 @@ class Email:
             'message_id': self.message_id
         }
 
+SNIPPET_LENGTH = 160
+
+def make_snippet(body: Optional[str], length: int = SNIPPET_LENGTH) -> str:
+    """Whitespace-collapsed, tag-stripped preview of a body, at most length characters."""
+    if not body:
+        return ''
+    # Only look at a bounded prefix; tags and whitespace rarely take more than the rest
+    text = _TAG_RE.sub(' ', body[:length * 4])
+    return ' '.join(text.split())[:length]
+
+@dataclass(slots=True)
+class EmailSummary:
+    """Compact email row for list views: no body, raw source or metadata."""
+    id: str
+    account_email: str
+    subject: str
+    sender: str
+    date: datetime
+    snippet: str = ""
+    category: str = "general"
+    main_category: str = "general"
+    sub_category: str = "general"
+    is_read: bool = False
+    is_starred: bool = False
+    is_archived: bool = False
+    is_spam: bool = False
+    is_trashed: bool = False
+    folder: str = "inbox"
+    tags: list = field(default_factory=list)
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "EmailSummary":
+        """Create a summary from a dictionary row of EMAIL_SUMMARY_SELECT."""
+        tags = row.get('tags')
+        if isinstance(tags, str):
+            try:
+                tags = json.loads(tags)
+            except json.JSONDecodeError:
+                tags = []
+        snippet = row.get('snippet')
+        # Rows written before snippets were stored carry a body prefix instead
+        snippet = snippet if snippet is not None else make_snippet(row.get('body_prefix'))
+        return cls(
+            id=str(row['id']),
+            account_email=row.get('account_email') or '',
+            subject=row.get('subject') or '',
+            sender=row.get('sender') or '',
+            date=row.get('date'),
+            snippet=snippet,
+            category=row.get('category') or 'general',
+            main_category=row.get('main_category') or 'general',
+            sub_category=row.get('sub_category') or 'general',
+            is_read=bool(row.get('is_read')),
+            is_starred=bool(row.get('is_starred')),
+            is_archived=bool(row.get('is_archived')),
+            is_spam=bool(row.get('is_spam')),
+            is_trashed=bool(row.get('is_trashed')),
+            folder=row.get('folder') or 'inbox',
+            tags=tags or [],
+            created_at=row.get('created_at')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert summary to dictionary for list API responses."""
+        return {
+            'id': self.id,
+            'account_email': self.account_email,
+            'subject': self.subject,
+            'sender': self.sender,
+            'date': self.date.isoformat() if self.date else None,
+            'snippet': self.snippet,
+            'category': self.category,
+            'main_category': self.main_category,
+            'sub_category': self.sub_category,
+            'is_read': self.is_read,
+            'is_starred': self.is_starred,
+            'is_archived': self.is_archived,
+            'is_spam': self.is_spam,
+            'is_trashed': self.is_trashed,
+            'folder': self.folder,
+            'tags': self.tags,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 @dataclass
 class EmailStats:
     """Model for email statistics."""
@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from ..config import Config
+
+# Search field prefixes and the columns each searches. Every column tuple
+# has a FULLTEXT index with exactly those columns (see migration 6).
+SEARCH_FIELDS = {
+    'from': ('sender',),
+    'sender': ('sender',),
+    'subject': ('subject',),
+}
+DEFAULT_COLUMNS = ('subject', 'sender', 'body')
+
+# Columns searched with LIKE for terms too short for the FULLTEXT index;
+# LIKE over body would scan every message, so it is left out
+_LIKE_COLUMNS = {
+    DEFAULT_COLUMNS: ('subject', 'sender'),
+}
+
+# [-][field:]("phrase" | word)
+_TERM_RE = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+@dataclass
+class SearchTerm:
+    columns: Tuple[str, ...]
+    text: str
+    words: List[str]
+    phrase: bool = False
+    prefix: bool = False
+    negate: bool = False
+
+def parse_search(query: str) -> List[SearchTerm]:
+    """
+    Parse a search box query.
+
+    Supported syntax, combined with AND:
+        invoice           word anywhere in subject, sender or body
+        invoice*          word prefix
+        "quarterly report" exact phrase
+        from:alice        field filter (from:, sender:, subject:); takes a
+                          word, prefix or phrase
+        -newsletter       exclude matches of any of the above
+
+    Unknown field prefixes are searched as plain text, so "re:meeting" or
+    "10:30" behave as typed. Punctuation inside a word splits it into a
+    phrase, which matches addresses like alice@example.com.
+    """
+    terms = []
+    for negate, field, phrase, word in _TERM_RE.findall(query or ''):
+        columns = DEFAULT_COLUMNS
+        if field and field.lower() in SEARCH_FIELDS:
+            columns = SEARCH_FIELDS[field.lower()]
+        elif field:
+            word = f"{field}:{word}" if word else field
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith('*')
+        if prefix:
+            text = text.rstrip('*')
+        words = _WORD_RE.findall(text)
+        if not words:
+            continue
+        terms.append(SearchTerm(
+            columns=columns,
+            text=text,
+            words=words,
+            phrase=bool(phrase) or len(words) > 1,
+            prefix=prefix and len(words) == 1,
+            negate=bool(negate)
+        ))
+    return terms
+
+def _boolean_token(term: SearchTerm) -> str:
+    if term.phrase:
+        return '"' + ' '.join(term.words) + '"'
+    return term.words[0] + ('*' if term.prefix else '')
+
+def _needs_like(term: SearchTerm) -> bool:
+    # Words shorter than innodb_ft_min_token_size are not indexed
+    return any(len(word) < Config.SEARCH_MIN_TOKEN_SIZE for word in term.words)
+
+def build_search_sql(query: str, param_prefix: str = 'search') -> Tuple[List[str], Dict, str]:
+    """
+    Translate a search query into WHERE clauses over the FULLTEXT indexes.
+
+    Terms on the same columns are combined into one MATCH ... AGAINST in
+    boolean mode ('+' for required terms, '-' for excluded ones). Terms
+    containing a word shorter than SEARCH_MIN_TOKEN_SIZE fall back to LIKE
+    on subject/sender, since the index does not hold such words.
+
+    Args:
+        query: Search box text, see parse_search
+        param_prefix: Prefix for the named query parameters
+
+    Returns:
+        (clauses, params, score_sql); clauses are ANDed, score_sql is the
+        relevance of a row (sum of the MATCH scores, 0 without any)
+    """
+    clauses = []
+    params = {}
+    groups: Dict[Tuple[str, ...], Dict[str, List[str]]] = {}
+
+    for term in parse_search(query):
+        if _needs_like(term):
+            name = f"{param_prefix}_{len(params)}"
+            escaped = term.text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params[name] = '%' + escaped + '%'
+            columns = _LIKE_COLUMNS.get(term.columns, term.columns)
+            like_sql = '(' + ' OR '.join(f"{column} LIKE %({name})s" for column in columns) + ')'
+            clauses.append(f"NOT {like_sql}" if term.negate else like_sql)
+            continue
+        group = groups.setdefault(term.columns, {'required': [], 'excluded': []})
+        group['excluded' if term.negate else 'required'].append(_boolean_token(term))
+
+    scores = []
+    for columns, group in groups.items():
+        match_columns = ', '.join(columns)
+        name = f"{param_prefix}_{len(params)}"
+        if group['required']:
+            params[name] = ' '.join(['+' + token for token in group['required']] +
+                                    ['-' + token for token in group['excluded']])
+            match_sql = f"MATCH({match_columns}) AGAINST(%({name})s IN BOOLEAN MODE)"
+            clauses.append(match_sql)
+            scores.append(match_sql)
+        else:
+            # Boolean mode matches nothing with only '-' terms; exclude rows matching any of them
+            params[name] = ' '.join(group['excluded'])
+            clauses.append(f"NOT MATCH({match_columns}) AGAINST(%({name})s IN BOOLEAN MODE)")
+
+    score_sql = '(' + ' + '.join(scores) + ')' if scores else '0'
+    return clauses, params, score_sql
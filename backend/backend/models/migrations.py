@@ -0,0 +1,295 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Named lock serialising migration runs across processes (web, worker, scripts)
+MIGRATION_LOCK = 'email_automation_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 300
+
+# Errors meaning a statement's change is already in place. Databases created
+# before versioned migrations got some of these changes from ad-hoc ALTERs.
+_ALREADY_APPLIED = ('Duplicate column name', 'Duplicate key name', 'check that column/key exists',
+                    'Trigger already exists')
+
+@dataclass(frozen=True)
+class Migration:
+    """One schema change; applied migrations are never edited, only appended to."""
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+def _add_index(table: str, name: str, columns: str) -> str:
+    # InnoDB builds secondary indexes in place while reads and writes continue
+    return f'ALTER TABLE {table} ADD INDEX {name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE'
+
+def _drop_index(table: str, name: str) -> str:
+    return f'ALTER TABLE {table} DROP INDEX {name}, ALGORITHM=INPLACE, LOCK=NONE'
+
+# email_counters key of an emails row; NULL categories count under ''
+_COUNTER_KEY = "{row}.account_email, IFNULL({row}.category, ''), IFNULL({row}.main_category, ''), IFNULL({row}.sub_category, '')"
+
+def _counter_add(row: str, sign: str) -> str:
+    """Statement adding (sign '+') or removing (sign '-') one emails row from its counter group."""
+    return f"""
+        INSERT INTO email_counters
+            (account_email, category, main_category, sub_category, total, unread, trashed, last_created_at)
+        VALUES ({_COUNTER_KEY.format(row=row)},
+                {sign}1, {sign}IF({row}.is_read, 0, 1), {sign}IF({row}.is_trashed, 1, 0), {row}.created_at)
+        ON DUPLICATE KEY UPDATE
+            total = total + VALUES(total),
+            unread = unread + VALUES(unread),
+            trashed = trashed + VALUES(trashed),
+            last_created_at = GREATEST(IFNULL(last_created_at, VALUES(last_created_at)),
+                                       IFNULL(VALUES(last_created_at), last_created_at))
+    """
+
+# Every counter group's true values computed from emails (reconciliation)
+EMAIL_COUNTERS_SELECT = f"""
+    SELECT {_COUNTER_KEY.format(row='emails')},
+           COUNT(*), SUM(IF(is_read, 0, 1)), SUM(IF(is_trashed, 1, 0)), MAX(created_at)
+    FROM emails
+    GROUP BY 1, 2, 3, 4
+"""
+
+# Recomputes every counter group from emails (initial backfill)
+EMAIL_COUNTERS_REBUILD = f"""
+    INSERT INTO email_counters
+        (account_email, category, main_category, sub_category, total, unread, trashed, last_created_at)
+    {EMAIL_COUNTERS_SELECT}
+"""
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'uid_sync_columns', (
+        'ALTER TABLE email_accounts ADD COLUMN uid_validity BIGINT',
+        'ALTER TABLE emails ADD COLUMN imap_uid BIGINT',
+    )),
+    Migration(2, 'condstore_highest_modseq', (
+        'ALTER TABLE email_accounts ADD COLUMN highest_modseq BIGINT',
+    )),
+    Migration(3, 'raw_ref_and_snippet', (
+        'ALTER TABLE emails ADD COLUMN raw_ref VARCHAR(80)',
+        'ALTER TABLE emails ADD COLUMN snippet VARCHAR(255)',
+    )),
+    Migration(4, 'initial_indexes', (
+        'CREATE INDEX idx_emails_account ON emails(account_email)',
+        'CREATE INDEX idx_emails_category ON emails(category)',
+        'CREATE INDEX idx_emails_date ON emails(date)',
+        'CREATE INDEX idx_emails_message_id ON emails(message_id)',
+        'CREATE INDEX idx_emails_date_id ON emails(date, id)',
+        'CREATE INDEX idx_emails_account_uid ON emails(account_email, imap_uid)',
+    )),
+    # List and count queries filter on is_trashed (every folder view) and
+    # optionally account_email, then read newest first; with the filter
+    # columns ahead of (date, id) a page is an ordered index range read
+    # instead of a filesort over every matching row.
+    Migration(5, 'list_filter_indexes', (
+        _add_index('emails', 'idx_emails_trashed_date', 'is_trashed, date, id'),
+        _add_index('emails', 'idx_emails_account_trashed_date', 'account_email, is_trashed, date, id'),
+        _add_index('emails', 'idx_emails_unread_date', 'is_read, is_trashed, date, id'),
+        _add_index('emails', 'idx_emails_main_sub_date', 'main_category, sub_category, date'),
+        _add_index('emails', 'idx_emails_main_date', 'main_category, date'),
+        _add_index('emails', 'idx_emails_category_date', 'category, date'),
+        # Dedupe lookups (email_exists, verification_hash_exists, find_existing_email_ids)
+        _add_index('emails', 'idx_emails_email_hash', 'email_hash'),
+        _add_index('emails', 'idx_emails_verification_hash', 'verification_hash'),
+        # Covers get_read_status_by_uid without touching the rows
+        _add_index('emails', 'idx_emails_account_uid_read', 'account_email, imap_uid, is_read'),
+        # Left prefixes of the indexes above
+        _drop_index('emails', 'idx_emails_account'),
+        _drop_index('emails', 'idx_emails_category'),
+        _drop_index('emails', 'idx_emails_date'),
+        _drop_index('emails', 'idx_emails_account_uid'),
+    )),
+    # Search (email_search.build_search_sql). MATCH() needs an index over
+    # exactly its columns, hence one per searchable field set. The first
+    # FULLTEXT index rebuilds the table to add FTS_DOC_ID, which InnoDB does
+    # in place but with writes blocked; later ones are plain in-place builds.
+    Migration(6, 'fulltext_search', (
+        'ALTER TABLE emails ADD FULLTEXT INDEX ft_emails_search (subject, sender, body), ALGORITHM=INPLACE',
+        'ALTER TABLE emails ADD FULLTEXT INDEX ft_emails_subject (subject), ALGORITHM=INPLACE',
+        'ALTER TABLE emails ADD FULLTEXT INDEX ft_emails_sender (sender), ALGORITHM=INPLACE',
+    )),
+    # Stats and category sidebars read these per (account, category) totals
+    # instead of grouping the whole emails table. Triggers keep them exact in
+    # the same transaction as every insert, update and delete of emails, so
+    # no write path has to remember to maintain them; creating triggers needs
+    # the TRIGGER privilege (and SUPER or log_bin_trust_function_creators
+    # with binary logging on). DatabaseManager.reconcile_email_counters
+    # repairs any drift.
+    #
+    # CREATE TRIGGER commits implicitly, so the triggers and the backfill
+    # cannot share a transaction. Instead both tables stay write locked from
+    # before the triggers exist until the backfill is done: a sync write
+    # either lands before the lock and is counted by the backfill, or waits
+    # and is counted by its trigger, never both or neither. Implicit commits
+    # keep LOCK TABLES locks; UNLOCK TABLES commits the backfill. Writers
+    # stall for the length of one scan of emails.
+    Migration(7, 'email_counters', (
+        '''
+        CREATE TABLE IF NOT EXISTS email_counters (
+            account_email VARCHAR(255) NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            main_category VARCHAR(100) NOT NULL,
+            sub_category VARCHAR(100) NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            unread INT NOT NULL DEFAULT 0,
+            trashed INT NOT NULL DEFAULT 0,
+            last_created_at DATETIME,
+            PRIMARY KEY (account_email, category, main_category, sub_category)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        ''',
+        'LOCK TABLES emails WRITE, email_counters WRITE',
+        'CREATE TRIGGER trg_emails_counters_insert AFTER INSERT ON emails FOR EACH ROW' + _counter_add('NEW', '+'),
+        'CREATE TRIGGER trg_emails_counters_delete AFTER DELETE ON emails FOR EACH ROW' + _counter_add('OLD', '-'),
+        f"""
+        CREATE TRIGGER trg_emails_counters_update AFTER UPDATE ON emails FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.account_email <=> NEW.account_email AND OLD.category <=> NEW.category
+                    AND OLD.main_category <=> NEW.main_category AND OLD.sub_category <=> NEW.sub_category
+                    AND OLD.is_read <=> NEW.is_read AND OLD.is_trashed <=> NEW.is_trashed) THEN
+                {_counter_add('OLD', '-')};
+                {_counter_add('NEW', '+')};
+            END IF;
+        END
+        """,
+        'DELETE FROM email_counters',
+        EMAIL_COUNTERS_REBUILD,
+        'UNLOCK TABLES',
+    )),
+    # Versioned categorization rules (services.category_rules). Each email
+    # records the version it was categorized under, so re-categorization
+    # only has to visit emails behind the active version.
+    Migration(8, 'category_rule_sets', (
+        '''
+        CREATE TABLE IF NOT EXISTS category_rule_sets (
+            version INT PRIMARY KEY,
+            rules LONGTEXT NOT NULL,
+            created_by VARCHAR(255),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        ''',
+        'ALTER TABLE emails ADD COLUMN rules_version INT',
+        _add_index('emails', 'idx_emails_rules_version', 'rules_version, id'),
+    )),
+    # Progress of resumable background jobs, one row per job
+    Migration(9, 'job_checkpoints', (
+        '''
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            name VARCHAR(100) PRIMARY KEY,
+            state LONGTEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        ''',
+    )),
+    Migration(10, 'sync_workers_and_account_leases', (
+        '''
+        CREATE TABLE IF NOT EXISTS sync_workers (
+            worker_id VARCHAR(255) PRIMARY KEY,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            heartbeat_at DATETIME NOT NULL,
+            INDEX idx_sync_workers_heartbeat (heartbeat_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS account_leases (
+            account_email VARCHAR(255) PRIMARY KEY,
+            owner VARCHAR(255) NOT NULL,
+            expires_at DATETIME NOT NULL,
+            acquired_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_account_leases_owner (owner)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        ''',
+    )),
+    # Whether any email still references a raw message blob, checked when
+    # emails are deleted (DatabaseManager._delete_unreferenced_raw)
+    Migration(11, 'raw_ref_index', (
+        _add_index('emails', 'idx_emails_raw_ref', 'raw_ref'),
+    )),
+]
+
+LATEST_VERSION = max(migration.version for migration in MIGRATIONS)
+
+def _ensure_migrations_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+
+def get_applied_migrations(conn) -> Dict[int, datetime]:
+    """Applied migration versions mapped to when they were applied."""
+    cursor = conn.cursor()
+    _ensure_migrations_table(cursor)
+    cursor.execute('SELECT version, applied_at FROM schema_migrations')
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def get_pending_migrations(conn) -> List[Migration]:
+    applied = get_applied_migrations(conn)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+def apply_migrations(conn) -> List[int]:
+    """
+    Apply pending migrations in version order.
+
+    Each migration is recorded in schema_migrations once all its statements
+    have run, so an interrupted run resumes at the migration it stopped in.
+    Statements whose change already exists are skipped, which makes every
+    migration safe to re-run. A MySQL named lock keeps concurrent processes
+    from migrating at the same time.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Versions applied by this call
+    """
+    cursor = conn.cursor()
+    _ensure_migrations_table(cursor)
+
+    cursor.execute('SELECT GET_LOCK(%s, %s)', (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+    if not cursor.fetchone()[0]:
+        raise RuntimeError('Timed out waiting for the schema migration lock')
+
+    applied_now = []
+    try:
+        applied = get_applied_migrations(conn)
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            logger.info(f"Applying schema migration {migration.version}: {migration.name}")
+            for statement in migration.statements:
+                try:
+                    cursor.execute(statement)
+                except Exception as e:
+                    if not any(message in str(e) for message in _ALREADY_APPLIED):
+                        raise
+            cursor.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                           (migration.version, migration.name))
+            conn.commit()
+            applied_now.append(migration.version)
+    except Exception:
+        # Before UNLOCK TABLES, which would commit a half-run migration
+        conn.rollback()
+        raise
+    finally:
+        # A failed migration may have left tables locked (migration 7)
+        cursor.execute('UNLOCK TABLES')
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (MIGRATION_LOCK,))
+        cursor.fetchone()
+
+    return applied_now
+
+def get_migration_status(conn) -> List[Dict]:
+    """Every known migration with whether and when it was applied."""
+    applied = get_applied_migrations(conn)
+    return [{
+        'version': migration.version,
+        'name': migration.name,
+        'applied': migration.version in applied,
+        'applied_at': applied[migration.version].isoformat() if applied.get(migration.version) else None
+    } for migration in MIGRATIONS]
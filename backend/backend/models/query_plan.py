@@ -0,0 +1,113 @@
+import re
+from typing import Dict, List, Tuple
+
+# Tables large enough that a full scan or unbounded sort is a problem;
+# scans of the small account and user tables are fine
+LARGE_TABLES = ('emails',)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+class _RecordingCursor:
+    def __init__(self, cursor, sink: List[Tuple[str, object]]):
+        self._cursor = cursor
+        self._sink = sink
+
+    def execute(self, query, params=None, *args, **kwargs):
+        if query.lstrip().upper().startswith('SELECT'):
+            self._sink.append((query, params))
+        return self._cursor.execute(query, params, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _RecordingConnection:
+    def __init__(self, conn, sink: List[Tuple[str, object]]):
+        self._conn = conn
+        self._sink = sink
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self._conn.cursor(*args, **kwargs), self._sink)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class QueryRecorder:
+    """
+    Records the SELECT statements a DatabaseManager issues while active.
+
+    Usage:
+        with QueryRecorder(db_manager) as recorder:
+            db_manager.get_email_page({'is_trashed': False})
+        recorder.queries  # [(sql, params), ...]
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.queries: List[Tuple[str, object]] = []
+
+    def __enter__(self):
+        get_connection = type(self.manager).get_connection
+        self.manager.get_connection = lambda: _RecordingConnection(get_connection(self.manager), self.queries)
+        return self
+
+    def __exit__(self, *exc):
+        del self.manager.get_connection
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE_RE.sub(' ', query).strip()
+
+def explain(conn, query: str, params=None) -> List[Dict]:
+    """Run EXPLAIN for a query; returns one dict per plan row."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('EXPLAIN ' + query, params)
+    return cursor.fetchall()
+
+def plan_problems(query: str, plan: List[Dict]) -> List[str]:
+    """
+    Problems in an EXPLAIN plan that grow with the size of a large table.
+
+    Flags full table scans of LARGE_TABLES, and filesorts of them in paged
+    queries (with LIMIT), where the whole filtered set is sorted to return
+    one page. Sorting the handful of rows a GROUP BY produces is not flagged.
+
+    Args:
+        query: The explained query
+        plan: Rows returned by explain()
+
+    Returns:
+        Human readable problem descriptions; empty when the plan is fine
+    """
+    problems = []
+    paged = 'LIMIT' in query.upper()
+    for row in plan:
+        table = row.get('table')
+        if table not in LARGE_TABLES:
+            continue
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            problems.append(f"full scan of {table} (~{row.get('rows')} rows)")
+        if paged and 'Using filesort' in extra:
+            problems.append(f"filesort of {table} under LIMIT (key={row.get('key')}, ~{row.get('rows')} rows)")
+    return problems
+
+def check_queries(conn, queries: List[Tuple[str, object]]) -> List[Dict]:
+    """
+    EXPLAIN each distinct recorded query and collect its problems.
+
+    Returns:
+        One report per distinct query: query, plan, problems
+    """
+    reports = []
+    seen = set()
+    for query, params in queries:
+        normalized = normalize_query(query)
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        plan = explain(conn, query, params)
+        reports.append({
+            'query': normalized,
+            'plan': plan,
+            'problems': plan_problems(normalized, plan)
+        })
+    return reports
@@ -3,15 +3,15 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
 
 from ..services.auth_service import AuthService
-from ..services.categorization_service import EmailCategorizationService
+from ..services.category_rules import category_rules
 from ..models.db_models import db_manager
+from ..utils.persistence_trace import persistence_trace
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__)
 
 # Initialize services
 auth_service = AuthService()
-categorization_service = EmailCategorizationService()
 logger = logging.getLogger(__name__)
 
 def require_super_admin():
@@ -115,49 +115,127 @@ def get_sheets_info():
         logger.error(f"Get sheets info error: {str(e)}")
         return jsonify({'error': 'Failed to get sheets information'}), 500
 
+def _publish_category_rules(rules, base_version=None):
+    """Publish a rule list as the next version; returns a Flask response."""
+    user = auth_service.get_user_by_id(get_jwt_identity())
+    try:
+        rule_set = category_rules.publish(rules, created_by=user.email if user else None, base_version=base_version)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid category rules: {str(e)}'}), 400
+    
+    if not rule_set:
+        return jsonify({
+            'error': 'Category rules were changed by someone else or could not be saved; reload and retry',
+            'rules_version': category_rules.current().version
+        }), 409
+    
+    return jsonify({
+        'message': f'Category rules version {rule_set.version} published',
+        'rules_version': rule_set.version,
+        'category_rules': rule_set.source
+    }), 200
+
 @admin_bp.route('/categories', methods=['GET'])
 @jwt_required()
 @require_admin()
 def get_category_management():
-    """Get category management information (admin only)."""
+    """Get the active category rules and their version history (admin only)."""
     try:
-        category_rules = categorization_service.get_category_rules()
-        category_stats = categorization_service.get_categorization_stats()
+        rule_set = category_rules.current()
         
         return jsonify({
-            'category_rules': category_rules,
-            'categorization_stats': category_stats
+            'category_rules': rule_set.source,
+            'rules_version': rule_set.version,
+            'versions': db_manager.get_category_rule_set_history()
         }), 200
         
     except Exception as e:
         logger.error(f"Get category management error: {str(e)}")
         return jsonify({'error': 'Failed to get category information'}), 500
 
+@admin_bp.route('/categories', methods=['PUT'])
+@jwt_required()
+@require_admin()
+def replace_category_rules():
+    """
+    Publish a complete category rule list as a new version (admin only).
+    
+    Body: {"rules": [...], "base_version": n}. base_version is the version
+    the rules were edited from; publishing fails with 409 if another
+    version was published since. Restoring an old version is publishing
+    its rules again.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('rules'), list):
+            return jsonify({'error': 'Request body must be JSON with a rules list'}), 400
+        
+        return _publish_category_rules(data['rules'], data.get('base_version'))
+        
+    except Exception as e:
+        logger.error(f"Replace category rules error: {str(e)}")
+        return jsonify({'error': 'Failed to update category rules'}), 500
+
+@admin_bp.route('/categories/versions/<int:version>', methods=['GET'])
+@jwt_required()
+@require_admin()
+def get_category_rules_version(version):
+    """Get the rules of one stored category rule set version (admin only)."""
+    try:
+        rule_set = db_manager.get_category_rule_set(version)
+        
+        if not rule_set:
+            return jsonify({'error': 'Rule set version not found'}), 404
+        
+        return jsonify({
+            'rules_version': rule_set['version'],
+            'category_rules': rule_set['rules'],
+            'created_by': rule_set['created_by'],
+            'created_at': rule_set['created_at'].isoformat() if rule_set['created_at'] else None
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Get category rules version error: {str(e)}")
+        return jsonify({'error': 'Failed to get category rules version'}), 500
+
 @admin_bp.route('/categories/<category>', methods=['PUT'])
 @jwt_required()
 @require_admin()
 def update_category_rules(category):
-    """Update category rules (admin only)."""
+    """
+    Add or replace one main category's rule (admin only).
+    
+    Body: {"match": {...}, "subs": [...], "default": "...", "position": n}.
+    A new category goes at position (default: last); an existing one keeps
+    its place unless position is given.
+    """
     try:
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'Request body must be JSON'}), 400
         
-        required_fields = ['keywords', 'sender_patterns', 'priority']
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': f'Required fields: {required_fields}'}), 400
-        
-        success = categorization_service.update_category_rules(category, data)
+        if 'match' not in data:
+            return jsonify({'error': "Required fields: ['match']"}), 400
         
-        if not success:
-            return jsonify({'error': 'Failed to update category rules'}), 400
+        rule_set = category_rules.current()
+        rule = {
+            'main': category,
+            'match': data['match'],
+            'subs': data.get('subs', []),
+            'default': data.get('default', 'general')
+        }
+        rules = list(rule_set.source)
+        index = next((i for i, existing in enumerate(rules) if existing['main'] == category), None)
+        if index is not None:
+            del rules[index]
+        position = data.get('position', len(rules) if index is None else index)
+        if not isinstance(position, int) or position < 0:
+            return jsonify({'error': 'position must be a non-negative integer'}), 400
+        rules.insert(position, rule)
         
-        return jsonify({
-            'message': f'Category rules updated for: {category}',
-            'category': category,
-            'rules': data
-        }), 200
+        return _publish_category_rules(rules, rule_set.version)
         
     except Exception as e:
         logger.error(f"Update category rules error: {str(e)}")
@@ -167,37 +245,20 @@ def update_category_rules(category):
 @jwt_required()
 @require_admin()
 def delete_category(category):
-    """Delete a category (admin only)."""
+    """Delete a main category's rule (admin only)."""
     try:
-        success = categorization_service.delete_category(category)
+        rule_set = category_rules.current()
+        rules = [rule for rule in rule_set.source if rule['main'] != category]
         
-        if not success:
+        if len(rules) == len(rule_set.source):
             return jsonify({'error': 'Cannot delete category or category not found'}), 400
         
-        return jsonify({
-            'message': f'Category deleted: {category}'
-        }), 200
+        return _publish_category_rules(rules, rule_set.version)
         
     except Exception as e:
         logger.error(f"Delete category error: {str(e)}")
         return jsonify({'error': 'Failed to delete category'}), 500
 
-@admin_bp.route('/categories/stats/reset', methods=['POST'])
-@jwt_required()
-@require_admin()
-def reset_categorization_stats():
-    """Reset categorization statistics (admin only)."""
-    try:
-        categorization_service.reset_stats()
-        
-        return jsonify({
-            'message': 'Categorization statistics reset successfully'
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Reset categorization stats error: {str(e)}")
-        return jsonify({'error': 'Failed to reset categorization statistics'}), 500
-
 @admin_bp.route('/system/status', methods=['GET'])
 @jwt_required()
 @require_admin()
@@ -412,45 +473,13 @@ def update_user(user_id):
 def get_system_stats():
     """Get system statistics (admin only)."""
     try:
-        # Get email statistics from database
-        emails, total_emails = db_manager.get_emails()
-        unread_emails = sum(1 for email in emails if not email.is_read)
-        categorized_emails = sum(1 for email in emails if email.category and email.category != 'general')
-        
-        # Get email stats from database
-        email_stats = db_manager.get_email_stats()
-        
-        # Get user statistics
-        users = auth_service.get_all_users()
-        total_users = len(users)
-        active_users = sum(1 for user in users if user.get('is_active', True))
-        
-        # Get email account statistics
-        email_accounts = db_manager.get_email_accounts()
-        total_accounts = len(email_accounts)
-        active_accounts = sum(1 for acc in email_accounts if acc.is_active)
-        
-        stats = {
-            'emails': {
-                'total': total_emails,
-                'unread': unread_emails,
-                'categorized': categorized_emails,
-                'categories': email_stats.get('emails_by_category', {})
-            },
-            'users': {
-                'total': total_users,
-                'active': active_users,
-                'inactive': total_users - active_users
-            },
-            'accounts': {
-                'total': total_accounts,
-                'active': active_accounts,
-                'inactive': total_accounts - active_accounts
-            },
-            'system': {
-                'uptime': 'running',
-                'version': '1.0.0'
-            }
+        # Email, user and account totals aggregated in SQL (cached briefly)
+        fresh = request.args.get('fresh', 'false').lower() == 'true'
+        stats = dict(db_manager.get_system_metrics(max_age=0 if fresh else None))
+        stats['system'] = {
+            'uptime': 'running',
+            'version': '1.0.0',
+            'database_pool': db_manager.get_pool_status()
         }
         
         return jsonify(stats), 200
@@ -459,6 +488,47 @@ def get_system_stats():
         logger.error(f"Get system stats error: {str(e)}")
         return jsonify({'error': 'Failed to get system statistics'}), 500
 
+@admin_bp.route('/system/persistence-trace', methods=['GET'])
+@jwt_required()
+@require_admin()
+def get_persistence_trace():
+    """Get the persistence trace configuration (admin only)."""
+    return jsonify({'trace': persistence_trace.get_status()}), 200
+
+@admin_bp.route('/system/persistence-trace', methods=['PUT'])
+@jwt_required()
+@require_admin()
+def update_persistence_trace():
+    """Turn persistence tracing on or off for accounts or email ids (admin only)."""
+    try:
+        data = request.get_json()
+        
+        if data is None:
+            return jsonify({'error': 'Request body must be JSON'}), 400
+        
+        if data.get('enabled') is False:
+            persistence_trace.disable()
+        else:
+            sample_rate = data.get('sample_rate')
+            if sample_rate is not None and not isinstance(sample_rate, (int, float)):
+                return jsonify({'error': 'sample_rate must be a number between 0 and 1'}), 400
+            persistence_trace.configure(
+                accounts=data.get('accounts'),
+                email_ids=data.get('email_ids'),
+                trace_all=data.get('trace_all'),
+                sample_rate=sample_rate
+            )
+        
+        logger.info(f"Persistence trace updated: {persistence_trace.get_status()}")
+        return jsonify({
+            'message': 'Persistence trace updated',
+            'trace': persistence_trace.get_status()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Update persistence trace error: {str(e)}")
+        return jsonify({'error': 'Failed to update persistence trace'}), 500
+
 @admin_bp.route('/logs', methods=['GET'])
 @jwt_required()
 @require_admin()
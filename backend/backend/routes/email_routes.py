@@ -1,12 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
 from datetime import datetime
 from flasgger import swag_from
 
+from ..services.account_health import account_health
 from ..services.email_service import EmailService
 from ..services.auth_service import AuthService
-from ..models.db_models import db_manager
+from ..services.category_rules import category_rules
+from ..services.fetch_jobs import fetch_jobs
+from ..services.recategorization import recategorization_job
+from ..models.db_models import db_manager, encode_email_cursor
+from ..config import Config
 
 # Create blueprint
 email_bp = Blueprint('emails', __name__)
@@ -66,7 +71,8 @@ def get_accounts():
 @swag_from({
     'tags': ['Email'],
     'summary': 'Fetch emails',
-    'description': 'Manually trigger email fetching from all accounts',
+    'description': 'Queue a fetch of all accounts and return its job id at once; poll GET /fetch/<job_id> '
+                   'for progress. A fetch of the same accounts that is already queued or running is reused.',
     'security': [{'Bearer': []}],
     'parameters': [
         {
@@ -76,35 +82,32 @@ def get_accounts():
             'schema': {
                 'type': 'object',
                 'properties': {
-                    'limit': {'type': 'integer', 'default': 50}
+                    'limit': {
+                        'type': 'integer',
+                        'default': 50,
+                        'description': 'Maximum new emails per account, oldest first; '
+                                       'later fetches continue with the rest'
+                    }
                 }
             }
         }
     ],
     'responses': {
-        200: {
-            'description': 'Email fetch completed',
+        202: {
+            'description': 'Email fetch queued',
             'schema': {
                 'type': 'object',
                 'properties': {
                     'message': {'type': 'string'},
-                    'results': {
-                        'type': 'object',
-                        'properties': {
-                            'total_accounts': {'type': 'integer'},
-                            'successful_accounts': {'type': 'integer'},
-                            'failed_accounts': {'type': 'integer'},
-                            'total_emails_fetched': {'type': 'integer'},
-                            'errors': {'type': 'array', 'items': {'type': 'string'}}
-                        }
-                    }
+                    'job_id': {'type': 'string'},
+                    'job': {'type': 'object'}
                 }
             }
         }
     }
 })
 def fetch_emails():
-    """Manually trigger email fetching from all accounts."""
+    """Queue a fetch of emails from all accounts."""
     try:
         current_user_id = get_jwt_identity()
         user = auth_service.get_user_by_id(current_user_id)
@@ -116,90 +119,63 @@ def fetch_emails():
         data = request.get_json() or {}
         limit_per_account = data.get('limit', 50)
         
-        logger.info(f"Manual email fetch triggered by user: {user.email}")
-        
         # Fetch accounts from database
         accounts = db_manager.get_email_accounts()
         
         if not accounts:
             return jsonify({'error': 'No email accounts configured or accessible'}), 400
         
-        fetch_results = {
-            'total_accounts': len(accounts),
-            'successful_accounts': 0,
-            'failed_accounts': 0,
-            'total_emails_fetched': 0,
-            'errors': []
-        }
-        
-        # Fetch emails from each account
-        for account in accounts:
-            try:
-                logger.info(f"Fetching emails from: {account.email}")
-                
-                # Test connection first
-                if not email_service.test_account_connection(account):
-                    error_msg = f"Connection failed for account: {account.email}"
-                    fetch_results['errors'].append(error_msg)
-                    fetch_results['failed_accounts'] += 1
-                    continue
-                
-                # Fetch emails
-                emails = email_service.fetch_emails_from_account(account, limit_per_account)
-                
-                # Store emails in database
-                for email in emails:
-                    db_manager.save_email(email)
-                
-                fetch_results['total_emails_fetched'] += len(emails)
-                fetch_results['successful_accounts'] += 1
-                
-                # Update account stats
-                if account.email not in email_stats['emails_by_account']:
-                    email_stats['emails_by_account'][account.email] = 0
-                email_stats['emails_by_account'][account.email] += len(emails)
-                
-                # Update category stats
-                for email in emails:
-                    if email.category not in email_stats['emails_by_category']:
-                        email_stats['emails_by_category'][email.category] = 0
-                    email_stats['emails_by_category'][email.category] += 1
-                
-                logger.info(f"Fetched {len(emails)} emails from {account.email}")
-                
-            except Exception as e:
-                error_msg = f"Error fetching from {account.email}: {str(e)}"
-                fetch_results['errors'].append(error_msg)
-                fetch_results['failed_accounts'] += 1
-                email_stats['fetch_errors'] += 1
-                logger.error(error_msg)
-        
-        # Update global stats from database
-        stats = db_manager.get_email_stats()
-        email_stats.update(stats)
+        job, created = fetch_jobs.submit(accounts, limit_per_account, requested_by=user.email)
+        logger.info(f"Manual email fetch triggered by user: {user.email} "
+                    f"({'queued' if created else 'joined'} job {job.id})")
         
         return jsonify({
-            'message': 'Email fetch completed',
-            'results': fetch_results
-        }), 200
+            'message': 'Email fetch queued' if created else 'Email fetch already in progress',
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
         logger.error(f"Email fetch error: {str(e)}")
         return jsonify({'error': 'Email fetch failed'}), 500
 
+@email_bp.route('/fetch/<job_id>', methods=['GET'])
+@jwt_required()
+def get_fetch_job(job_id):
+    """Get the progress of a fetch job."""
+    job = fetch_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Fetch job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@email_bp.route('/fetch/jobs', methods=['GET'])
+@jwt_required()
+def list_fetch_jobs():
+    """List recent fetch jobs, newest first."""
+    return jsonify({'jobs': [job.to_dict() for job in fetch_jobs.list_jobs()]}), 200
+
 @email_bp.route('/', methods=['GET'])
 @jwt_required()
 @swag_from({
     'tags': ['Email'],
     'summary': 'List emails',
-    'description': 'List emails with filtering and pagination',
+    'description': 'List email summaries (snippet instead of body) with filtering and pagination; '
+                   'use GET /api/emails/<id> for the full email. Pages are fetched by cursor: pass '
+                   'pagination.next_cursor of one page as cursor to get the next. Passing page '
+                   'without cursor selects the legacy offset pagination.',
     'security': [{'Bearer': []}],
     'parameters': [
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Opaque next_cursor from the previous page'
+        },
         {
             'name': 'page',
             'in': 'query',
             'type': 'integer',
-            'default': 1
+            'description': 'Offset pagination (deprecated; slow on deep pages)'
         },
         {
             'name': 'per_page',
@@ -220,7 +196,8 @@ def fetch_emails():
         {
             'name': 'search',
             'in': 'query',
-            'type': 'string'
+            'type': 'string',
+            'description': 'Full-text filter; same syntax as GET /api/emails/search, results stay newest first'
         },
         {
             'name': 'main_category',
@@ -254,6 +231,7 @@ def fetch_emails():
                                 'from': {'type': 'string'},
                                 'to': {'type': 'string'},
                                 'date': {'type': 'string'},
+                                'snippet': {'type': 'string'},
                                 'category': {'type': 'string'},
                                 'is_read': {'type': 'boolean'}
                             }
@@ -265,7 +243,9 @@ def fetch_emails():
                             'page': {'type': 'integer'},
                             'per_page': {'type': 'integer'},
                             'total': {'type': 'integer'},
-                            'pages': {'type': 'integer'}
+                            'pages': {'type': 'integer'},
+                            'next_cursor': {'type': 'string'},
+                            'has_more': {'type': 'boolean'}
                         }
                     },
                     'filters': {
@@ -293,7 +273,8 @@ def list_emails():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor') or None
+        page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
         filters = {
@@ -342,12 +323,24 @@ def list_emails():
                 filters['is_trashed'] = False
 
         # Use access control: Admin/Super Admin see all emails, regular users see only their assigned emails
-        if user.role in ['admin', 'super_admin']:
-            # Admin/Super Admin can see all emails
-            emails, total = db_manager.get_emails(filters=filters, page=page, per_page=per_page)
+        user_id = None if user.role in ['admin', 'super_admin'] else current_user_id
+        
+        if page is not None and cursor is None:
+            # Legacy offset pagination
+            if user_id is None:
+                emails, total = db_manager.get_emails(filters=filters, page=page, per_page=per_page, summary=True)
+            else:
+                emails, total = db_manager.get_user_accessible_emails(user_id, filters=filters, page=page,
+                                                                      per_page=per_page, summary=True)
+            next_cursor = None
+            if emails and page * per_page < total:
+                next_cursor = encode_email_cursor(emails[-1].date, emails[-1].id)
         else:
-            # Regular users can only see emails from accounts they have access to
-            emails, total = db_manager.get_user_accessible_emails(current_user_id, filters=filters, page=page, per_page=per_page)
+            try:
+                emails, total, next_cursor = db_manager.get_email_page(filters=filters, per_page=per_page,
+                                                                       cursor=cursor, user_id=user_id)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
         
         return jsonify({
             'emails': [email.to_dict() for email in emails],
@@ -355,7 +348,9 @@ def list_emails():
                 'page': page,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'pages': (total + per_page - 1) // per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             },
             'filters': filters
         }), 200
@@ -364,6 +359,90 @@ def list_emails():
         logger.error(f"List emails error: {str(e)}")
         return jsonify({'error': 'Failed to list emails'}), 500
 
+@email_bp.route('/search', methods=['GET'])
+@jwt_required()
+@swag_from({
+    'tags': ['Email'],
+    'summary': 'Search emails',
+    'description': 'Full-text search over subject, sender and body, best matches first. '
+                   'Supports "exact phrases", prefix* terms, -exclusions and the field '
+                   'filters from: and subject:.',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'q',
+            'in': 'query',
+            'type': 'string',
+            'required': True
+        },
+        {
+            'name': 'page',
+            'in': 'query',
+            'type': 'integer',
+            'default': 1
+        },
+        {
+            'name': 'per_page',
+            'in': 'query',
+            'type': 'integer',
+            'default': 20
+        },
+        {
+            'name': 'account',
+            'in': 'query',
+            'type': 'string'
+        },
+        {
+            'name': 'include_trashed',
+            'in': 'query',
+            'type': 'boolean',
+            'description': 'Admins only'
+        }
+    ],
+    'responses': {
+        200: {'description': 'Email summaries with a relevance score'},
+        400: {'description': 'Missing query'}
+    }
+})
+def search_emails():
+    """Search emails ranked by relevance."""
+    try:
+        current_user_id = get_jwt_identity()
+        user = auth_service.get_user_by_id(current_user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        
+        filters = {'account': request.args.get('account')}
+        is_admin = user.role in ['admin', 'super_admin']
+        if not (is_admin and request.args.get('include_trashed', 'false').lower() == 'true'):
+            filters['is_trashed'] = False
+        
+        results, total = db_manager.search_emails(query, page=page, per_page=per_page, filters=filters,
+                                                  user_id=None if is_admin else current_user_id)
+        
+        return jsonify({
+            'emails': [dict(email.to_dict(), score=score) for email, score in results],
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            },
+            'query': query
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Search emails error: {str(e)}")
+        return jsonify({'error': 'Failed to search emails'}), 500
+
 @email_bp.route('/<email_id>', methods=['GET'])
 @jwt_required()
 def get_email(email_id):
@@ -373,11 +452,33 @@ def get_email(email_id):
         email = db_manager.get_email_by_id(email_id)
         if not email:
             return jsonify({'error': 'Email not found'}), 404
-        return jsonify({'email': email.to_dict()}), 200
+        email_data = email.to_dict()
+        # Raw source is loaded from the raw store only when asked for
+        if request.args.get('include_raw', 'false').lower() == 'true':
+            raw = email_service.load_raw_source(email)
+            email_data['raw_data'] = raw.decode('utf-8', 'replace') if raw is not None else None
+        return jsonify({'email': email_data}), 200
     except Exception as e:
         logger.error(f"Get email error: {str(e)}")
         return jsonify({'error': 'Failed to get email'}), 500
 
+@email_bp.route('/<email_id>/raw', methods=['GET'])
+@jwt_required()
+def get_email_raw(email_id):
+    """Download the raw RFC 822 source of an email."""
+    try:
+        email = db_manager.get_email_by_id(email_id)
+        if not email:
+            return jsonify({'error': 'Email not found'}), 404
+        raw = email_service.load_raw_source(email)
+        if raw is None:
+            return jsonify({'error': 'Raw source not available'}), 404
+        return Response(raw, mimetype='message/rfc822',
+                        headers={'Content-Disposition': f'attachment; filename="{email_id}.eml"'})
+    except Exception as e:
+        logger.error(f"Get raw email error: {str(e)}")
+        return jsonify({'error': 'Failed to get raw email'}), 500
+
 @email_bp.route('/<email_id>/read', methods=['POST'])
 @jwt_required()
 def mark_email_read(email_id):
@@ -557,14 +658,13 @@ def get_email_stats():
 @email_bp.route('/categories', methods=['GET'])
 @jwt_required()
 def get_categories():
-    """Get all email categories."""
+    """Get the active category rules, the ones ingest and re-categorization classify with."""
     try:
-        # Get categories from categorization service
-        categorization_service = email_service.categorization_service
+        rule_set = category_rules.current()
         
         return jsonify({
-            'categories': categorization_service.get_category_rules(),
-            'stats': categorization_service.get_categorization_stats()
+            'categories': rule_set.source,
+            'rules_version': rule_set.version
         }), 200
         
     except Exception as e:
@@ -574,7 +674,7 @@ def get_categories():
 @email_bp.route('/accounts/test', methods=['POST'])
 @jwt_required()
 def test_accounts():
-    """Test connectivity to all configured accounts."""
+    """Test connectivity to all configured accounts in parallel, reusing results cached within ACCOUNT_HEALTH_TTL."""
     try:
         current_user_id = get_jwt_identity()
         user = auth_service.get_user_by_id(current_user_id)
@@ -587,25 +687,24 @@ def test_accounts():
         if not accounts:
             return jsonify({'error': 'No accounts configured'}), 400
         
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        db_manager.release_connection()  # not held across IMAP round trips
+        health = account_health.check_many(accounts, max_age=0 if refresh else None)
         test_results = []
         
         for account in accounts:
-            try:
-                is_connected = email_service.test_account_connection(account)
-                test_results.append({
-                    'email': account.email,
-                    'status': 'connected' if is_connected else 'failed',
-                    'imap_server': account.imap_server,
-                    'imap_port': account.imap_port
-                })
-            except Exception as e:
-                test_results.append({
-                    'email': account.email,
-                    'status': 'error',
-                    'error': str(e),
-                    'imap_server': account.imap_server,
-                    'imap_port': account.imap_port
-                })
+            account_result = health[account.email]
+            test_results.append({
+                'email': account.email,
+                'status': 'connected' if account_result['connected'] else 'failed',
+                'error': account_result['error'],
+                'auth_ok': account_result['auth_ok'],
+                'capabilities': account_result['capabilities'],
+                'checked_at': account_result['checked_at'],
+                'cached': account_result['cached'],
+                'imap_server': account.imap_server,
+                'imap_port': account.imap_port
+            })
         
         return jsonify({
             'test_results': test_results,
@@ -632,8 +731,10 @@ def mark_all_emails_read():
 @jwt_required()
 @swag_from({
     'tags': ['Email'],
-    'summary': 'Categorize stored emails in batch',
-    'description': 'Smart batch categorization for stored emails (after filtering) to minimize AI token usage',
+    'summary': 'Re-categorize stored emails',
+    'description': 'Re-categorize specific emails now, or start the background job that re-categorizes every '
+                   'stored email categorized under an older rule set version. The job resumes an unfinished '
+                   'run unless restart is set; follow it with GET /categorize/status.',
     'security': [{'Bearer': []}],
     'parameters': [
         {
@@ -646,36 +747,31 @@ def mark_all_emails_read():
                     'email_ids': {
                         'type': 'array',
                         'items': {'type': 'string'},
-                        'description': 'Specific email IDs to categorize'
+                        'description': 'Specific email IDs to categorize now (at most RECATEGORIZE_CHUNK_SIZE)'
                     },
-                    'limit': {'type': 'integer', 'default': 10},
-                    'priority': {
-                        'type': 'string',
-                        'enum': ['recent', 'unread', 'all'],
-                        'default': 'recent'
-                    }
+                    'restart': {'type': 'boolean', 'default': False}
                 }
             }
         }
     ],
     'responses': {
         200: {
-            'description': 'Batch categorization completed',
+            'description': 'Specific emails categorized',
             'schema': {
                 'type': 'object',
                 'properties': {
                     'success': {'type': 'boolean'},
-                    'message': {'type': 'string'},
                     'categorized': {'type': 'integer'},
                     'skipped': {'type': 'integer'},
                     'errors': {'type': 'array', 'items': {'type': 'string'}}
                 }
             }
-        }
+        },
+        202: {'description': 'Background job started; body is the job status'}
     }
 })
 def categorize_emails_batch():
-    """Smart batch categorization for stored emails to minimize AI token usage."""
+    """Re-categorize specific emails, or start the background re-categorization job."""
     try:
         current_user_id = get_jwt_identity()
         user = auth_service.get_user_by_id(current_user_id)
@@ -685,20 +781,15 @@ def categorize_emails_batch():
         
         data = request.get_json() or {}
         email_ids = data.get('email_ids')
-        limit = data.get('limit', 10)
-        priority = data.get('priority', 'recent')
         
-        logger.info(f"Batch categorization requested by user: {user.email}, limit: {limit}, priority: {priority}")
-        
-        # Use stored email categorization (after filtering)
         if email_ids:
-            # Categorize specific emails
-            result = email_service.categorize_emails_batch(email_ids=email_ids, limit=limit)
-        else:
-            # Use enhanced categorization for stored emails
-            result = email_service.categorize_stored_emails_batch(limit=limit, priority=priority)
+            if not isinstance(email_ids, list) or len(email_ids) > Config.RECATEGORIZE_CHUNK_SIZE:
+                return jsonify({'error': f'email_ids must be a list of at most {Config.RECATEGORIZE_CHUNK_SIZE} ids'}), 400
+            logger.info(f"Categorization of {len(email_ids)} emails requested by user: {user.email}")
+            return jsonify(recategorization_job.categorize_ids([str(email_id) for email_id in email_ids])), 200
         
-        return jsonify(result), 200
+        logger.info(f"Background re-categorization requested by user: {user.email}")
+        return jsonify(recategorization_job.start(restart=bool(data.get('restart')))), 202
         
     except Exception as e:
         logger.error(f"Batch categorization error: {str(e)}")
@@ -710,6 +801,26 @@ def categorize_emails_batch():
             'errors': [str(e)]
         }), 500
 
+@email_bp.route('/categorize/status', methods=['GET'])
+@jwt_required()
+def get_categorization_job_status():
+    """Get the progress of the background re-categorization job."""
+    try:
+        return jsonify(recategorization_job.get_status()), 200
+    except Exception as e:
+        logger.error(f"Get categorization job status error: {str(e)}")
+        return jsonify({'error': 'Failed to get categorization job status'}), 500
+
+@email_bp.route('/categorize/stop', methods=['POST'])
+@jwt_required()
+def stop_categorization_job():
+    """Pause the background re-categorization job; POST /categorize/batch continues it."""
+    try:
+        return jsonify(recategorization_job.stop(timeout=30)), 200
+    except Exception as e:
+        logger.error(f"Stop categorization job error: {str(e)}")
+        return jsonify({'error': 'Failed to stop categorization job'}), 500
+
 @email_bp.route('/categorize/uncategorized', methods=['GET'])
 @jwt_required()
 @swag_from({
@@ -79,12 +79,7 @@ def get_reply_template(email_id):
         user_id = get_jwt_identity()
         
         # Find email in database
-        all_emails = db_manager.get_emails(limit=1000)
-        original_email = None
-        for email in all_emails:
-            if email.id == email_id:
-                original_email = email
-                break
+        original_email = db_manager.get_email_by_id(email_id)
         
         if not original_email:
             return jsonify({'error': 'Email not found'}), 404
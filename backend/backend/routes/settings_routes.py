@@ -5,6 +5,7 @@ from datetime import datetime
 from flasgger import swag_from
 from urllib.parse import unquote
 
+from ..services.account_health import account_health
 from ..services.auth_service import AuthService
 from ..services.email_service import EmailService
 from ..models.email_models import EmailAccount
@@ -124,9 +125,11 @@ def add_email_account():
 
         # Test connection
         logger.info(f"Testing connection for {account.email}")
-        if not email_service.test_account_connection(account):
-            logger.error(f"Connection test failed for {account.email}")
-            return jsonify({'error': 'Failed to connect to email account'}), 400
+        db_manager.release_connection()  # not held across IMAP round trips
+        health = account_health.check(account, max_age=0)
+        if not health['connected']:
+            logger.error(f"Connection test failed for {account.email}: {health['error']}")
+            return jsonify({'error': 'Failed to connect to email account', 'health': health}), 400
 
         logger.info(f"Connection test successful for {account.email}")
 
@@ -187,6 +190,7 @@ def delete_email_account(email):
             return jsonify({'error': 'Admin access required'}), 403
             
         if db_manager.delete_email_account(decoded_email):
+            account_health.invalidate(decoded_email)
             return jsonify({'message': 'Email account deleted successfully'}), 200
         else:
             return jsonify({'error': 'Email account not found'}), 404
@@ -199,7 +203,8 @@ def delete_email_account(email):
 @swag_from({
     'tags': ['Settings'],
     'summary': 'Test an email account',
-    'description': 'Test the connection to a specific email account',
+    'description': 'Test the connection to a specific email account. A result from the last '
+                   'ACCOUNT_HEALTH_TTL seconds is reused unless refresh is set.',
     'security': [{'Bearer': []}],
     'parameters': [
         {
@@ -207,6 +212,12 @@ def delete_email_account(email):
             'in': 'path',
             'required': True,
             'type': 'string'
+        },
+        {
+            'name': 'refresh',
+            'in': 'query',
+            'type': 'boolean',
+            'default': False
         }
     ],
     'responses': {
@@ -215,7 +226,8 @@ def delete_email_account(email):
             'schema': {
                 'type': 'object',
                 'properties': {
-                    'message': {'type': 'string'}
+                    'message': {'type': 'string'},
+                    'health': {'type': 'object'}
                 }
             }
         }
@@ -238,10 +250,13 @@ def test_email_account(email):
         if not account:
             return jsonify({'error': 'Email account not found'}), 404
 
-        if email_service.test_account_connection(account):
-            return jsonify({'message': 'Email account test successful'}), 200
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        db_manager.release_connection()  # not held across IMAP round trips
+        health = account_health.check(account, max_age=0 if refresh else None)
+        if health['connected']:
+            return jsonify({'message': 'Email account test successful', 'health': health}), 200
         else:
-            return jsonify({'error': 'Failed to connect to email account'}), 400
+            return jsonify({'error': 'Failed to connect to email account', 'health': health}), 400
     except Exception as e:
         logger.error(f"Error testing email account: {str(e)}")
         return jsonify({'error': 'Failed to test email account'}), 500
@@ -251,8 +266,17 @@ def test_email_account(email):
 @swag_from({
     'tags': ['Settings'],
     'summary': 'Test all email accounts',
-    'description': 'Test the connection to all configured email accounts',
+    'description': 'Test the connection to all configured email accounts in parallel. Results from the '
+                   'last ACCOUNT_HEALTH_TTL seconds are reused unless refresh is set.',
     'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'name': 'refresh',
+            'in': 'query',
+            'type': 'boolean',
+            'default': False
+        }
+    ],
     'responses': {
         200: {
             'description': 'All email accounts tested successfully',
@@ -266,7 +290,8 @@ def test_email_account(email):
                             'type': 'object',
                             'properties': {
                                 'email': {'type': 'string'},
-                                'status': {'type': 'string'}
+                                'status': {'type': 'string'},
+                                'health': {'type': 'object'}
                             }
                         }
                     }
@@ -286,13 +311,17 @@ def test_all_email_accounts():
             return jsonify({'error': 'Admin access required'}), 403
             
         accounts = db_manager.get_email_accounts()
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        db_manager.release_connection()  # not held across IMAP round trips
+        health = account_health.check_many(accounts, max_age=0 if refresh else None)
         results = []
 
         for account in accounts:
-            status = 'success' if email_service.test_account_connection(account) else 'failed'
+            status = 'success' if health[account.email]['connected'] else 'failed'
             results.append({
                 'email': account.email,
-                'status': status
+                'status': status,
+                'health': health[account.email]
             })
 
         return jsonify({
@@ -389,8 +418,10 @@ def update_email_account(email):
         
         # Test connection if credentials changed
         if 'password' in data or 'imap_server' in data or 'imap_port' in data:
-            if not email_service.test_account_connection(account):
-                return jsonify({'error': 'Failed to connect with updated credentials'}), 400
+            db_manager.release_connection()  # not held across IMAP round trips
+            health = account_health.check(account, max_age=0)
+            if not health['connected']:
+                return jsonify({'error': 'Failed to connect with updated credentials', 'health': health}), 400
         
         # Save changes
         if db_manager.add_email_account(account):  # This will update existing account
@@ -0,0 +1,192 @@
+import imaplib
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .imap_session import ImapAuthError, imap_sessions
+from ..config import Config
+from ..models.email_models import EmailAccount, account_fingerprint
+from ..utils.account_pool import AccountSyncPool
+
+logger = logging.getLogger(__name__)
+
+class _Health:
+    """Last known connectivity of one account."""
+
+    def __init__(self, fingerprint: tuple, status: str, error: Optional[str], capabilities: tuple, elapsed: float):
+        self.fingerprint = fingerprint
+        self.status = status  # ok, auth_failed, unreachable, error
+        self.error = error
+        self.capabilities = capabilities
+        self.elapsed = elapsed
+        self.checked = time.monotonic()
+        self.checked_at = datetime.now()
+
+    def to_dict(self, account_email: str, cached: bool) -> Dict:
+        return {
+            'email': account_email,
+            'status': self.status,
+            'connected': self.status == 'ok',
+            'auth_ok': None if self.status == 'unreachable' else self.status != 'auth_failed',
+            'error': self.error,
+            'capabilities': list(self.capabilities),
+            'checked_at': self.checked_at.isoformat(),
+            'age': round(time.monotonic() - self.checked, 1),
+            'elapsed': round(self.elapsed, 2),
+            'cached': cached
+        }
+
+def classify_error(error: Exception) -> str:
+    """Map an exception from IMAP work (or one raised from it) to a health status."""
+    while error is not None:
+        if isinstance(error, ImapAuthError):
+            return 'auth_failed'
+        if isinstance(error, (imaplib.IMAP4.abort, OSError)):
+            return 'unreachable'
+        error = error.__cause__
+    return 'error'
+
+class AccountHealthCache:
+    """
+    Last-known connectivity, auth result and capabilities per account.
+
+    Results come from explicit checks and from real IMAP work (fetches run
+    through track()), and are reused for ACCOUNT_HEALTH_TTL seconds. A check
+    goes through the pooled IMAP session, so an account that is already
+    logged in costs one SELECT rather than a login/logout. check_many()
+    checks stale accounts in parallel. Results are tied to the account's
+    connection details and are ignored once those change.
+    """
+
+    def __init__(self, sessions=None, ttl: int = None):
+        self.sessions = sessions or imap_sessions
+        self.ttl = Config.ACCOUNT_HEALTH_TTL if ttl is None else ttl
+        self._health: Dict[str, _Health] = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def record(self, account: EmailAccount, error: Exception = None, elapsed: float = 0.0) -> Dict:
+        """
+        Store the outcome of IMAP work on an account.
+
+        Args:
+            account: Account the work ran against
+            error: Exception it failed with, None if it succeeded
+            elapsed: Seconds the work took
+
+        Returns:
+            The stored health (see get)
+        """
+        status = 'ok' if error is None else classify_error(error)
+        health = _Health(account_fingerprint(account), status, None if error is None else str(error),
+                         self.sessions.capabilities(account.email), elapsed)
+        with self._lock:
+            self._health[account.email] = health
+        return health.to_dict(account.email, False)
+
+    def get(self, account: EmailAccount, max_age: float = None) -> Optional[Dict]:
+        """
+        Get the cached health of an account if it is fresh enough.
+
+        Args:
+            account: Account to look up
+            max_age: Seconds a result may be old; defaults to the TTL
+
+        Returns:
+            Dictionary with status (ok, auth_failed, unreachable, error),
+            connected, auth_ok, error, capabilities, checked_at, age, elapsed
+            and cached; None if there is no usable result
+        """
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            health = self._health.get(account.email)
+        if health is None or health.fingerprint != account_fingerprint(account):
+            return None
+        if time.monotonic() - health.checked > max_age:
+            return None
+        return health.to_dict(account.email, True)
+
+    def _probe(self, account: EmailAccount) -> Dict:
+        started = time.monotonic()
+        try:
+            with self.sessions.session(account):
+                pass
+        except Exception as e:
+            logger.info(f"Health check failed for {account.email}: {str(e)}")
+            return self.record(account, e, time.monotonic() - started)
+        return self.record(account, elapsed=time.monotonic() - started)
+
+    def check(self, account: EmailAccount, max_age: float = None) -> Dict:
+        """Get an account's health, checking it now unless a fresh result is cached (see get)."""
+        return self.get(account, max_age) or self._probe(account)
+
+    def check_many(self, accounts: List[EmailAccount], max_age: float = None) -> Dict[str, Dict]:
+        """
+        Get the health of several accounts, checking stale ones in parallel.
+
+        Returns:
+            Dictionary keyed by account email (see get)
+        """
+        results = {}
+        stale = []
+        for account in accounts:
+            health = self.get(account, max_age)
+            if health:
+                results[account.email] = health
+            else:
+                stale.append(account)
+        if not stale:
+            return results
+
+        with self._lock:
+            if not self._pool:
+                self._pool = AccountSyncPool()
+        outcomes = self._pool.run(stale, self._probe, 'health_check')
+        for account in stale:
+            outcome = outcomes.get(account.email, {})
+            if outcome.get('status') == 'ok':
+                results[account.email] = outcome['result']
+            else:
+                # Timed out, or a check of this account was already running
+                reason = outcome.get('status', 'error')
+                results[account.email] = self.get(account, float('inf')) or self.record(
+                    account, TimeoutError(f"Health check {reason}"), outcome.get('elapsed', 0.0))
+        return results
+
+    def preflight(self, account: EmailAccount):
+        """
+        Refuse work on an account whose credentials were rejected within the TTL.
+
+        Raises:
+            ImapAuthError: With the cached error, without contacting the server
+        """
+        health = self.get(account)
+        if health and health['status'] == 'auth_failed':
+            raise ImapAuthError(f"Authentication failed {health['age']:.0f}s ago: {health['error']}")
+
+    def track(self, account: EmailAccount, func: Callable, *args, **kwargs):
+        """Run func(account, *args, **kwargs) and record its outcome as the account's health."""
+        started = time.monotonic()
+        try:
+            result = func(account, *args, **kwargs)
+        except Exception as e:
+            self.record(account, e, time.monotonic() - started)
+            raise
+        self.record(account, elapsed=time.monotonic() - started)
+        return result
+
+    def invalidate(self, account_email: str):
+        """Forget an account's health, e.g. after it was removed."""
+        with self._lock:
+            self._health.pop(account_email, None)
+
+    def get_status(self) -> Dict:
+        """Get every account's last known health."""
+        with self._lock:
+            entries = list(self._health.items())
+        return {account_email: health.to_dict(account_email, True) for account_email, health in entries}
+
+# Shared cache for the web process
+account_health = AccountHealthCache()
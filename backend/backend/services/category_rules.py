@@ -0,0 +1,339 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .keyword_matcher import KeywordMatcher
+from ..config import Config
+from ..models.db_models import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Fields a rule can match on: lowercased subject, lowercased sender and the
+# sender's domain. Matching is substring based, as 'keyword in field'.
+RULE_FIELDS = ('subject', 'sender', 'domain')
+
+# Sub-category placeholders resolved per email by EmailService
+SENDER_NAME = '{sender_name}'
+COMPANY_NAME = '{company_name}'
+
+_BANK_KEYWORDS = ['bank', 'sbi', 'hdfc', 'icici', 'axis', 'kotak', 'yes', 'pnb', 'union']
+_SOCIAL_KEYWORDS = ['facebook', 'twitter', 'linkedin', 'instagram', 'youtube']
+
+def _everywhere(*keywords: str) -> Dict[str, List[str]]:
+    return {field: list(keywords) for field in RULE_FIELDS}
+
+def _social(platform: str) -> Dict:
+    return {'name': platform, 'match': {'subject': [platform], 'sender': [platform], 'domain': [f'{platform}.com']}}
+
+# Categories in priority order: an email gets the first main category whose
+# 'match' hits, and within it the first sub-category whose 'match' hits, or
+# the category's 'default'. Rules are plain data so they can be stored and
+# edited outside the code.
+DEFAULT_CATEGORY_RULES: List[Dict] = [
+    {
+        'main': 'bank',
+        'match': {'subject': _BANK_KEYWORDS, 'sender': _BANK_KEYWORDS,
+                  'domain': ['sbi.co.in', 'hdfcbank.com', 'icicibank.com', 'axisbank.com', 'kotak.com',
+                             'yesbank.in', 'pnb.co.in']},
+        'subs': [
+            {'name': 'state_bank_of_india', 'match': _everywhere('sbi')},
+            {'name': 'hdfc_bank', 'match': _everywhere('hdfc')},
+            {'name': 'icici_bank', 'match': _everywhere('icici')},
+            {'name': 'axis_bank', 'match': _everywhere('axis')},
+            {'name': 'kotak_bank', 'match': _everywhere('kotak')},
+            {'name': 'yes_bank', 'match': _everywhere('yes')},
+            {'name': 'punjab_national_bank', 'match': _everywhere('pnb')},
+            {'name': 'union_bank', 'match': _everywhere('union')},
+            {'name': 'canara_bank', 'match': _everywhere('canara')},
+            {'name': 'bank_of_baroda', 'match': _everywhere('bankofbaroda')},
+            {'name': 'idbi_bank', 'match': _everywhere('idbi')},
+        ],
+        'default': SENDER_NAME
+    },
+    {
+        'main': 'company',
+        'match': {'subject': ['invoice', 'receipt', 'statement', 'account', 'business', 'corporate']},
+        'subs': [],
+        'default': COMPANY_NAME
+    },
+    {
+        'main': 'support',
+        'match': {'subject': ['support', 'help', 'issue', 'problem', 'ticket', 'assistance']},
+        'subs': [
+            {'name': 'technical', 'match': {'subject': ['technical', 'tech', 'software', 'app']}},
+            {'name': 'billing', 'match': {'subject': ['billing', 'payment', 'invoice']}},
+        ],
+        'default': 'general'
+    },
+    {
+        'main': 'newsletter',
+        'match': {'subject': ['newsletter', 'news', 'update', 'digest', 'weekly', 'monthly']},
+        'subs': [
+            {'name': 'tech_news', 'match': {'subject': ['tech', 'technology', 'software']}},
+            {'name': 'business_news', 'match': {'subject': ['business', 'finance', 'market']}},
+            {'name': 'health_news', 'match': {'subject': ['health', 'medical', 'fitness']}},
+        ],
+        'default': 'general_news'
+    },
+    {
+        'main': 'billing',
+        'match': {'subject': ['invoice', 'payment', 'bill', 'receipt', 'statement', 'due']},
+        'subs': [
+            {'name': 'invoice', 'match': {'subject': ['invoice']}},
+            {'name': 'payment', 'match': {'subject': ['payment']}},
+            {'name': 'receipt', 'match': {'subject': ['receipt']}},
+        ],
+        'default': 'billing'
+    },
+    {
+        'main': 'order',
+        'match': {'subject': ['order', 'purchase', 'buy', 'shipping', 'delivery', 'tracking']},
+        'subs': [
+            {'name': 'shipping', 'match': {'subject': ['shipping', 'delivery']}},
+            {'name': 'tracking', 'match': {'subject': ['tracking']}},
+            {'name': 'order_confirmation', 'match': {'subject': ['order']}},
+        ],
+        'default': 'order'
+    },
+    {
+        'main': 'social',
+        'match': {'subject': _SOCIAL_KEYWORDS, 'sender': _SOCIAL_KEYWORDS,
+                  'domain': [f'{platform}.com' for platform in _SOCIAL_KEYWORDS]},
+        'subs': [_social(platform) for platform in _SOCIAL_KEYWORDS],
+        'default': 'other_social'
+    },
+    {
+        'main': 'security',
+        'match': {'subject': ['security', 'password', 'login', 'verification', 'otp', '2fa']},
+        'subs': [
+            {'name': 'otp', 'match': {'subject': ['otp', 'verification']}},
+            {'name': 'password', 'match': {'subject': ['password']}},
+            {'name': 'login', 'match': {'subject': ['login']}},
+        ],
+        'default': 'security'
+    },
+    {
+        'main': 'meeting',
+        'match': {'subject': ['meeting', 'appointment', 'schedule', 'calendar', 'call']},
+        'subs': [
+            {'name': 'appointment', 'match': {'subject': ['appointment']}},
+            {'name': 'call', 'match': {'subject': ['call']}},
+        ],
+        'default': 'meeting'
+    },
+    {
+        'main': 'career',
+        'match': {'subject': ['job', 'career', 'application', 'resume', 'interview', 'position']},
+        'subs': [
+            {'name': 'interview', 'match': {'subject': ['interview']}},
+            {'name': 'application', 'match': {'subject': ['application']}},
+        ],
+        'default': 'job'
+    },
+    {
+        'main': 'notification',
+        'match': {'subject': ['notification', 'alert', 'reminder', 'update']},
+        'subs': [
+            {'name': 'failure', 'match': {'subject': ['failed', 'error']}},
+            {'name': 'success', 'match': {'subject': ['success', 'completed']}},
+        ],
+        'default': 'general'
+    },
+]
+
+# Used when no category matches
+FALLBACK_CATEGORY = ('general', SENDER_NAME)
+
+# Version of DEFAULT_CATEGORY_RULES; stored rule sets start at 1
+DEFAULT_RULES_VERSION = 0
+
+Match = Tuple[Tuple[str, FrozenSet[str]], ...]
+
+def _compile_match(match: Dict[str, List[str]]) -> Match:
+    if not isinstance(match, dict):
+        raise ValueError("'match' must be an object of field -> keyword list")
+    unknown = set(match) - set(RULE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown rule fields: {sorted(unknown)}")
+    for field, keywords in match.items():
+        if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+            raise ValueError(f"Keywords for '{field}' must be a list of strings")
+    return tuple((field, frozenset(k.lower() for k in keywords)) for field, keywords in match.items() if keywords)
+
+def _check_rule(rule: Dict):
+    if not isinstance(rule, dict) or not isinstance(rule.get('main'), str) or not rule['main']:
+        raise ValueError("Every rule needs a non-empty 'main' category name")
+    if 'match' not in rule:
+        raise ValueError(f"Rule '{rule['main']}' has no 'match'")
+    if not isinstance(rule.get('subs', []), list):
+        raise ValueError(f"'subs' of rule '{rule['main']}' must be a list")
+    for sub in rule.get('subs', []):
+        if not isinstance(sub, dict) or not isinstance(sub.get('name'), str) or 'match' not in sub:
+            raise ValueError(f"Sub-rules of '{rule['main']}' need a 'name' and a 'match'")
+
+def _first_hit(matches: List[Match]) -> Dict[str, Dict[str, int]]:
+    """Per field, each keyword mapped to the index of the first match using it."""
+    first: Dict[str, Dict[str, int]] = {field: {} for field in RULE_FIELDS}
+    for index, match in enumerate(matches):
+        for field, keywords in match:
+            for keyword in keywords:
+                first[field].setdefault(keyword, index)
+    return first
+
+def _lowest(first: Dict[str, Dict[str, int]], found: Dict[str, FrozenSet[str]]) -> Optional[int]:
+    indexes = [first[field][keyword] for field, keywords in found.items()
+               for keyword in keywords if keyword in first[field]]
+    return min(indexes) if indexes else None
+
+@dataclass(frozen=True)
+class _CompiledRule:
+    main: str
+    match: Match
+    subs: Tuple[Tuple[str, Match], ...]
+    default: str
+
+class CategoryRuleSet:
+    """
+    A category rule list compiled for fast classification.
+
+    Raises ValueError for a malformed rule list, so compiling doubles as
+    validation before a rule set is stored.
+
+    Every keyword any rule looks for in a field goes into that field's
+    KeywordMatcher, so classifying an email scans each field once. Each
+    keyword found points at the first rule (and, within a rule, the first
+    sub-rule) it belongs to, so the winning rule is the lowest of those
+    instead of testing every rule in turn.
+    """
+
+    def __init__(self, rules: List[Dict] = None, version: int = DEFAULT_RULES_VERSION):
+        rules = DEFAULT_CATEGORY_RULES if rules is None else rules
+        if not isinstance(rules, list):
+            raise ValueError("Category rules must be a list of rules")
+        for rule in rules:
+            _check_rule(rule)
+        mains = [rule['main'] for rule in rules]
+        if len(set(mains)) != len(mains):
+            raise ValueError("Main category names must be unique")
+        self.version = version
+        self.source = rules
+        self.rules = tuple(
+            _CompiledRule(
+                main=rule['main'],
+                match=_compile_match(rule['match']),
+                subs=tuple((sub['name'], _compile_match(sub['match'])) for sub in rule.get('subs', [])),
+                default=rule.get('default', 'general')
+            )
+            for rule in rules
+        )
+        keywords = {field: set() for field in RULE_FIELDS}
+        for rule in self.rules:
+            for match in [rule.match] + [sub_match for _, sub_match in rule.subs]:
+                for field, field_keywords in match:
+                    keywords[field] |= field_keywords
+        self._matchers = {field: KeywordMatcher(keywords[field]) for field in RULE_FIELDS if keywords[field]}
+        self._first_rule = _first_hit([rule.match for rule in self.rules])
+        self._first_sub = [_first_hit([sub_match for _, sub_match in rule.subs]) for rule in self.rules]
+
+    def classify(self, subject: str, sender: str, domain: str) -> Tuple[str, str]:
+        """
+        Classify lowercased email fields.
+
+        Returns:
+            (main_category, sub_category); sub_category may be SENDER_NAME or
+            COMPANY_NAME, which the caller resolves for the email
+        """
+        texts = {'subject': subject, 'sender': sender, 'domain': domain}
+        found = {field: matcher.find(texts[field]) for field, matcher in self._matchers.items()}
+
+        rule_index = _lowest(self._first_rule, found)
+        if rule_index is None:
+            return FALLBACK_CATEGORY
+        rule = self.rules[rule_index]
+        sub_index = _lowest(self._first_sub[rule_index], found)
+        if sub_index is None:
+            return rule.main, rule.default
+        return rule.main, rule.subs[sub_index][0]
+
+class CategoryRuleRegistry:
+    """
+    The active category rule set, stored in the database.
+
+    Rule sets are immutable versions in category_rule_sets and the highest
+    version is active; version 0 is DEFAULT_CATEGORY_RULES, used until one
+    is published. current() looks for a newer version at most every
+    CATEGORY_RULES_RELOAD_INTERVAL seconds, so a rule set published by any
+    process is picked up by all of them without a restart. A new version is
+    compiled first and then swapped in by rebinding one attribute, so a
+    classification sees either the old or the new set, never a mix.
+    """
+
+    def __init__(self, db=None, reload_interval: int = None):
+        self.db = db or db_manager
+        self.reload_interval = Config.CATEGORY_RULES_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._active = CategoryRuleSet()
+        self._checked_at = None
+        self._reload_lock = threading.Lock()
+
+    def current(self) -> CategoryRuleSet:
+        """The active rule set, reloading it first if the check interval has passed."""
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            # One thread polls; the others keep classifying with the active set
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    self.reload()
+                finally:
+                    self._reload_lock.release()
+        return self._active
+
+    def reload(self) -> bool:
+        """
+        Swap in the newest stored rule set if it is newer than the active one.
+
+        Returns:
+            True if a new version was activated
+        """
+        self._checked_at = time.monotonic()
+        stored = self.db.get_latest_category_rule_set(newer_than=self._active.version)
+        if not stored:
+            return False
+        try:
+            rule_set = CategoryRuleSet(stored['rules'], version=stored['version'])
+        except ValueError as e:
+            logger.error(f"Ignoring invalid category rule set version {stored['version']}: {str(e)}")
+            return False
+        self._active = rule_set
+        logger.info(f"Activated category rule set version {rule_set.version}")
+        return True
+
+    def publish(self, rules: List[Dict], created_by: str = None, base_version: int = None) -> Optional[CategoryRuleSet]:
+        """
+        Store rules as the next version and activate them.
+
+        Args:
+            rules: Rule list in the DEFAULT_CATEGORY_RULES format
+            created_by: Who published the rules, for the version history
+            base_version: Version the rules were edited from; defaults to
+                the active version
+
+        Returns:
+            The activated rule set, or None if it could not be stored,
+            including when another version was published since base_version
+
+        Raises:
+            ValueError: If the rules are malformed
+        """
+        base_version = self._active.version if base_version is None else base_version
+        rule_set = CategoryRuleSet(rules, version=base_version + 1)
+        if not self.db.save_category_rule_set(rule_set.version, rules, created_by):
+            self.reload()
+            return None
+        if rule_set.version > self._active.version:
+            self._active = rule_set
+        logger.info(f"Published category rule set version {rule_set.version}")
+        return rule_set
+
+# Active rules shared by the whole process
+category_rules = CategoryRuleRegistry()
@@ -8,298 +8,336 @@ import hashlib
 import json
 from email.utils import parsedate_to_datetime
 import re
+import time
 
 from ..models.email_models import Email, EmailAccount
-from .categorization_service import EmailCategorizationService
+from .imap_session import imap_sessions
+from .mime_ingest import ingest_message
+from .raw_store import raw_store
+from .category_rules import COMPANY_NAME, SENDER_NAME, CategoryRuleSet, category_rules
 # from services.notification_service import NotificationService
 from ..config import Config
 from ..models.db_models import db_manager
 
 logger = logging.getLogger(__name__)
 
+# Attribute patterns for multi-message UID FETCH responses
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+_FETCH_FLAGS_RE = re.compile(rb'FLAGS \(([^)]*)\)')
+_FETCH_SIZE_RE = re.compile(rb'RFC822\.SIZE (\d+)')
+_FETCH_INTERNALDATE_RE = re.compile(rb'INTERNALDATE "[^"]+"')
+
+# UIDs per UID FETCH (RFC822.SIZE) when planning byte-bounded chunks
+_SIZE_FETCH_WINDOW = 1000
+
 class EmailService:
     """Service for handling email operations."""
     
     def __init__(self):
         """Initialize the email service."""
         self.db = db_manager
-        self.categorization_service = EmailCategorizationService()
+        self.sessions = imap_sessions
         # self.notification_service = NotificationService()
     
-    def fetch_emails(self, account: EmailAccount) -> List[Email]:
-        """
-        Fetch new emails from the specified account.
-        
-        Args:
-            account: EmailAccount object containing connection details
-            
-        Returns:
-            List of fetched Email objects
-        """
-        try:
-            # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
-            mail.login(account.email, account.password)
-            mail.select('INBOX')
-            
-            # Search for new emails since last check
-            _, messages = mail.search(None, 'ALL')
-            
-            fetched_emails = []
-            for num in messages[0].split():
-                # Use PEEK to avoid marking as read
-                _, msg_data = mail.fetch(num, '(BODY.PEEK[])')
-                email_body = msg_data[0][1]
-                email_message = email.message_from_bytes(email_body)
-                
-                # Extract email details
-                subject = self._decode_email_header(email_message['subject']) or ''
-                sender = self._decode_email_header(email_message['from']) or ''
-                date_str = email_message['date']
-                date = self.robust_parse_date(date_str)
-                
-                # Get email body
-                body = ""
-                if email_message.is_multipart():
-                    for part in email_message.walk():
-                        if part.get_content_type() == "text/plain":
-                            payload = part.get_payload(decode=True)
-                            if payload is not None:
-                                try:
-                                    body = payload.decode('utf-8')
-                                except Exception as e_utf8:
-                                    try:
-                                        body = payload.decode('latin1')
-                                    except Exception as e_latin1:
-                                        try:
-                                            body = payload.decode('utf-8', errors='ignore')
-                                        except Exception as e_ignore:
-                                            logger.error(f"Body decode failed for email {num} in {account.email}: {e_ignore}")
-                                            body = ''
-                            break
-                else:
-                    payload = email_message.get_payload(decode=True)
-                    if payload is not None:
-                        try:
-                            body = payload.decode('utf-8')
-                        except Exception as e_utf8:
-                            try:
-                                body = payload.decode('latin1')
-                            except Exception as e_latin1:
-                                try:
-                                    body = payload.decode('utf-8', errors='ignore')
-                                except Exception as e_ignore:
-                                    logger.error(f"Body decode failed for email {num} in {account.email}: {e_ignore}")
-                                    body = ''
-                
-                # Create Email object
-                raw_data_str = ''
-                try:
-                    raw_data_str = email_body.decode('utf-8')
-                except Exception as e_utf8:
-                    try:
-                        raw_data_str = email_body.decode('latin1')
-                    except Exception as e_latin1:
-                        try:
-                            raw_data_str = email_body.decode('utf-8', errors='ignore')
-                        except Exception as e_ignore:
-                            logger.error(f"Raw data decode failed for email {num} in {account.email}: {e_ignore}")
-                            raw_data_str = ''
-                email_obj = Email(
-                    id=str(num),
-                    account_email=account.email,
-                    subject=subject,
-                    sender=sender,
-                    date=self.ensure_datetime(date),
-                    body=body,
-                    raw_data=raw_data_str,
-                    category='general'  # Will be categorized later
-                )
-                # Always set email_hash before saving
-                email_obj.email_hash = self.generate_email_hash(email_obj)
-                # Ensure date and created_at are datetime
-                email_obj.date = self.ensure_datetime(email_obj.date)
-                email_obj.created_at = self.ensure_datetime(getattr(email_obj, 'created_at', datetime.now()))
-                # Save to database
-                if self.db.save_email(email_obj):
-                    fetched_emails.append(email_obj)
-            
-            # Update last checked time
-            account.last_checked = datetime.now()
-            self.db.update_email_account(account)
-            
-            # Categorize new emails
-            for email_obj in fetched_emails:
-                # Use enhanced categorization
-                main_category, sub_category = self._enhanced_categorize_email(email_obj)
-                email_obj.main_category = main_category
-                email_obj.sub_category = sub_category
-                email_obj.category = f"{main_category}_{sub_category}"  # Combined for compatibility
-                email_obj.date = self.ensure_datetime(email_obj.date)
-                email_obj.created_at = self.ensure_datetime(getattr(email_obj, 'created_at', datetime.now()))
-                self.db.save_email(email_obj)
-            
-            return fetched_emails
-            
-        except Exception as e:
-            logger.error(f"Error fetching emails for {account.email}: {str(e)}")
-            return []
-    
-    def _decode_email_header(self, header: str) -> str:
-        """Decode email header to handle special characters. Returns empty string if header is None."""
-        if header is None:
-            return ''
-        try:
-            decoded_header = decode_header(header)
-            return " ".join(
-                part.decode(charset or 'utf-8') if isinstance(part, bytes) else part
-                for part, charset in decoded_header
-            )
-        except Exception as e:
-            logger.error(f"Error decoding header: {str(e)}")
-            return ''
-    
     def fetch_emails_from_account(self, account: EmailAccount, limit: int = None) -> List[Email]:
         """
-        Fetch emails from a single email account via IMAP.
+        Fetch new emails from a single email account via IMAP.
+        
+        Only messages with a UID above the account's last_fetched_uid are
+        downloaded. If the mailbox UIDVALIDITY differs from the stored value
+        the stored UIDs are meaningless and the whole mailbox is resynced.
         
         Args:
             account: EmailAccount object with connection details
-            limit: Maximum number of emails to fetch
+            limit: Maximum number of emails to fetch. The oldest new messages
+                come first, since last_fetched_uid can only move past what was
+                fetched; later fetches continue with the rest. A limited first
+                fetch of a large mailbox therefore imports its oldest messages.
             
         Returns:
             List of Email objects
         """
         emails = []
-        mail = None
-        max_num = None
         try:
-            # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
-            mail.login(account.email, account.password)
-            mail.select('inbox')
+            # Reuse the account's pooled IMAP session (INBOX selected on checkout)
+            with self.sessions.session(account) as mail:
+                uid_validity = self._get_uid_validity(mail)
+                last_uid = account.last_fetched_uid or 0
+                if uid_validity is None or account.uid_validity != uid_validity:
+                    if account.uid_validity is not None:
+                        logger.warning(f"UIDVALIDITY changed for {account.email} "
+                                       f"({account.uid_validity} -> {uid_validity}), running full resync")
+                    last_uid = 0
 
-            # Use sequence number-based search/fetch instead of UID
-            status, messages = mail.search(None, 'ALL')
-            if status == 'OK':
-                email_nums = messages[0].split()
-                logger.info(f"Fetched {len(email_nums)} sequence numbers from IMAP for {account.email}")
-                if email_nums:
-                    max_num = max(int(num) for num in email_nums)
-                # Apply limit if specified
-                if limit:
-                    email_nums = email_nums[-limit:]
-                logger.info(f"Found {len(email_nums)} new emails for account {account.email} (using sequence numbers)")
-                for num in email_nums:
-                    try:
-                        email_obj = self._fetch_single_email(mail, num, account)
-                        if email_obj:
-                            # Generate email hash
-                            email_hash = self.generate_email_hash(email_obj)
-                            email_obj.email_hash = email_hash
-                            # Use enhanced categorization
-                            main_category, sub_category = self._enhanced_categorize_email(email_obj)
-                            email_obj.main_category = main_category
-                            email_obj.sub_category = sub_category
-                            email_obj.category = f"{main_category}_{sub_category}"  # Combined for compatibility
-                            # Ensure date and created_at are datetime
-                            email_obj.date = self.ensure_datetime(email_obj.date)
-                            email_obj.created_at = self.ensure_datetime(getattr(email_obj, 'created_at', datetime.now()))
-                            
-                            # Check for duplicates
-                            existing_email_id = self.db.email_exists(message_id=email_obj.message_id, email_hash=email_obj.email_hash)
-                            if existing_email_id:
-                                email_obj.id = existing_email_id
-                            
-                            # Save email (will insert or update)
-                            self.db.save_email(email_obj)
-                            
-                            if not existing_email_id:
+                # "n:*" always matches the highest UID, so drop anything already seen
+                status, messages = mail.uid('search', None, f'UID {last_uid + 1}:*')
+                if status == 'OK':
+                    uids = sorted(int(uid) for uid in messages[0].split() if int(uid) > last_uid)
+                    # Apply limit if specified, oldest first: the cursor below only
+                    # moves past UIDs that were fetched, so the rest follow next time
+                    if limit:
+                        uids = uids[:limit]
+                    logger.info(f"Found {len(uids)} new emails for account {account.email} (UIDs after {last_uid})")
+                    highest_uid = last_uid
+                    stalled = False
+                    for chunk, fetched in self._fetch_uid_batches(mail, uids, account, uid_validity=uid_validity):
+                        prepared = []
+                        for email_obj in fetched:
+                            try:
+                                # Generate email hash
+                                email_hash = self.generate_email_hash(email_obj)
+                                email_obj.email_hash = email_hash
+                                # Use enhanced categorization
+                                main_category, sub_category = self._enhanced_categorize_email(email_obj)
+                                email_obj.main_category = main_category
+                                email_obj.sub_category = sub_category
+                                email_obj.category = f"{main_category}_{sub_category}"  # Combined for compatibility
+                                # Ensure date and created_at are datetime
+                                email_obj.date = self.ensure_datetime(email_obj.date)
+                                email_obj.created_at = self.ensure_datetime(getattr(email_obj, 'created_at', datetime.now()))
+                                prepared.append(email_obj)
+                            except Exception as e:
+                                logger.error(f"Error preparing email UID {email_obj.imap_uid}: {str(e)}")
+                                stalled = True
+                    
+                        # Check for duplicates, then insert or update the whole chunk at once,
+                        # on one pooled connection that is not held across the IMAP fetches
+                        with self.db.connection():
+                            # Stored UIDs only identify messages while UIDVALIDITY is unchanged
+                            existing_ids = self.db.find_existing_email_ids(
+                                message_ids=[e.message_id for e in prepared if e.message_id],
+                                email_hashes=[e.email_hash for e in prepared if not e.message_id],
+                                account_email=account.email,
+                                imap_uids=[e.imap_uid for e in prepared] if account.uid_validity == uid_validity else None
+                            )
+                            for email_obj in prepared:
+                                existing_email_id = (existing_ids.get(email_obj.imap_uid) or
+                                                     existing_ids.get(email_obj.message_id or email_obj.email_hash))
+                                if existing_email_id:
+                                    email_obj.id = existing_email_id
+                            statuses = self.db.save_emails_batch(prepared)
+                    
+                        for email_obj, status in zip(prepared, statuses):
+                            if status == 'inserted':
                                 emails.append(email_obj)
                                 logger.info(f"Email fetched and saved: {email_obj.subject[:50]}...")
-                            else:
+                            elif status == 'updated':
                                 logger.info(f"Email updated: {email_obj.subject[:50]}...")
-                    except Exception as e:
-                        logger.error(f"Error fetching email {num}: {str(e)}")
-                        continue
-            # No need to update last_fetched_uid for sequence numbers
+                            else:
+                                logger.error(f"Error storing email UID {email_obj.imap_uid}: {status}")
+                                stalled = True
+                        # Only advance past UIDs that were stored, so save failures are retried next cycle
+                        if stalled:
+                            break
+                        highest_uid = chunk[-1]
+            
+                    if uid_validity is not None:
+                        self.db.update_uid_sync_state(account.email, uid_validity, highest_uid)
+                        if account.uid_validity == uid_validity:
+                            highest_uid = max(account.last_fetched_uid or 0, highest_uid)
+                        account.uid_validity = uid_validity
+                        account.last_fetched_uid = highest_uid
         except imaplib.IMAP4.error as e:
             logger.error(f"IMAP error for account {account.email}: {str(e)}")
-            raise Exception(f"Failed to connect to email account: {str(e)}")
+            raise Exception(f"Failed to connect to email account: {str(e)}") from e
         except Exception as e:
             logger.error(f"Unexpected error fetching emails for {account.email}: {str(e)}")
-            raise Exception(f"Email fetch failed: {str(e)}")
-        finally:
-            if mail:
-                try:
-                    mail.close()
-                    mail.logout()
-                except:
-                    pass
+            raise Exception(f"Email fetch failed: {str(e)}") from e
         return emails
     
-    def _fetch_single_email(self, mail, email_id, account: EmailAccount) -> Optional[Email]:
+    def _get_uid_validity(self, mail) -> Optional[int]:
+        """Return the UIDVALIDITY reported by the last SELECT, or None if the server sent none."""
+        try:
+            _, data = mail.response('UIDVALIDITY')
+            if data and data[0] is not None:
+                return int(data[0])
+        except (ValueError, TypeError):
+            pass
+        return None
+    
+    def _uid_set(self, uids: List[int]) -> str:
+        """Compress sorted UIDs into an IMAP sequence set such as '3:7,9,12:14'."""
+        ranges = []
+        start = prev = None
+        for uid in uids:
+            if start is None:
+                start = prev = uid
+            elif uid == prev + 1:
+                prev = uid
+            else:
+                ranges.append(f"{start}:{prev}" if start != prev else str(start))
+                start = prev = uid
+        if start is not None:
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        return ','.join(ranges)
+    
+    def _fetch_uid_sizes(self, mail, uids: List[int], account: EmailAccount) -> Dict[int, int]:
+        """Get the RFC822.SIZE of each UID with cheap size-only UID FETCH round trips."""
+        sizes = {}
+        for i in range(0, len(uids), _SIZE_FETCH_WINDOW):
+            status, data = mail.uid('fetch', self._uid_set(uids[i:i + _SIZE_FETCH_WINDOW]), '(UID RFC822.SIZE)')
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"UID FETCH RFC822.SIZE failed for {account.email}: {data}")
+            for part in data or []:
+                meta = part[0] if isinstance(part, tuple) else part
+                if not isinstance(meta, bytes):
+                    continue
+                uid_match = _FETCH_UID_RE.search(meta)
+                size_match = _FETCH_SIZE_RE.search(meta)
+                if uid_match and size_match:
+                    sizes[int(uid_match.group(1))] = int(size_match.group(1))
+        return sizes
+    
+    def _plan_chunks(self, uids: List[int], sizes: Dict[int, int], chunk_size: int, chunk_bytes: int) -> List[List[int]]:
         """
-        Fetch and parse a single email.
+        Split sorted UIDs into chunks of at most chunk_size messages and chunk_bytes bytes.
+        
+        A message of chunk_bytes or more gets a chunk of its own. UIDs
+        without a known size (expunged meanwhile) count as empty.
+        """
+        chunks = []
+        chunk = []
+        chunk_total = 0
+        for uid in uids:
+            size = sizes.get(uid, 0)
+            if chunk and (len(chunk) >= chunk_size or chunk_total + size > chunk_bytes):
+                chunks.append(chunk)
+                chunk = []
+                chunk_total = 0
+            chunk.append(uid)
+            chunk_total += size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    def _fetch_uid_batches(self, mail, uids: List[int], account: EmailAccount, chunk_size: int = None,
+                           chunk_bytes: int = None, uid_validity: int = None):
+        """
+        Fetch messages in chunks with one UID FETCH round trip per chunk.
+        
+        Message sizes are fetched first, so a chunk holds at most chunk_bytes
+        of message data in memory; oversized messages are fetched alone.
+        
+        Args:
+            mail: IMAP connection object with INBOX selected
+            uids: Sorted list of UIDs to fetch
+            account: EmailAccount object
+            chunk_size: Messages per FETCH command (defaults to Config.IMAP_FETCH_CHUNK_SIZE)
+            chunk_bytes: Message bytes per FETCH command (defaults to Config.IMAP_FETCH_CHUNK_BYTES)
+            uid_validity: UIDVALIDITY of the selected mailbox, part of each email's id
+            
+        Yields:
+            (chunk_uids, emails) tuples; messages that could not be parsed are left out
+        """
+        chunk_size = chunk_size or Config.IMAP_FETCH_CHUNK_SIZE
+        chunk_bytes = chunk_bytes or Config.IMAP_FETCH_CHUNK_BYTES
+        sizes = self._fetch_uid_sizes(mail, uids, account) if uids else {}
+        for chunk in self._plan_chunks(uids, sizes, chunk_size, chunk_bytes):
+            status, data = mail.uid('fetch', self._uid_set(chunk),
+                                    '(UID FLAGS INTERNALDATE RFC822.SIZE BODY.PEEK[])')
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"UID FETCH failed for {account.email}: {data}")
+            items = self._parse_fetch_response(data)
+            del data
+            emails = []
+            # Pop items so each raw message can be freed as soon as it is parsed
+            items.reverse()
+            while items:
+                email_obj = self._build_email(items.pop(), account, uid_validity)
+                if email_obj:
+                    emails.append(email_obj)
+            emails.sort(key=lambda e: e.imap_uid)
+            yield chunk, emails
+    
+    def _parse_fetch_response(self, data) -> List[Dict]:
+        """
+        Split a multi-message FETCH response into per-message dictionaries.
+        
+        imaplib returns each message as a (prefix, literal) tuple, optionally
+        followed by a bytes element holding attributes the server sent after the
+        literal (e.g. b' FLAGS (\\Seen))'). Untagged FETCH responses without a
+        body, such as unsolicited flag updates, are ignored.
+        """
+        messages = []
+        current = None
+        for part in data or []:
+            if isinstance(part, tuple):
+                current = {'meta': part[0], 'body': part[1]}
+                messages.append(current)
+            elif isinstance(part, bytes) and current is not None:
+                current['meta'] += b' ' + part
+                current = None
+        
+        parsed = []
+        for message in messages:
+            meta = message['meta']
+            uid_match = _FETCH_UID_RE.search(meta)
+            if not uid_match or message['body'] is None:
+                continue
+            flags_match = _FETCH_FLAGS_RE.search(meta)
+            size_match = _FETCH_SIZE_RE.search(meta)
+            internaldate = None
+            date_match = _FETCH_INTERNALDATE_RE.search(meta)
+            if date_match:
+                date_tuple = imaplib.Internaldate2tuple(date_match.group(0))
+                if date_tuple:
+                    internaldate = datetime.fromtimestamp(time.mktime(date_tuple))
+            parsed.append({
+                'uid': int(uid_match.group(1)),
+                'flags': flags_match.group(1).split() if flags_match else [],
+                'internaldate': internaldate,
+                'size': int(size_match.group(1)) if size_match else len(message['body']),
+                'body': message['body']
+            })
+        return parsed
+    
+    @staticmethod
+    def make_email_id(account_email: str, uid_validity: Optional[int], uid: int) -> str:
+        """
+        Primary key of a fetched email.
+        
+        UIDs start at 1 in every mailbox and restart when UIDVALIDITY changes,
+        so the id covers the account and UIDVALIDITY as well.
+        """
+        return hashlib.sha256(f"{account_email}:{uid_validity}:{uid}".encode('utf-8')).hexdigest()[:32]
+    
+    def _build_email(self, item: Dict, account: EmailAccount, uid_validity: int = None) -> Optional[Email]:
+        """
+        Build an Email from one parsed FETCH item.
         
         Args:
-            mail: IMAP connection object
-            email_id: Email ID (bytes or int)
+            item: Dictionary from _parse_fetch_response
             account: EmailAccount object
+            uid_validity: UIDVALIDITY of the mailbox the item was fetched from
             
         Returns:
-            Email object or None if failed
+            Email object or None if the message could not be parsed
         """
+        email_id_str = self.make_email_id(account.email, uid_validity, item['uid'])
         try:
-            if isinstance(email_id, bytes):
-                email_id_str = email_id.decode('utf-8')
-            else:
-                email_id_str = str(email_id)
-            
-            # Fetch the email's flags first to check the read status
-            status_flags, flags_data = mail.fetch(email_id_str, '(FLAGS)')
-            is_read = False
-            if status_flags == 'OK':
-                flags = imaplib.ParseFlags(flags_data[0])
-                if b'\\Seen' in flags:
-                    is_read = True
-
-            # Fetch the full email data using PEEK to avoid marking it as read
-            status_body, msg_data = mail.fetch(email_id_str, '(BODY.PEEK[])')
-            if status_body != 'OK' or not msg_data[0] or not isinstance(msg_data[0], tuple):
-                logger.error(f"Failed to fetch email body for ID {email_id_str}")
-                return None
-
-            raw_email = msg_data[0][1]
-            email_message = email.message_from_bytes(raw_email)
-
-            subject = self._decode_header(email_message.get('Subject', 'No Subject'))
-            sender = self._decode_header(email_message.get('From', 'Unknown Sender'))
-            date_str = email_message.get('Date')
-            email_date = self.robust_parse_date(date_str)
-            message_id = email_message.get('Message-ID')
-            
-            # Extract additional metadata for "Show details"
-            metadata = {}
-            if email_message.get('Mailed-By'):
-                metadata['mailed_by'] = self._decode_header(email_message.get('Mailed-By'))
-            if email_message.get('Signed-By'):
-                metadata['signed_by'] = self._decode_header(email_message.get('Signed-By'))
-
-            # Extract security info (TLS) from Received headers
-            received_headers = email_message.get_all('Received', [])
-            security_info = "No encryption information found"
-            for header in received_headers:
-                if 'TLS' in header or 'SSL' in header:
-                    match = re.search(r'\(version=(.+?)\s', header)
-                    if match:
-                        security_info = f"Standard encryption ({match.group(1).split(',')[0]})"
-                    else:
-                        security_info = "Standard encryption (TLS)"
-                    break
-            metadata['security'] = security_info
+            raw_email = item['body']
+            ingested = ingest_message(raw_email)
 
-            body = self._extract_email_body(email_message, email_id_str, account.email)
+            subject = self._decode_header(ingested.subject if ingested.subject is not None else 'No Subject')
+            sender = self._decode_header(ingested.sender if ingested.sender is not None else 'Unknown Sender')
+            date_str = ingested.date
+            email_date = self.robust_parse_date(date_str) if date_str or not item['internaldate'] else item['internaldate']
+            message_id = ingested.message_id
+            
+            # Additional metadata for "Show details"
+            metadata = ingested.metadata
+            for key in ('mailed_by', 'signed_by'):
+                if key in metadata:
+                    metadata[key] = self._decode_header(metadata[key])
+            metadata['size'] = item['size']
+            
+            # Keep the raw source out of the emails table; inline only if the store fails
+            raw_ref, raw_data = None, ''
+            try:
+                raw_ref = raw_store.put(raw_email)
+            except Exception as e:
+                logger.error(f"Raw store write failed for email {email_id_str}, storing inline: {str(e)}")
+                raw_data = raw_email.decode('utf-8', 'ignore')
             
             email_obj = Email(
                 id=email_id_str,
@@ -307,24 +345,46 @@ class EmailService:
                 subject=subject,
                 sender=sender,
                 date=self.ensure_datetime(email_date),
-                body=body,
-                raw_data=raw_email.decode('utf-8', 'ignore'),
-                is_read=is_read,
+                body=ingested.body,
+                raw_data=raw_data,
+                raw_ref=raw_ref,
+                is_read=b'\\Seen' in item['flags'],
                 message_id=message_id,
                 metadata=metadata,
-                created_at=datetime.now()
+                created_at=datetime.now(),
+                imap_uid=item['uid']
             )
 
-            email_obj.email_hash = self.generate_email_hash_from_msg(email_message) if not message_id else None
+            email_obj.email_hash = ingested.content_hash if not message_id else None
             
             return email_obj
 
         except Exception as e:
-            logger.error(f"Error parsing email {email_id}: {str(e)}")
+            logger.error(f"Error parsing email {email_id_str}: {str(e)}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
     
+    def load_raw_source(self, email_obj: Email) -> Optional[bytes]:
+        """
+        Load an email's raw RFC 822 source.
+        
+        Args:
+            email_obj: Email loaded from the database
+            
+        Returns:
+            Raw message bytes from the raw store (or the legacy inline
+            raw_data column), or None if neither has it
+        """
+        if email_obj.raw_ref:
+            raw = raw_store.get(email_obj.raw_ref)
+            if raw is not None:
+                return raw
+            logger.warning(f"Raw source {email_obj.raw_ref} for email {email_obj.id} missing from raw store")
+        if email_obj.raw_data:
+            return email_obj.raw_data.encode('utf-8')
+        return None
+    
     def _decode_header(self, header: str) -> str:
         """Decode email header to handle special characters."""
         if not header:
@@ -368,48 +428,6 @@ class EmailService:
             except Exception:
                 return datetime.now()
     
-    def _extract_email_body(self, email_message, email_id=None, account_email=None) -> str:
-        """Extract email body content with robust decoding."""
-        body = ""
-        try:
-            if email_message.is_multipart():
-                for part in email_message.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get("Content-Disposition"))
-                    if (content_type == "text/plain" and "attachment" not in content_disposition):
-                        payload = part.get_payload(decode=True)
-                        if payload is not None:
-                            try:
-                                body = payload.decode('utf-8')
-                            except Exception as e_utf8:
-                                try:
-                                    body = payload.decode('latin1')
-                                except Exception as e_latin1:
-                                    try:
-                                        body = payload.decode('utf-8', errors='ignore')
-                                    except Exception as e_ignore:
-                                        logger.error(f"Body decode failed for email {email_id} in {account_email}: {e_ignore}")
-                                        body = ''
-                        break
-            else:
-                payload = email_message.get_payload(decode=True)
-                if payload is not None:
-                    try:
-                        body = payload.decode('utf-8')
-                    except Exception as e_utf8:
-                        try:
-                            body = payload.decode('latin1')
-                        except Exception as e_latin1:
-                            try:
-                                body = payload.decode('utf-8', errors='ignore')
-                            except Exception as e_ignore:
-                                logger.error(f"Body decode failed for email {email_id} in {account_email}: {e_ignore}")
-                                body = ''
-        except Exception as e:
-            logger.error(f"Error extracting email body for email {email_id} in {account_email}: {str(e)}")
-            body = ""
-        return body.strip()
-    
     def test_account_connection(self, account: EmailAccount) -> bool:
         """
         Test if an email account connection is valid.
@@ -421,12 +439,8 @@ class EmailService:
             True if connection successful, False otherwise
         """
         try:
-            mail = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
-            mail.login(account.email, account.password)
-            mail.select('inbox')
-            mail.close()
-            mail.logout()
-            return True
+            with self.sessions.session(account):
+                return True
         except Exception as e:
             logger.error(f"Connection test failed for {account.email}: {str(e)}")
             return False
@@ -509,78 +523,45 @@ class EmailService:
             return sender.split('@')[-1].split('>')[0].strip()
         return sender
 
-    def _enhanced_categorize_email(self, email: Email) -> tuple:
+    def categorize_many(self, emails: List[Email], rules: CategoryRuleSet = None) -> List[tuple]:
+        """
+        Categorize a list of emails under one rule set version.
+        
+        Args:
+            emails: Emails to categorize; only subject and sender are read
+            rules: Rule set to use; defaults to the active one
+            
+        Returns:
+            (main_category, sub_category) for each email, in order
+        """
+        rules = rules or category_rules.current()
+        return [self._enhanced_categorize_email(email, rules) for email in emails]
+
+    def _enhanced_categorize_email(self, email: Email, rules: CategoryRuleSet = None) -> tuple:
         """
         Hierarchical categorization system without AI.
         Returns (main_category, sub_category) tuple.
+        
+        Keyword rules come from the active stored rule set (category_rules)
+        unless rules is given, and are matched in one pass per field; the
+        body is not consulted by any rule. Sets email.rules_version to the
+        version used.
         """
-        subject_lower = email.subject.lower()
+        rules = rules or category_rules.current()
         sender_lower = email.sender.lower()
-        body_lower = email.body.lower()
         
         # Extract domain from sender email
         domain = self._extract_domain(sender_lower)
         
-        # Extract sender name/company name dynamically
-        sender_name = self._extract_sender_name(email.sender)
-        
-        # BANK CATEGORIES - Dynamic detection
-        if self._is_bank_email(subject_lower, sender_lower, domain):
-            bank_name = self._detect_bank_name_dynamic(subject_lower, sender_lower, domain, sender_name)
-            return ('bank', bank_name)
-        
-        # COMPANY CATEGORIES - Dynamic detection
-        elif self._is_company_email(subject_lower, sender_lower, domain):
-            company_name = self._detect_company_name_dynamic(subject_lower, sender_lower, domain, sender_name)
-            return ('company', company_name)
-        
-        # SUPPORT CATEGORIES
-        elif self._is_support_email(subject_lower, sender_lower):
-            support_type = self._detect_support_type(subject_lower, body_lower)
-            return ('support', support_type)
-        
-        # NEWSLETTER CATEGORIES
-        elif self._is_newsletter_email(subject_lower, sender_lower):
-            newsletter_type = self._detect_newsletter_type(subject_lower, body_lower)
-            return ('newsletter', newsletter_type)
-        
-        # BILLING/PAYMENT CATEGORIES
-        elif self._is_billing_email(subject_lower, sender_lower):
-            billing_type = self._detect_billing_type(subject_lower, body_lower)
-            return ('billing', billing_type)
-        
-        # ORDER/SHIPPING CATEGORIES
-        elif self._is_order_email(subject_lower, sender_lower):
-            order_type = self._detect_order_type(subject_lower, body_lower)
-            return ('order', order_type)
-        
-        # SOCIAL MEDIA CATEGORIES
-        elif self._is_social_email(subject_lower, sender_lower, domain):
-            social_platform = self._detect_social_platform(subject_lower, sender_lower, domain)
-            return ('social', social_platform)
-        
-        # SECURITY CATEGORIES
-        elif self._is_security_email(subject_lower, sender_lower):
-            security_type = self._detect_security_type(subject_lower, body_lower)
-            return ('security', security_type)
-        
-        # MEETING/CALENDAR CATEGORIES
-        elif self._is_meeting_email(subject_lower, sender_lower):
-            meeting_type = self._detect_meeting_type(subject_lower, body_lower)
-            return ('meeting', meeting_type)
+        main_category, sub_category = rules.classify(email.subject.lower(), sender_lower, domain)
+        email.rules_version = rules.version
         
-        # CAREER/JOB CATEGORIES
-        elif self._is_career_email(subject_lower, sender_lower):
-            career_type = self._detect_career_type(subject_lower, body_lower)
-            return ('career', career_type)
-        
-        # NOTIFICATION CATEGORIES
-        elif self._is_notification_email(subject_lower, sender_lower):
-            notification_type = self._detect_notification_type(subject_lower, body_lower)
-            return ('notification', notification_type)
-        
-        # Default - Use sender name as sub-category
-        return ('general', sender_name)
+        # Rules may name the sender or its company as the sub-category
+        if sub_category == SENDER_NAME:
+            sub_category = self._extract_sender_name(email.sender)
+        elif sub_category == COMPANY_NAME:
+            sub_category = self._detect_company_name_dynamic(domain, self._extract_sender_name(email.sender))
+        return (main_category, sub_category)
 
     def _extract_sender_name(self, sender: str) -> str:
         """
@@ -624,37 +605,7 @@ class EmailService:
             logger.error(f"Error extracting sender name from '{sender}': {str(e)}")
             return 'unknown_sender'
 
-    def _detect_bank_name_dynamic(self, subject: str, sender: str, domain: str, sender_name: str) -> str:
-        """
-        Dynamically detect bank name from email content.
-        Uses sender name as primary identifier.
-        """
-        # First try to detect known banks
-        known_banks = {
-            'sbi': 'state_bank_of_india',
-            'hdfc': 'hdfc_bank',
-            'icici': 'icici_bank',
-            'axis': 'axis_bank',
-            'kotak': 'kotak_bank',
-            'yes': 'yes_bank',
-            'pnb': 'punjab_national_bank',
-            'union': 'union_bank',
-            'canara': 'canara_bank',
-            'bankofbaroda': 'bank_of_baroda',
-            'idbi': 'idbi_bank'
-        }
-        
-        # Check for known bank keywords in subject/sender/domain
-        for bank_keyword, bank_name in known_banks.items():
-            if (bank_keyword in subject or 
-                bank_keyword in sender or 
-                bank_keyword in domain):
-                return bank_name
-        
-        # If no known bank found, use sender name as bank name
-        return sender_name
-
-    def _detect_company_name_dynamic(self, subject: str, sender: str, domain: str, sender_name: str) -> str:
+    def _detect_company_name_dynamic(self, domain: str, sender_name: str) -> str:
         """
         Dynamically detect company name from email content.
         Uses sender name as primary identifier.
@@ -672,163 +623,6 @@ class EmailService:
         # If domain extraction fails, use sender name
         return sender_name
     
-    def _is_bank_email(self, subject: str, sender: str, domain: str) -> bool:
-        """Check if email is from a bank."""
-        bank_keywords = ['bank', 'sbi', 'hdfc', 'icici', 'axis', 'kotak', 'yes', 'pnb', 'union']
-        bank_domains = ['sbi.co.in', 'hdfcbank.com', 'icicibank.com', 'axisbank.com', 'kotak.com', 'yesbank.in', 'pnb.co.in']
-        
-        return (any(keyword in subject or keyword in sender for keyword in bank_keywords) or
-                any(bank_domain in domain for bank_domain in bank_domains))
-    
-    def _is_company_email(self, subject: str, sender: str, domain: str) -> bool:
-        """Check if email is from a company."""
-        company_keywords = ['invoice', 'receipt', 'statement', 'account', 'business', 'corporate']
-        return any(keyword in subject for keyword in company_keywords)
-    
-    def _is_support_email(self, subject: str, sender: str) -> bool:
-        """Check if email is support related."""
-        support_keywords = ['support', 'help', 'issue', 'problem', 'ticket', 'assistance']
-        return any(keyword in subject for keyword in support_keywords)
-    
-    def _detect_support_type(self, subject: str, body: str) -> str:
-        """Detect support type."""
-        if any(word in subject for word in ['technical', 'tech', 'software', 'app']):
-            return 'technical'
-        elif any(word in subject for word in ['billing', 'payment', 'invoice']):
-            return 'billing'
-        elif any(word in subject for word in ['general', 'inquiry', 'question']):
-            return 'general'
-        else:
-            return 'general'
-    
-    def _is_newsletter_email(self, subject: str, sender: str) -> bool:
-        """Check if email is a newsletter."""
-        newsletter_keywords = ['newsletter', 'news', 'update', 'digest', 'weekly', 'monthly']
-        return any(keyword in subject for keyword in newsletter_keywords)
-    
-    def _detect_newsletter_type(self, subject: str, body: str) -> str:
-        """Detect newsletter type."""
-        if any(word in subject for word in ['tech', 'technology', 'software']):
-            return 'tech_news'
-        elif any(word in subject for word in ['business', 'finance', 'market']):
-            return 'business_news'
-        elif any(word in subject for word in ['health', 'medical', 'fitness']):
-            return 'health_news'
-        else:
-            return 'general_news'
-    
-    def _is_billing_email(self, subject: str, sender: str) -> bool:
-        """Check if email is billing related."""
-        billing_keywords = ['invoice', 'payment', 'bill', 'receipt', 'statement', 'due']
-        return any(keyword in subject for keyword in billing_keywords)
-    
-    def _detect_billing_type(self, subject: str, body: str) -> str:
-        """Detect billing type."""
-        if 'invoice' in subject:
-            return 'invoice'
-        elif 'payment' in subject:
-            return 'payment'
-        elif 'receipt' in subject:
-            return 'receipt'
-        else:
-            return 'billing'
-    
-    def _is_order_email(self, subject: str, sender: str) -> bool:
-        """Check if email is order related."""
-        order_keywords = ['order', 'purchase', 'buy', 'shipping', 'delivery', 'tracking']
-        return any(keyword in subject for keyword in order_keywords)
-    
-    def _detect_order_type(self, subject: str, body: str) -> str:
-        """Detect order type."""
-        if 'shipping' in subject or 'delivery' in subject:
-            return 'shipping'
-        elif 'tracking' in subject:
-            return 'tracking'
-        elif 'order' in subject:
-            return 'order_confirmation'
-        else:
-            return 'order'
-    
-    def _is_social_email(self, subject: str, sender: str, domain: str) -> bool:
-        """Check if email is from social media."""
-        social_domains = ['facebook.com', 'twitter.com', 'linkedin.com', 'instagram.com', 'youtube.com']
-        social_keywords = ['facebook', 'twitter', 'linkedin', 'instagram', 'youtube']
-        
-        return (any(social_domain in domain for social_domain in social_domains) or
-                any(keyword in subject or keyword in sender for keyword in social_keywords))
-    
-    def _detect_social_platform(self, subject: str, sender: str, domain: str) -> str:
-        """Detect social media platform."""
-        if 'facebook' in subject or 'facebook' in sender or 'facebook.com' in domain:
-            return 'facebook'
-        elif 'twitter' in subject or 'twitter' in sender or 'twitter.com' in domain:
-            return 'twitter'
-        elif 'linkedin' in subject or 'linkedin' in sender or 'linkedin.com' in domain:
-            return 'linkedin'
-        elif 'instagram' in subject or 'instagram' in sender or 'instagram.com' in domain:
-            return 'instagram'
-        elif 'youtube' in subject or 'youtube' in sender or 'youtube.com' in domain:
-            return 'youtube'
-        else:
-            return 'other_social'
-    
-    def _is_security_email(self, subject: str, sender: str) -> bool:
-        """Check if email is security related."""
-        security_keywords = ['security', 'password', 'login', 'verification', 'otp', '2fa']
-        return any(keyword in subject for keyword in security_keywords)
-    
-    def _detect_security_type(self, subject: str, body: str) -> str:
-        """Detect security type."""
-        if 'otp' in subject or 'verification' in subject:
-            return 'otp'
-        elif 'password' in subject:
-            return 'password'
-        elif 'login' in subject:
-            return 'login'
-        else:
-            return 'security'
-    
-    def _is_meeting_email(self, subject: str, sender: str) -> bool:
-        """Check if email is meeting related."""
-        meeting_keywords = ['meeting', 'appointment', 'schedule', 'calendar', 'call']
-        return any(keyword in subject for keyword in meeting_keywords)
-    
-    def _detect_meeting_type(self, subject: str, body: str) -> str:
-        """Detect meeting type."""
-        if 'appointment' in subject:
-            return 'appointment'
-        elif 'call' in subject:
-            return 'call'
-        else:
-            return 'meeting'
-    
-    def _is_career_email(self, subject: str, sender: str) -> bool:
-        """Check if email is career related."""
-        career_keywords = ['job', 'career', 'application', 'resume', 'interview', 'position']
-        return any(keyword in subject for keyword in career_keywords)
-    
-    def _detect_career_type(self, subject: str, body: str) -> str:
-        """Detect career type."""
-        if 'interview' in subject:
-            return 'interview'
-        elif 'application' in subject:
-            return 'application'
-        else:
-            return 'job'
-    
-    def _is_notification_email(self, subject: str, sender: str) -> bool:
-        # Check for keywords related to notifications
-        keywords = ['notification', 'alert', 'reminder', 'update']
-        return any(keyword in subject for keyword in keywords)
-
-    def _detect_notification_type(self, subject: str, body: str) -> str:
-        # Simple detection based on subject keywords
-        if 'failed' in subject or 'error' in subject:
-            return 'failure'
-        elif 'success' in subject or 'completed' in subject:
-            return 'success'
-        return 'general'
-        
     def set_email_action(self, email_id: str, action: str, value: any) -> bool:
         """
         Set a specific action/status for an email.
@@ -881,6 +675,7 @@ class EmailService:
             Dictionary with categorized and skipped email counts
         """
         results = {'categorized': 0, 'skipped': 0, 'errors': []}
+        categorized = []
         for email in emails_to_categorize:
             try:
                 # Use hierarchical categorization (no AI needed)
@@ -892,8 +687,7 @@ class EmailService:
                     email.category = f"{main_category}_{sub_category}"  # Combined for compatibility
                     email.date = self.ensure_datetime(email.date)
                     email.created_at = self.ensure_datetime(getattr(email, 'created_at', datetime.now()))
-                    self.db.save_email(email)
-                    results['categorized'] += 1
+                    categorized.append(email)
                     logger.info(f"Categorized email '{email.subject[:30]}...' as '{main_category}/{sub_category}'")
                 else:
                     results['skipped'] += 1
@@ -902,25 +696,17 @@ class EmailService:
                 error_msg = f"Error categorizing email {email.id}: {str(e)}"
                 results['errors'].append(error_msg)
                 logger.error(error_msg)
+        
+        # Persist all re-categorized emails in one transaction
+        for email, status in zip(categorized, self.db.save_emails_batch(categorized)):
+            if status in ('inserted', 'updated'):
+                results['categorized'] += 1
+            else:
+                error_msg = f"Error saving categorized email {email.id}: {status}"
+                results['errors'].append(error_msg)
+                logger.error(error_msg)
         return results
 
-    def generate_email_hash_from_msg(self, msg):
-        # Generate a hash from From, To, Date, Subject, Body
-        import hashlib
-        from_addr = msg.get('From', '')
-        to_addr = msg.get('To', '')
-        date = msg.get('Date', '')
-        subject = msg.get('Subject', '')
-        body = ''
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == 'text/plain':
-                    body += part.get_payload(decode=True).decode(errors='ignore')
-        else:
-            body = msg.get_payload(decode=True).decode(errors='ignore')
-        hash_input = f"{from_addr}{to_addr}{date}{subject}{body}".encode('utf-8')
-        return hashlib.sha256(hash_input).hexdigest()
-
     def ensure_datetime(self, val):
         if isinstance(val, datetime):
             return val
@@ -936,6 +722,12 @@ class EmailService:
         """
         Sync read status from email server to local database.
         
+        With CONDSTORE and a stored HIGHESTMODSEQ only messages whose flags
+        changed since the last sync are fetched (UID FETCH ... CHANGEDSINCE);
+        an unchanged HIGHESTMODSEQ skips the fetch altogether. Otherwise the
+        flags of the whole mailbox are read in one UID FETCH 1:* (FLAGS).
+        Differences are applied with a bulk UPDATE keyed by UID.
+        
         Args:
             account: EmailAccount object with connection details
             
@@ -943,41 +735,77 @@ class EmailService:
             True if sync successful, False otherwise
         """
         try:
-            # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(account.imap_server, account.imap_port)
-            mail.login(account.email, account.password)
-            mail.select('inbox')
-            
-            # Get all emails from local database for this account
-            local_emails = db_manager.get_emails({'account': account.email}, page=1, per_page=1000)[0]
-            
-            updated_count = 0
-            
-            for local_email in local_emails:
-                try:
-                    # Check read status on server
-                    status_flags, flags_data = mail.fetch(local_email.id, '(FLAGS)')
-                    if status_flags == 'OK':
-                        flags = imaplib.ParseFlags(flags_data[0])
-                        server_is_read = b'\\Seen' in flags
-                        
-                        # Update local database if status differs
-                        if local_email.is_read != server_is_read:
-                            local_email.is_read = server_is_read
-                            db_manager.save_email(local_email)
-                            updated_count += 1
-                            logger.info(f"Synced read status for email {local_email.id}: {server_is_read}")
-                            
-                except Exception as e:
-                    logger.error(f"Error checking read status for email {local_email.id}: {str(e)}")
-                    continue
-            
-            mail.close()
-            mail.logout()
-            
-            logger.info(f"Read status sync completed for {account.email}: {updated_count} emails updated")
+            # Reuse the account's pooled IMAP session (INBOX selected on checkout)
+            with self.sessions.session(account) as mail:
+                uid_validity = self._get_uid_validity(mail)
+                if account.uid_validity is not None and uid_validity != account.uid_validity:
+                    # UIDs no longer match the stored ones; the next fetch resyncs them
+                    logger.info(f"UIDVALIDITY changed for {account.email}, skipping read status sync until refetch")
+                    return True
+                
+                server_modseq = self._get_highest_modseq(mail)
+                changed_since = account.highest_modseq if server_modseq is not None else None
+                if changed_since is not None and server_modseq == changed_since:
+                    logger.debug(f"No flag changes for {account.email} since MODSEQ {changed_since}")
+                    return True
+                
+                if changed_since is not None:
+                    status, data = mail.uid('fetch', '1:*', f'(FLAGS) (CHANGEDSINCE {changed_since})')
+                else:
+                    status, data = mail.uid('fetch', '1:*', '(FLAGS)')
+                if status != 'OK':
+                    logger.error(f"Flag fetch failed for {account.email}: {status}")
+                    return False
+            
+            server_flags = self._parse_flags_response(data)
+            with db_manager.connection():
+                # An incremental sync only looks up the UIDs whose flags changed
+                local_status = db_manager.get_read_status_by_uid(
+                    account.email, list(server_flags) if changed_since is not None else None
+                )
+                read_uids, unread_uids = [], []
+                for uid, flags in server_flags.items():
+                    if uid not in local_status:
+                        continue
+                    server_is_read = b'\\Seen' in flags
+                    if local_status[uid] != server_is_read:
+                        (read_uids if server_is_read else unread_uids).append(uid)
+                
+                updated_count = db_manager.bulk_update_read_status(account.email, read_uids, unread_uids)
+                if updated_count < 0:
+                    return False
+                if server_modseq is not None:
+                    db_manager.update_flag_sync_state(account.email, server_modseq)
+            
+            mode = f"CHANGEDSINCE {changed_since}" if changed_since is not None else "full"
+            logger.info(f"Read status sync completed for {account.email} ({mode}, "
+                        f"{len(server_flags)} flags checked): {updated_count} emails updated")
             return True
             
         except Exception as e:
             logger.error(f"Error syncing read status for {account.email}: {str(e)}")
             return False
+    
+    def _get_highest_modseq(self, mail) -> Optional[int]:
+        """Return the HIGHESTMODSEQ reported by the last SELECT, or None without CONDSTORE."""
+        try:
+            _, data = mail.response('HIGHESTMODSEQ')
+            if data and data[0] is not None:
+                return int(data[0])
+        except (ValueError, TypeError):
+            pass
+        return None
+    
+    def _parse_flags_response(self, data) -> Dict[int, List[bytes]]:
+        """Map UID to flags for a FLAGS-only FETCH response."""
+        flags_by_uid = {}
+        for part in data or []:
+            if isinstance(part, tuple):
+                part = part[0]
+            if not isinstance(part, bytes):
+                continue
+            uid_match = _FETCH_UID_RE.search(part)
+            flags_match = _FETCH_FLAGS_RE.search(part)
+            if uid_match and flags_match:
+                flags_by_uid[int(uid_match.group(1))] = flags_match.group(1).split()
+        return flags_by_uid
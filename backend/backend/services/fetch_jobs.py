@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .account_health import account_health
+from .email_service import EmailService
+from ..config import Config
+from ..models.email_models import EmailAccount
+from ..utils.account_pool import AccountSyncPool
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FetchJob:
+    """A manual fetch of a set of accounts and its per-account progress."""
+    id: str
+    accounts: List[str]
+    limit: int
+    requested_by: Optional[str] = None
+    status: str = 'queued'  # queued, running, completed
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Account email -> {status, fetched, error, elapsed} once it finished
+    results: Dict[str, Dict] = field(default_factory=dict)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict:
+        results = dict(self.results)
+        fetched = sum(result.get('fetched', 0) for result in results.values())
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        return {
+            'id': self.id,
+            'status': self.status,
+            'requested_by': self.requested_by,
+            'limit': self.limit,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'total_accounts': len(self.accounts),
+            'finished_accounts': len(results),
+            'successful_accounts': sum(1 for result in results.values() if result['status'] == 'ok'),
+            'failed_accounts': sum(1 for result in results.values() if result['status'] != 'ok'),
+            'total_emails_fetched': fetched,
+            'emails_per_second': round(fetched / elapsed, 2) if elapsed else 0.0,
+            'elapsed': round(elapsed, 1),
+            'errors': [f"{email}: {result['error']}" for email, result in results.items() if result.get('error')],
+            'accounts': {email: results.get(email, {'status': 'pending'}) for email in self.accounts}
+        }
+
+class FetchJobQueue:
+    """
+    Runs manual fetches (POST /api/emails/fetch) off the request thread.
+
+    Jobs are queued in this process and run one at a time by a worker
+    thread; within a job, accounts are fetched in parallel through an
+    AccountSyncPool. Submitting while a queued or running job already covers
+    the same accounts and limit returns that job instead of adding another,
+    so repeated refresh clicks share one fetch. The last
+    FETCH_JOB_HISTORY finished jobs are kept for status polling.
+    """
+
+    def __init__(self, history: int = None):
+        self.history = history or Config.FETCH_JOB_HISTORY
+        self._jobs: 'OrderedDict[str, FetchJob]' = OrderedDict()
+        self._queue: 'queue.Queue[Tuple[FetchJob, List[EmailAccount]]]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pool = None
+        self._email_service = None
+
+    def submit(self, accounts: List[EmailAccount], limit: int = None,
+               requested_by: str = None) -> Tuple[FetchJob, bool]:
+        """
+        Queue a fetch of accounts, or join an equivalent active job.
+
+        Args:
+            accounts: Accounts to fetch
+            limit: Maximum emails to fetch per account
+            requested_by: Email of the requesting user
+
+        Returns:
+            (job, created); created is False when an active job was reused
+        """
+        emails = [account.email for account in accounts]
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.active and job.limit == limit and set(emails) <= set(job.accounts):
+                    return job, False
+
+            job = FetchJob(id=uuid.uuid4().hex, accounts=emails, limit=limit, requested_by=requested_by)
+            self._jobs[job.id] = job
+            self._queue.put((job, accounts))
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='fetch-jobs', daemon=True)
+                self._thread.start()
+        logger.info(f"Queued fetch job {job.id} for {len(emails)} accounts")
+        return job, True
+
+    def get(self, job_id: str) -> Optional[FetchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[FetchJob]:
+        """Known jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _worker(self):
+        while True:
+            job, accounts = self._queue.get()
+            try:
+                self._run(job, accounts)
+            except Exception as e:
+                logger.error(f"Fetch job {job.id} failed: {str(e)}")
+                for account in accounts:
+                    job.results.setdefault(account.email, {'status': 'error', 'fetched': 0, 'error': str(e)})
+            finally:
+                job.status = 'completed'
+                job.finished_at = datetime.now()
+                self._prune()
+
+    def _run(self, job: FetchJob, accounts: List[EmailAccount]):
+        if not self._pool:
+            self._pool = AccountSyncPool()
+            self._email_service = EmailService()
+        job.status = 'running'
+        job.started_at = datetime.now()
+        started = time.monotonic()
+
+        def fetch(account: EmailAccount) -> int:
+            # The fetch's own session checkout is the connection test
+            account_health.preflight(account)
+            return len(account_health.track(account, self._email_service.fetch_emails_from_account, job.limit))
+
+        def record(account_email: str, result: Dict):
+            job.results[account_email] = {
+                'status': result['status'],
+                'fetched': result.get('result') or 0,
+                'error': result.get('error') or (None if result['status'] == 'ok' else result['status']),
+                'elapsed': round(result['elapsed'], 2)
+            }
+
+        self._pool.run(accounts, fetch, 'manual_fetch', on_result=record)
+        summary = job.to_dict()
+        logger.info(f"Fetch job {job.id} finished in {time.monotonic() - started:.1f}s: "
+                    f"{summary['total_emails_fetched']} emails, {summary['failed_accounts']} failed accounts")
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
+
+# Shared queue for the web process
+fetch_jobs = FetchJobQueue()
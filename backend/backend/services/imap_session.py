@@ -0,0 +1,399 @@
+import imaplib
+import logging
+import re
+import select
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from ..config import Config
+from ..models.email_models import EmailAccount, account_fingerprint
+from ..utils.account_pool import HostConnectionBudget, host_connections
+
+logger = logging.getLogger(__name__)
+
+# Untagged responses that mean the selected mailbox changed while idling
+_IDLE_PUSH_RE = re.compile(rb'^\* \d+ (EXISTS|EXPUNGE|FETCH)\b')
+
+def _refresh_capabilities(conn):
+    """
+    Re-read the server's capabilities after login.
+
+    imaplib keeps the list from the pre-login greeting, but servers such as
+    Gmail only advertise CONDSTORE, ENABLE and the like once authenticated.
+    """
+    typ, data = conn.capability()
+    if typ == 'OK' and data and data[-1]:
+        conn.capabilities = tuple(data[-1].decode('ascii', errors='ignore').upper().split())
+
+class ImapAuthError(imaplib.IMAP4.error):
+    """The server rejected the account's credentials (or is backing off after it did)."""
+
+class _Session:
+    """State for one account's pooled IMAP connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.fingerprint = None
+        self.last_used = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self.auth_failed = False
+        self.capabilities = ()
+
+class ImapSessionManager:
+    """Keeps one authenticated IMAP connection per account and reuses it across syncs."""
+
+    def __init__(self, keepalive_interval: int = None, max_idle: int = None, max_backoff: int = None):
+        """
+        Initialize the session manager.
+
+        Args:
+            keepalive_interval: Seconds of inactivity before an idle session is NOOPed
+            max_idle: Seconds of inactivity before an idle session is logged out
+            max_backoff: Upper bound in seconds for reconnect backoff after failures
+        """
+        self.keepalive_interval = keepalive_interval or Config.IMAP_KEEPALIVE_INTERVAL
+        self.max_idle = max_idle or Config.IMAP_SESSION_MAX_IDLE
+        self.max_backoff = max_backoff or Config.IMAP_RECONNECT_MAX_BACKOFF
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._keeper = None
+        self._stop = threading.Event()
+        self.stats = {'logins': 0, 'reuses': 0, 'reconnects': 0, 'failures': 0}
+
+    def _entry(self, account_email: str) -> _Session:
+        with self._lock:
+            entry = self._sessions.get(account_email)
+            if entry is None:
+                entry = _Session()
+                self._sessions[account_email] = entry
+            if self._keeper is None:
+                self._stop = threading.Event()
+                self._keeper = threading.Thread(target=self._keepalive_loop, args=(self._stop,),
+                                                name='imap-keepalive', daemon=True)
+                self._keeper.start()
+            return entry
+
+    def _connect(self, entry: _Session, account: EmailAccount):
+        now = time.monotonic()
+        if entry.retry_at > now:
+            error = ImapAuthError if entry.auth_failed else imaplib.IMAP4.error
+            raise error(
+                f"Reconnect to {account.imap_server} for {account.email} backing off for "
+                f"{entry.retry_at - now:.0f}s after: {entry.last_error}")
+        try:
+            conn = imaplib.IMAP4_SSL(account.imap_server, account.imap_port, timeout=Config.IMAP_TIMEOUT)
+            try:
+                conn.login(account.email, account.password)
+            except imaplib.IMAP4.error as e:
+                if isinstance(e, imaplib.IMAP4.abort):
+                    raise
+                self._logout(conn)
+                raise ImapAuthError(str(e)) from e
+            _refresh_capabilities(conn)
+            if 'CONDSTORE' in conn.capabilities and 'ENABLE' in conn.capabilities:
+                try:
+                    conn.enable('CONDSTORE')
+                except imaplib.IMAP4.error:
+                    pass
+        except Exception as e:
+            entry.failures += 1
+            entry.last_error = str(e)
+            entry.auth_failed = isinstance(e, ImapAuthError)
+            entry.retry_at = now + min(self.max_backoff, 2 ** entry.failures)
+            self.stats['failures'] += 1
+            raise
+        self.stats['logins'] += 1
+        if entry.fingerprint is not None:
+            self.stats['reconnects'] += 1
+        entry.conn = conn
+        entry.fingerprint = account_fingerprint(account)
+        entry.failures = 0
+        entry.retry_at = 0.0
+        entry.last_error = None
+        entry.auth_failed = False
+        entry.capabilities = tuple(sorted(conn.capabilities))
+        return conn
+
+    @staticmethod
+    def _logout(conn):
+        try:
+            conn.logout()
+        except Exception:
+            pass
+
+    def _drop(self, entry: _Session):
+        if entry.conn is not None:
+            self._logout(entry.conn)
+        entry.conn = None
+
+    @contextmanager
+    def session(self, account: EmailAccount, mailbox: str = 'INBOX'):
+        """
+        Check out the account's authenticated connection with the mailbox selected.
+
+        The connection stays logged in after the block exits. Connection-level
+        failures (aborts, socket errors) discard it so the next checkout
+        reconnects; failed logins are retried with exponential backoff.
+
+        Args:
+            account: EmailAccount with connection details
+            mailbox: Mailbox to SELECT before yielding
+
+        Yields:
+            imaplib.IMAP4_SSL connection
+        """
+        entry = self._entry(account.email)
+        with entry.lock:
+            conn = entry.conn
+            if conn is not None and entry.fingerprint != account_fingerprint(account):
+                self._drop(entry)
+                conn = None
+            if conn is not None:
+                try:
+                    conn.select(mailbox)
+                    self.stats['reuses'] += 1
+                except (imaplib.IMAP4.abort, OSError):
+                    self._drop(entry)
+                    conn = None
+            if conn is None:
+                conn = self._connect(entry, account)
+                try:
+                    conn.select(mailbox)
+                except Exception:
+                    self._drop(entry)
+                    raise
+            try:
+                yield conn
+            except (imaplib.IMAP4.abort, OSError):
+                self._drop(entry)
+                raise
+            finally:
+                entry.last_used = time.monotonic()
+
+    def capabilities(self, account_email: str) -> tuple:
+        """Capabilities the server advertised at the account's last successful login."""
+        with self._lock:
+            entry = self._sessions.get(account_email)
+        return entry.capabilities if entry is not None else ()
+
+    def invalidate(self, account_email: str):
+        """Log out and forget an account's session, e.g. after its credentials change."""
+        with self._lock:
+            entry = self._sessions.pop(account_email, None)
+        if entry is not None:
+            with entry.lock:
+                self._drop(entry)
+
+    def close_all(self):
+        """Log out every pooled session and stop the keepalive thread."""
+        with self._lock:
+            self._stop.set()
+            self._keeper = None
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            with entry.lock:
+                self._drop(entry)
+
+    def _keepalive_loop(self, stop: threading.Event):
+        """NOOP idle sessions so servers do not drop them; log out long-unused ones."""
+        while not stop.wait(min(self.keepalive_interval, 60)):
+            with self._lock:
+                entries = list(self._sessions.items())
+            now = time.monotonic()
+            for account_email, entry in entries:
+                if entry.conn is None or now - entry.last_used < self.keepalive_interval:
+                    continue
+                if not entry.lock.acquire(blocking=False):
+                    continue  # in use, which keeps it alive anyway
+                try:
+                    if entry.conn is None:
+                        continue
+                    if now - entry.last_used >= self.max_idle:
+                        logger.info(f"Closing idle IMAP session for {account_email}")
+                        self._drop(entry)
+                        continue
+                    entry.conn.noop()
+                    entry.last_used = now
+                except Exception as e:
+                    logger.info(f"IMAP keepalive failed for {account_email}, dropping session: {str(e)}")
+                    self._drop(entry)
+                finally:
+                    entry.lock.release()
+
+    def get_status(self) -> Dict:
+        """Get pool counters and per-account session state."""
+        with self._lock:
+            entries = list(self._sessions.items())
+        now = time.monotonic()
+        return {
+            'stats': dict(self.stats),
+            'sessions': {
+                account_email: {
+                    'connected': entry.conn is not None,
+                    'idle_seconds': round(now - entry.last_used, 1) if entry.last_used else None,
+                    'failures': entry.failures,
+                    'retry_in': max(0.0, round(entry.retry_at - now, 1)),
+                    'last_error': entry.last_error
+                }
+                for account_email, entry in entries
+            }
+        }
+
+class ImapIdleWatcher:
+    """
+    Holds a dedicated IDLE connection for one account and reports mailbox changes.
+
+    The callback receives the account email and the set of untagged response
+    kinds seen (EXISTS, EXPUNGE, FETCH). Servers without the IDLE capability
+    make the watcher exit with supported set to False.
+
+    The connection counts against the host's connection budget but leaves
+    one slot free for sync work; while no slot is available the account is
+    simply polled. A rejected login is recorded in the health cache and
+    stops the watcher, so a bad password is not retried until the account's
+    settings change and a new watcher replaces this one.
+    """
+
+    def __init__(self, account: EmailAccount, on_change: Callable[[str, set], None], idle_timeout: int = None,
+                 health=None, hosts: HostConnectionBudget = None):
+        self.account = account
+        self.on_change = on_change
+        self.idle_timeout = idle_timeout or Config.IMAP_IDLE_TIMEOUT
+        self.health = health
+        self.hosts = hosts or host_connections
+        self.supported: Optional[bool] = None
+        self.auth_failed = False
+        self._connected = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+
+    @property
+    def idling(self) -> bool:
+        """True while the watcher holds an IDLE connection, so the account needs no regular polling."""
+        return bool(self._thread and self._thread.is_alive() and self._connected)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"imap-idle-{self.account.email}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _backoff(self) -> float:
+        self._failures += 1
+        return min(Config.IMAP_RECONNECT_MAX_BACKOFF, 2 ** self._failures)
+
+    def _run(self):
+        host = self.account.imap_server
+        while not self._stop.is_set():
+            try:
+                if self.health is not None:
+                    self.health.preflight(self.account)
+            except ImapAuthError as e:
+                logger.warning(f"Not starting IDLE for {self.account.email} until its settings change: {str(e)}")
+                self.auth_failed = True
+                return
+            if not self.hosts.try_acquire(host, keep_free=1):
+                self._stop.wait(self._backoff())
+                continue
+            conn = None
+            retry_in = 0
+            try:
+                conn = imaplib.IMAP4_SSL(self.account.imap_server, self.account.imap_port, timeout=Config.IMAP_TIMEOUT)
+                try:
+                    conn.login(self.account.email, self.account.password)
+                except imaplib.IMAP4.error as e:
+                    if isinstance(e, imaplib.IMAP4.abort):
+                        raise
+                    error = ImapAuthError(str(e))
+                    if self.health is not None:
+                        self.health.record(self.account, error)
+                    logger.warning(f"IDLE login rejected for {self.account.email}, stopping until its settings change: {str(e)}")
+                    self.auth_failed = True
+                    return
+                _refresh_capabilities(conn)
+                if 'IDLE' not in conn.capabilities:
+                    logger.info(f"{self.account.imap_server} does not support IDLE, polling {self.account.email}")
+                    self.supported = False
+                    return
+                self.supported = True
+                conn.select('INBOX')
+                self._failures = 0
+                self._connected = True
+                self._idle_loop(conn)
+            except Exception as e:
+                retry_in = self._backoff()
+                logger.warning(f"IDLE connection for {self.account.email} failed, retrying in {retry_in}s: {str(e)}")
+            finally:
+                self._connected = False
+                if conn is not None:
+                    ImapSessionManager._logout(conn)
+                self.hosts.release(host)
+            # Without holding the slot
+            self._stop.wait(retry_in)
+
+    @staticmethod
+    def _readable(sock, timeout: float) -> bool:
+        if sock.pending():
+            return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
+
+    def _idle_loop(self, conn):
+        # imaplib has no IDLE support before Python 3.14, so drive the socket
+        # directly; the server is silent between commands, so imaplib's own
+        # read buffer is empty whenever we get here.
+        sock = conn.sock
+        while not self._stop.is_set():
+            tag = conn._new_tag()
+            sock.sendall(tag + b' IDLE\r\n')
+            deadline = time.monotonic() + self.idle_timeout
+            buffer = b''
+            events = set()
+            while not self._stop.is_set() and not events and time.monotonic() < deadline:
+                if not self._readable(sock, 1.0):
+                    continue
+                chunk = sock.recv(4096)
+                if not chunk:
+                    raise imaplib.IMAP4.abort('connection closed during IDLE')
+                buffer += chunk
+                while b'\r\n' in buffer:
+                    line, buffer = buffer.split(b'\r\n', 1)
+                    match = _IDLE_PUSH_RE.match(line)
+                    if match:
+                        events.add(match.group(1).decode())
+                    elif line.startswith(b'* BYE'):
+                        raise imaplib.IMAP4.abort(line.decode(errors='ignore'))
+                    elif line.startswith(tag):
+                        raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode(errors='ignore')}")
+
+            sock.sendall(b'DONE\r\n')
+            done_deadline = time.monotonic() + Config.IMAP_TIMEOUT
+            while not buffer.startswith(tag) and b'\r\n' + tag not in buffer:
+                if time.monotonic() > done_deadline:
+                    raise imaplib.IMAP4.abort('no response to IDLE DONE')
+                if self._readable(sock, 1.0):
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        raise imaplib.IMAP4.abort('connection closed after IDLE')
+                    buffer += chunk
+                    for line in buffer.split(b'\r\n'):
+                        match = _IDLE_PUSH_RE.match(line)
+                        if match:
+                            events.add(match.group(1).decode())
+
+            if events:
+                try:
+                    self.on_change(self.account.email, events)
+                except Exception as e:
+                    logger.error(f"IDLE change handler failed for {self.account.email}: {str(e)}")
+
+# Global IMAP session pool
+imap_sessions = ImapSessionManager()
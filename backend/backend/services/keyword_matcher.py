@@ -0,0 +1,58 @@
+import re
+from typing import Dict, FrozenSet, Iterable
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Regex alternation of keywords factored by common prefix.
+
+    re tries the branches of a plain alternation one by one at every
+    position; as a trie each position costs one branch per character. The
+    optional tails are greedy, so the longest keyword at a position wins.
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of keywords occur in a text, in one pass.
+
+    Equivalent to {k for k in keywords if k in text} but scans the text once
+    regardless of how many keywords there are. All keywords are compiled
+    into a single regex: a prefix trie inside a lookahead, tried at every
+    position, so overlapping occurrences are all seen. A keyword nested
+    inside a longer one at the same position ('news' in 'newsletter') is
+    added through the longer keyword's implied set.
+    Matching is case-sensitive; callers pass lowercased text and keywords.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: FrozenSet[str] = frozenset(k for k in keywords if k)
+        self._pattern = re.compile('(?=(' + _trie_pattern(self.keywords) + '))') if self.keywords else None
+        # Keyword -> the other keywords it contains, for those containing any
+        self._implied: Dict[str, FrozenSet[str]] = {}
+        for keyword in self.keywords:
+            nested = frozenset(other for other in self.keywords if other != keyword and other in keyword)
+            if nested:
+                self._implied[keyword] = nested
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """Return the keywords that occur in text."""
+        if not text or self._pattern is None:
+            return frozenset()
+        found = set(self._pattern.findall(text))
+        for keyword in found & self._implied.keys():
+            found |= self._implied[keyword]
+        return frozenset(found)
@@ -0,0 +1,137 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from email.feedparser import BytesFeedParser
+from email.message import Message
+from typing import Dict, Optional
+
+# Bytes handed to the parser per feed() call; bounds the transient str copy
+FEED_CHUNK_SIZE = 64 * 1024
+
+_TLS_VERSION_RE = re.compile(r'\(version=(.+?)\s')
+
+class _IngestMessage(Message):
+    """
+    Message that keeps only the payloads ingest needs.
+
+    Leaf parts other than text/plain (HTML alternatives, images, attachments)
+    have their payload replaced by an empty string as soon as the parser
+    hands it over, so the parsed tree never holds them. The size of the
+    discarded payload is kept in dropped_size. The root of a single-part
+    message always keeps its payload.
+    """
+
+    is_root = False
+    dropped_size = 0
+
+    def set_payload(self, payload, charset=None):
+        if (not self.is_root and isinstance(payload, str)
+                and self.get_content_type() != 'text/plain'):
+            self.dropped_size = len(payload)
+            payload = ''
+        super().set_payload(payload, charset)
+
+@dataclass
+class IngestedMessage:
+    """Everything the fetch pipeline needs from one raw RFC 822 message."""
+    subject: Optional[str]
+    sender: Optional[str]
+    date: Optional[str]
+    message_id: Optional[str]
+    body: str
+    content_hash: str
+    size: int
+    metadata: Dict = field(default_factory=dict)
+
+def _decode_text(payload: bytes) -> str:
+    try:
+        return payload.decode('utf-8')
+    except Exception:
+        try:
+            return payload.decode('latin1')
+        except Exception:
+            return payload.decode('utf-8', errors='ignore')
+
+def parse_message(raw: bytes, chunk_size: int = FEED_CHUNK_SIZE) -> Message:
+    """Parse raw message bytes incrementally, dropping non-text payloads."""
+    state = {'root': None}
+
+    def factory(*args, **kwargs):
+        message = _IngestMessage(*args, **kwargs)
+        if state['root'] is None:
+            state['root'] = message
+            message.is_root = True
+        return message
+
+    parser = BytesFeedParser(_factory=factory)
+    # FeedParser probes the factory once while initialising; forget that instance
+    state['root'] = None
+    view = memoryview(raw)
+    for offset in range(0, len(view), chunk_size):
+        parser.feed(view[offset:offset + chunk_size].tobytes())
+    return parser.close()
+
+def ingest_message(raw: bytes) -> IngestedMessage:
+    """
+    Extract headers, text body, metadata and content hash in a single parse.
+
+    content_hash is the sha256 hex digest of the raw From, To, Date and
+    Subject header values followed by the text of every text/plain part
+    (decoded as UTF-8, undecodable bytes dropped), fed part by part rather
+    than concatenated. Stored email_hash values depend on exactly this input.
+
+    Args:
+        raw: Raw message bytes as returned by IMAP FETCH BODY[]
+
+    Returns:
+        IngestedMessage; header values are undecoded (RFC 2047) strings
+    """
+    message = parse_message(raw)
+
+    digest = hashlib.sha256()
+    digest.update(f"{message.get('From', '')}{message.get('To', '')}"
+                  f"{message.get('Date', '')}{message.get('Subject', '')}".encode('utf-8'))
+
+    body = None
+    if message.is_multipart():
+        for part in message.walk():
+            if part.get_content_type() != 'text/plain':
+                continue
+            payload = part.get_payload(decode=True)
+            digest.update(payload.decode(errors='ignore').encode('utf-8'))
+            if body is None and 'attachment' not in str(part.get('Content-Disposition')):
+                body = _decode_text(payload)
+    else:
+        payload = message.get_payload(decode=True)
+        if payload is not None:
+            digest.update(payload.decode(errors='ignore').encode('utf-8'))
+            body = _decode_text(payload)
+
+    metadata = {}
+    if message.get('Mailed-By'):
+        metadata['mailed_by'] = message.get('Mailed-By')
+    if message.get('Signed-By'):
+        metadata['signed_by'] = message.get('Signed-By')
+
+    # Security info (TLS) from the first Received header that mentions it
+    security_info = "No encryption information found"
+    for header in message.get_all('Received', []):
+        if 'TLS' in header or 'SSL' in header:
+            match = _TLS_VERSION_RE.search(header)
+            if match:
+                security_info = f"Standard encryption ({match.group(1).split(',')[0]})"
+            else:
+                security_info = "Standard encryption (TLS)"
+            break
+    metadata['security'] = security_info
+
+    return IngestedMessage(
+        subject=message.get('Subject'),
+        sender=message.get('From'),
+        date=message.get('Date'),
+        message_id=message.get('Message-ID'),
+        body=(body or '').strip(),
+        content_hash=digest.hexdigest(),
+        size=len(raw),
+        metadata=metadata
+    )
@@ -0,0 +1,183 @@
+import abc
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+from ..config import Config
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+REF_PREFIX = 'sha256:'
+
+class RawStoreBackend(abc.ABC):
+    """Storage for compressed raw message blobs keyed by content hash."""
+
+    @abc.abstractmethod
+    def put(self, digest: str, data: bytes) -> None:
+        """Store data under digest; storing an existing digest only marks it as recently stored."""
+
+    @abc.abstractmethod
+    def get(self, digest: str) -> Optional[bytes]:
+        """Return the decompressed data, or None if digest is not stored."""
+
+    @abc.abstractmethod
+    def exists(self, digest: str) -> bool:
+        """Whether a blob is stored under digest."""
+
+    @abc.abstractmethod
+    def delete(self, digest: str, min_age: float = 0) -> bool:
+        """
+        Remove the blob stored under digest, unless it was (re)stored within min_age seconds.
+
+        Returns:
+            True if nothing is stored under digest afterwards
+        """
+
+class FilesystemRawStore(RawStoreBackend):
+    """
+    Blobs as files under root, sharded two levels deep by hash (ab/cd/abcd...).
+
+    Writes go to a temporary file that is renamed into place, so readers
+    never see a partial blob and concurrent writers of the same content are
+    harmless. New blobs use zstd when the zstandard package is installed and
+    RAW_STORE_COMPRESSION allows it, gzip otherwise; both are readable.
+    Storing a blob that already exists touches its file, so the mtime is
+    the last time anything referenced it anew.
+    """
+
+    def __init__(self, root: str, compression: str = 'zstd', level: int = None):
+        self.root = root
+        self.codec = 'zst' if compression == 'zstd' and zstandard is not None else 'gz'
+        self.level = level
+
+    def _path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{codec}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zst':
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(data)
+        return gzip.compress(data, compresslevel=self.level or 6)
+
+    def put(self, digest: str, data: bytes) -> None:
+        touched = False
+        for codec in ('zst', 'gz'):
+            try:
+                os.utime(self._path(digest, codec))
+                touched = True
+            except FileNotFoundError:
+                pass
+        if touched:
+            return
+        path = self._path(digest, self.codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._compress(data))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, digest: str) -> Optional[bytes]:
+        for codec in ('zst', 'gz'):
+            path = self._path(digest, codec)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if codec == 'gz':
+                return gzip.decompress(data)
+            if zstandard is None:
+                raise RuntimeError(f"Raw message {digest} is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return None
+
+    def exists(self, digest: str) -> bool:
+        return any(os.path.exists(self._path(digest, codec)) for codec in ('zst', 'gz'))
+
+    def delete(self, digest: str, min_age: float = 0) -> bool:
+        kept = False
+        for codec in ('zst', 'gz'):
+            path = self._path(digest, codec)
+            try:
+                if min_age and time.time() - os.path.getmtime(path) < min_age:
+                    kept = True
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return not kept
+
+# Backend factories by RAW_STORE_BACKEND name; register_backend adds more
+_BACKENDS: Dict[str, Callable[[], RawStoreBackend]] = {
+    'filesystem': lambda: FilesystemRawStore(Config.RAW_STORE_PATH, Config.RAW_STORE_COMPRESSION)
+}
+
+def register_backend(name: str, factory: Callable[[], RawStoreBackend]):
+    """Make a backend selectable through Config.RAW_STORE_BACKEND."""
+    _BACKENDS[name] = factory
+
+class RawMessageStore:
+    """Content-addressed store for raw RFC 822 messages."""
+
+    def __init__(self, backend: RawStoreBackend = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> RawStoreBackend:
+        if self._backend is None:
+            factory = _BACKENDS.get(Config.RAW_STORE_BACKEND)
+            if factory is None:
+                raise ValueError(f"Unknown raw store backend: {Config.RAW_STORE_BACKEND}")
+            self._backend = factory()
+        return self._backend
+
+    def put(self, raw: bytes) -> str:
+        """
+        Store a raw message.
+
+        Args:
+            raw: Message bytes
+
+        Returns:
+            Reference ('sha256:<hex>') to keep in emails.raw_ref
+        """
+        digest = hashlib.sha256(raw).hexdigest()
+        self.backend.put(digest, raw)
+        return REF_PREFIX + digest
+
+    def get(self, ref: str) -> Optional[bytes]:
+        """Load a raw message by reference, or None if it is not stored."""
+        if not ref or not ref.startswith(REF_PREFIX):
+            return None
+        return self.backend.get(ref[len(REF_PREFIX):])
+
+    def delete(self, ref: str, min_age: float = None) -> bool:
+        """
+        Delete a raw message no email references any more.
+
+        A blob stored again within min_age seconds (default
+        RAW_STORE_DELETE_GRACE) is kept: a fetch may have just reused it for
+        an email it has not saved yet.
+
+        Returns:
+            True if the blob is gone
+        """
+        if not ref or not ref.startswith(REF_PREFIX):
+            return False
+        min_age = Config.RAW_STORE_DELETE_GRACE if min_age is None else min_age
+        return self.backend.delete(ref[len(REF_PREFIX):], min_age)
+
+# Global raw message store
+raw_store = RawMessageStore()
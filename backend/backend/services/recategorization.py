@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .category_rules import category_rules
+from .email_service import EmailService
+from ..config import Config
+from ..models.db_models import db_manager
+
+logger = logging.getLogger(__name__)
+
+# job_checkpoints row, also the MySQL named lock held while the job runs
+JOB_NAME = 'recategorize_emails'
+
+class RecategorizationJob:
+    """
+    Background re-categorization of stored emails after the rules change.
+
+    Emails categorized under an older rule set version are read in id order,
+    RECATEGORIZE_CHUNK_SIZE at a time. Each chunk is categorized with
+    EmailService.categorize_many and written back with one UPDATE of the
+    category columns only. The last id done is checkpointed in
+    job_checkpoints after every chunk, so a job cut short by a restart
+    continues where it stopped (resume()). Writes are paced to
+    RECATEGORIZE_MAX_WRITES_PER_SEC rows per second. If a newer rule set is
+    published meanwhile, the job starts over under it.
+
+    A MySQL named lock keeps a second process from running the job at the
+    same time; every process reports the shared checkpoint as its status.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stop_status = 'paused'
+        self._state = None
+        self._email_service = None
+
+    def _service(self) -> EmailService:
+        if not self._email_service:
+            self._email_service = EmailService()
+        return self._email_service
+
+    def _new_state(self, rules_version: int) -> Dict:
+        now = datetime.now().isoformat()
+        return {
+            'status': 'running',
+            'rules_version': rules_version,
+            'after_id': '',
+            'total': self.db.count_emails_for_recategorization(rules_version),
+            'processed': 0,
+            'updated': 0,
+            'started_at': now,
+            'updated_at': now,
+            'finished_at': None,
+            'error': None
+        }
+
+    def _save(self):
+        self._state['updated_at'] = datetime.now().isoformat()
+        self.db.save_job_checkpoint(JOB_NAME, self._state)
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, restart: bool = False) -> Dict:
+        """
+        Start the job in a background thread, continuing an unfinished run.
+
+        Args:
+            restart: Start from the first email even if a run was unfinished
+
+        Returns:
+            Job status (see get_status)
+        """
+        with self._lock:
+            if self.is_running():
+                return self.get_status()
+
+            self._stop.clear()
+            self._stop_status = 'paused'
+            started = threading.Event()
+            outcome = {}
+            self._thread = threading.Thread(target=self._run, args=(restart, started, outcome),
+                                            name='recategorization', daemon=True)
+            self._thread.start()
+            started.wait()
+            if not outcome.get('started'):
+                self._thread.join()
+            return self.get_status()
+
+    def resume(self):
+        """Continue a run cut short by a shutdown or a crash; paused runs stay paused."""
+        state = self.db.get_job_checkpoint(JOB_NAME)
+        if state and state['status'] in ('running', 'interrupted') and not self.is_running():
+            self.start()
+
+    def stop(self, timeout: float = None, interrupt: bool = False) -> Dict:
+        """
+        Stop the job after its current chunk; start() continues it.
+
+        Args:
+            timeout: Seconds to wait for the chunk to finish
+            interrupt: Record the run as interrupted rather than paused, so
+                resume() picks it up again (used on shutdown)
+        """
+        if not self.is_running():
+            return self.get_status()
+        self._stop_status = 'interrupted' if interrupt else 'paused'
+        self._stop.set()
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+        return self.get_status()
+
+    def _begin(self, restart: bool) -> Dict:
+        version = category_rules.current().version
+        state = None if restart else self.db.get_job_checkpoint(JOB_NAME)
+        if not state or state['status'] == 'completed' or state['rules_version'] != version:
+            state = self._new_state(version)
+        state['status'] = 'running'
+        state['error'] = None
+        self._state = state
+        self._save()
+        logger.info(f"Re-categorization started under rule set version {version} after id '{state['after_id']}'")
+        return state
+
+    def _run(self, restart: bool, started: threading.Event, outcome: Dict):
+        try:
+            # The named lock belongs to the connection that took it, so this
+            # thread checks out its own for the whole run: one borrowed from
+            # the caller (e.g. a request's) would go back to the pool with the
+            # lock still held
+            with self.db.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT GET_LOCK(%s, 0)', (JOB_NAME,))
+                if not cursor.fetchone()[0]:
+                    logger.info("Re-categorization is already running in another process")
+                    return
+                try:
+                    try:
+                        state = self._begin(restart)
+                        outcome['started'] = True
+                    finally:
+                        started.set()
+                    self._process(state)
+                finally:
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT RELEASE_LOCK(%s)', (JOB_NAME,))
+                    cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Re-categorization could not run: {str(e)}")
+        finally:
+            started.set()
+
+    def _process(self, state: Dict):
+        try:
+            while not self._stop.is_set():
+                rules = category_rules.current()
+                if rules.version != state['rules_version']:
+                    logger.info(f"Category rules changed to version {rules.version}; restarting re-categorization")
+                    state = self._state = self._new_state(rules.version)
+
+                started = time.monotonic()
+                emails = self.db.get_emails_for_recategorization(
+                    state['rules_version'], state['after_id'], Config.RECATEGORIZE_CHUNK_SIZE
+                )
+                if emails is None:
+                    raise RuntimeError('Failed to read emails')
+                if not emails:
+                    state['status'] = 'completed'
+                    state['finished_at'] = datetime.now().isoformat()
+                    break
+
+                categories = self._service().categorize_many(emails, rules)
+                updated = self.db.update_email_categories(
+                    [(email.id, main, sub) for email, (main, sub) in zip(emails, categories)],
+                    state['rules_version']
+                )
+                if updated < 0:
+                    raise RuntimeError('Failed to write categories')
+
+                state['after_id'] = emails[-1].id
+                state['processed'] += len(emails)
+                state['updated'] += updated
+                self._save()
+
+                if Config.RECATEGORIZE_MAX_WRITES_PER_SEC:
+                    budget = len(emails) / Config.RECATEGORIZE_MAX_WRITES_PER_SEC
+                    self._stop.wait(max(0.0, budget - (time.monotonic() - started)))
+            else:
+                state['status'] = self._stop_status
+        except Exception as e:
+            logger.error(f"Re-categorization failed: {str(e)}")
+            state['status'] = 'failed'
+            state['error'] = str(e)
+        finally:
+            self._save()
+            logger.info(f"Re-categorization {state['status']}: {state['processed']} emails processed, "
+                        f"{state['updated']} updated")
+
+    def categorize_ids(self, email_ids: List[str]) -> Dict:
+        """
+        Re-categorize specific emails now, under the active rules.
+
+        Returns:
+            Dictionary with categorized and skipped email counts
+        """
+        rules = category_rules.current()
+        emails = self.db.get_emails_for_recategorization(rules.version, limit=len(email_ids), email_ids=email_ids)
+        if emails is None:
+            return {'success': False, 'categorized': 0, 'skipped': len(email_ids), 'errors': ['Failed to read emails']}
+
+        categories = self._service().categorize_many(emails, rules)
+        updated = self.db.update_email_categories(
+            [(email.id, main, sub) for email, (main, sub) in zip(emails, categories)], rules.version
+        )
+        if updated < 0:
+            return {'success': False, 'categorized': 0, 'skipped': len(email_ids), 'errors': ['Failed to write categories']}
+        return {
+            'success': True,
+            'categorized': updated,
+            'skipped': len(email_ids) - updated,
+            'errors': []
+        }
+
+    def get_status(self) -> Dict:
+        """
+        Get the job's progress.
+
+        Returns:
+            The checkpointed state (status is one of running, paused,
+            interrupted, completed, failed; idle if the job never ran) plus
+            progress in percent, whether this process runs it and the active
+            rules version
+        """
+        state = dict(self._state) if self.is_running() else self.db.get_job_checkpoint(JOB_NAME)
+        if not state:
+            state = {'status': 'idle'}
+        total = state.get('total') or 0
+        if total:
+            state['progress'] = round(min(state.get('processed', 0) / total, 1.0) * 100, 1)
+        else:
+            state['progress'] = 100.0 if state['status'] == 'completed' else None
+        state['running_here'] = self.is_running()
+        state['active_rules_version'] = category_rules.current().version
+        return state
+
+# Shared job instance
+recategorization_job = RecategorizationJob()
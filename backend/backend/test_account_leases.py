@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for AccountLeaseManager sharding accounts across sync workers, against
+an in-memory stand-in for the account_leases and sync_workers tables.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_account_leases
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.account_leases import AccountLeaseManager
+
+class FakeLeaseDatabase:
+    """The DatabaseManager lease methods, with the same takeover rules as the SQL."""
+
+    def __init__(self, accounts):
+        self.accounts = list(accounts)
+        self.workers = []
+        self.leases = {}  # account email -> owner
+        self.expired = set()
+        self.released = []
+
+    def heartbeat_sync_worker(self, worker_id, ttl):
+        if worker_id not in self.workers:
+            self.workers.append(worker_id)
+        return list(self.workers)
+
+    def get_account_leases(self):
+        return {email: {'owner': owner, 'expires_at': None, 'expired': email in self.expired}
+                for email, owner in self.leases.items()}
+
+    def get_email_accounts(self):
+        return [SimpleNamespace(email=email) for email in self.accounts]
+
+    def acquire_account_leases(self, owner, account_emails, ttl):
+        for email in account_emails:
+            if email not in self.leases or email in self.expired:
+                self.leases[email] = owner
+                self.expired.discard(email)
+        return [email for email, lease_owner in self.leases.items() if lease_owner == owner]
+
+    def release_account_leases(self, owner, account_emails=None):
+        for email in list(self.leases):
+            if self.leases[email] == owner and (account_emails is None or email in account_emails):
+                del self.leases[email]
+                self.released.append((owner, email))
+        if account_emails is None and owner in self.workers:
+            self.workers.remove(owner)
+        return True
+
+ACCOUNTS = [f'user{i}@example.com' for i in range(6)]
+
+class AccountLeaseManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeLeaseDatabase(ACCOUNTS)
+        self.busy = {'a': set(), 'b': set()}
+        self.a = AccountLeaseManager(self.db, worker_id='a', ttl=60, heartbeat_interval=15)
+        self.a._busy = lambda: set(self.busy['a'])
+        self.b = AccountLeaseManager(self.db, worker_id='b', ttl=60, heartbeat_interval=15)
+        self.b._busy = lambda: set(self.busy['b'])
+
+    def test_single_worker_claims_every_account(self):
+        self.assertTrue(self.a.heartbeat())
+        self.assertEqual(self.a.owned(), set(ACCOUNTS))
+
+    def test_second_worker_gets_half_once_surplus_is_released(self):
+        self.a.heartbeat()
+        self.b.heartbeat()
+        # a still holds everything until it rebalances
+        self.assertEqual(self.b.owned(), set())
+
+        self.a.heartbeat()
+        # Surplus leaves owned() first but stays leased for one more heartbeat
+        self.assertEqual(len(self.a.owned()), 3)
+        self.assertEqual(set(self.db.leases.values()), {'a'})
+        self.b.heartbeat()
+        self.assertEqual(self.b.owned(), set())
+
+        self.a.heartbeat()
+        self.b.heartbeat()
+        self.assertEqual(len(self.b.owned()), 3)
+        self.assertEqual(self.a.owned() | self.b.owned(), set(ACCOUNTS))
+        self.assertFalse(self.a.owned() & self.b.owned())
+
+    def test_busy_account_is_not_released(self):
+        self.a.heartbeat()
+        self.b.heartbeat()
+        self.a.heartbeat()
+        surplus = set(ACCOUNTS) - self.a.owned()
+        syncing = sorted(surplus)[0]
+        self.busy['a'] = {syncing}
+
+        self.a.heartbeat()
+        self.b.heartbeat()
+        self.assertEqual(self.db.leases[syncing], 'a')
+        self.assertNotIn(syncing, self.a.owned())
+        self.assertNotIn(syncing, self.b.owned())
+        self.assertEqual(self.b.owned(), surplus - {syncing})
+
+        self.busy['a'] = set()
+        self.a.heartbeat()
+        self.b.heartbeat()
+        self.assertEqual(self.b.owned(), surplus)
+
+    def test_surplus_returns_to_owned_when_share_grows(self):
+        self.a.heartbeat()
+        self.b.heartbeat()
+        self.a.heartbeat()
+        self.assertEqual(len(self.a.owned()), 3)
+
+        self.db.workers.remove('b')
+        self.a.heartbeat()
+        self.assertEqual(self.a.owned(), set(ACCOUNTS))
+
+    def test_expired_lease_is_taken_over(self):
+        self.a.heartbeat()
+        self.db.workers.remove('a')
+        self.db.expired.update(ACCOUNTS)
+        self.b.heartbeat()
+        self.assertEqual(self.b.owned(), set(ACCOUNTS))
+
+    def test_removed_account_is_released(self):
+        self.a.heartbeat()
+        self.db.accounts.remove(ACCOUNTS[0])
+        self.a.heartbeat()
+        self.assertNotIn(ACCOUNTS[0], self.db.leases)
+        self.assertEqual(self.a.owned(), set(ACCOUNTS[1:]))
+
+    def test_stop_releases_everything(self):
+        self.a.heartbeat()
+        self.a.stop()
+        self.assertEqual(self.db.leases, {})
+        self.assertEqual(self.a.owned(), set())
+
+if __name__ == '__main__':
+    unittest.main()
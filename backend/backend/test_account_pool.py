@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Tests for AccountSyncPool timeouts, late results, per-host limits and
+overlapping runs, with tasks that block until the test releases them.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_account_pool
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.email_models import EmailAccount
+from backend.utils.account_pool import AccountSyncPool, HostConnectionBudget
+
+# Upper bound on waiting for anything the pool should do promptly
+WAIT = 5.0
+
+def make_account(name: str, host: str = 'imap.example.com') -> EmailAccount:
+    return EmailAccount(email=f'{name}@example.com', password='x', imap_server=host)
+
+class BlockingTask:
+    """Sync function that blocks each account until release() or release_all()."""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._released = set()
+        self._release_all = False
+        self.started = []
+        self.active: dict = {}
+        self.peak: dict = {}
+
+    def __call__(self, account: EmailAccount):
+        host = account.imap_server
+        with self._lock:
+            self.started.append(account.email)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            self._lock.notify_all()
+            released = self._lock.wait_for(
+                lambda: self._release_all or account.email in self._released, timeout=WAIT)
+            self.active[host] -= 1
+        if not released:
+            raise RuntimeError('test never released the task')
+        if account.email.startswith('fail'):
+            raise ValueError('login failed')
+        return account.email.upper()
+
+    def wait_started(self, count: int) -> bool:
+        with self._lock:
+            return self._lock.wait_for(lambda: len(self.started) >= count, timeout=WAIT)
+
+    def release(self, account: EmailAccount):
+        with self._lock:
+            self._released.add(account.email)
+            self._lock.notify_all()
+
+    def release_all(self):
+        with self._lock:
+            self._release_all = True
+            self._lock.notify_all()
+
+class Results:
+    """on_result collector that tests can wait on."""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self.items = []
+
+    def __call__(self, account_email: str, result: dict):
+        with self._lock:
+            self.items.append((account_email, result))
+            self._lock.notify_all()
+
+    def wait_for(self, count: int) -> list:
+        with self._lock:
+            self._lock.wait_for(lambda: len(self.items) >= count, timeout=WAIT)
+            return list(self.items)
+
+class AccountSyncPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.task = BlockingTask()
+        self.addCleanup(self.task.release_all)
+
+    def make_pool(self, **kwargs) -> AccountSyncPool:
+        kwargs.setdefault('max_workers', 4)
+        kwargs.setdefault('max_per_host', 4)
+        kwargs.setdefault('account_timeout', 30)
+        pool = AccountSyncPool(**kwargs)
+        self.addCleanup(pool.shutdown, False)
+        return pool
+
+    def test_submit_reports_timeout_then_late_result(self):
+        pool = self.make_pool(account_timeout=0.2)
+        results = Results()
+        account = make_account('slow')
+        self.assertTrue(pool.submit(account, self.task, 'fetch', results))
+
+        [(email, timeout)] = results.wait_for(1)
+        self.assertEqual(email, account.email)
+        self.assertEqual(timeout['status'], 'timeout')
+        self.assertGreater(timeout['elapsed'], 0.2)
+        # Still running, so neither a new submit nor lease handoff may touch it
+        self.assertEqual(pool.in_flight_accounts(), {account.email})
+        self.assertFalse(pool.submit(account, self.task, 'fetch', results))
+
+        self.task.release(account)
+        _, (email, late) = results.wait_for(2)
+        self.assertEqual(late['status'], 'ok')
+        self.assertEqual(late['result'], 'SLOW@EXAMPLE.COM')
+        self.assertTrue(late['late'])
+        self.assertEqual(pool.in_flight_accounts(), set())
+        self.assertEqual(len(results.items), 2)
+
+    def test_submit_result_in_time_is_not_late(self):
+        pool = self.make_pool()
+        results = Results()
+        account = make_account('quick')
+        self.task.release(account)
+        self.assertTrue(pool.submit(account, self.task, 'fetch', results))
+        [(_, result)] = results.wait_for(1)
+        self.assertEqual(result['status'], 'ok')
+        self.assertNotIn('late', result)
+
+    def test_duplicate_submit_is_rejected_per_task(self):
+        pool = self.make_pool()
+        results = Results()
+        account = make_account('a')
+        self.assertTrue(pool.submit(account, self.task, 'fetch', results))
+        self.assertFalse(pool.submit(account, self.task, 'fetch', results))
+        # Another task type for the same account is a separate key
+        self.assertTrue(pool.submit(account, self.task, 'read_sync', results))
+        self.assertEqual(pool.get_status()['in_flight'], ['fetch:a@example.com', 'read_sync:a@example.com'])
+
+        self.task.release(account)
+        results.wait_for(2)
+        self.assertTrue(pool.submit(account, self.task, 'fetch', results))
+
+    def test_submit_reports_errors(self):
+        pool = self.make_pool()
+        results = Results()
+        account = make_account('fail')
+        self.task.release(account)
+        pool.submit(account, self.task, 'fetch', results)
+        [(_, result)] = results.wait_for(1)
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['error'], 'login failed')
+        self.assertEqual(pool.in_flight_accounts(), set())
+
+    def test_per_host_limit(self):
+        pool = self.make_pool(max_workers=6, max_per_host=2)
+        results = Results()
+        busy_host = [make_account(f'busy{i}', 'imap.busy.example') for i in range(4)]
+        other_host = [make_account('other', 'imap.other.example')]
+        for account in busy_host + other_host:
+            self.assertTrue(pool.submit(account, self.task, 'fetch', results))
+
+        self.assertTrue(self.task.wait_started(3))
+        time.sleep(0.2)
+        self.assertEqual(self.task.active, {'imap.busy.example': 2, 'imap.other.example': 1})
+
+        self.task.release_all()
+        self.assertEqual(len(results.wait_for(5)), 5)
+        self.assertEqual(self.task.peak, {'imap.busy.example': 2, 'imap.other.example': 1})
+        self.assertTrue(all(result['status'] == 'ok' for _, result in results.items))
+
+    def test_host_names_share_a_limit_regardless_of_case(self):
+        pool = self.make_pool(max_per_host=1)
+        results = Results()
+        pool.submit(make_account('a', 'IMAP.Example.com'), self.task, 'fetch', results)
+        pool.submit(make_account('b', 'imap.example.com'), self.task, 'fetch', results)
+        self.assertTrue(self.task.wait_started(1))
+        time.sleep(0.2)
+        self.assertEqual(len(self.task.started), 1)
+        self.task.release_all()
+        self.assertEqual(len(results.wait_for(2)), 2)
+
+    def test_run_times_out_and_skips_account_still_running(self):
+        pool = self.make_pool(account_timeout=0.2)
+        slow, quick = make_account('slow'), make_account('quick')
+        self.task.release(quick)
+        results = pool.run([slow, quick], self.task, 'fetch')
+        self.assertEqual(results['slow@example.com']['status'], 'timeout')
+        self.assertEqual(results['quick@example.com']['status'], 'ok')
+
+        again = pool.run([slow], self.task, 'fetch')
+        self.assertEqual(again['slow@example.com'], {'status': 'busy', 'elapsed': 0.0})
+
+        self.task.release(slow)
+        self.assertTrue(pool.drain(WAIT))
+
+    def test_drain_cancels_queued_accounts(self):
+        pool = self.make_pool(max_workers=1)
+        results = Results()
+        running, queued = make_account('running'), make_account('queued')
+        pool.submit(running, self.task, 'fetch', results)
+        self.assertTrue(self.task.wait_started(1))
+        pool.submit(queued, self.task, 'fetch', results)
+
+        self.assertFalse(pool.drain(0.2))
+        [(email, result)] = results.wait_for(1)
+        self.assertEqual((email, result['status']), ('queued@example.com', 'cancelled'))
+        self.assertEqual(pool.in_flight_accounts(), {'running@example.com'})
+        self.assertFalse(pool.submit(make_account('late'), self.task, 'fetch', results))
+
+        self.task.release(running)
+        self.assertTrue(pool.drain(WAIT))
+        self.assertEqual(results.wait_for(2)[1][1]['status'], 'ok')
+
+class HostConnectionBudgetTest(unittest.TestCase):
+    def test_try_acquire_keeps_slots_free(self):
+        budget = HostConnectionBudget(3)
+        self.assertTrue(budget.try_acquire('imap.example.com', keep_free=1))
+        self.assertTrue(budget.try_acquire('IMAP.Example.com', keep_free=1))
+        self.assertFalse(budget.try_acquire('imap.example.com', keep_free=1))
+        self.assertTrue(budget.try_acquire('imap.example.com'))
+        self.assertFalse(budget.try_acquire('imap.example.com'))
+        self.assertTrue(budget.try_acquire('imap.other.example', keep_free=2))
+        self.assertEqual(budget.in_use(), {'imap.example.com': 3, 'imap.other.example': 1})
+
+    def test_acquire_waits_for_release(self):
+        budget = HostConnectionBudget(1)
+        budget.acquire('imap.example.com')
+        acquired = threading.Event()
+
+        def worker():
+            budget.acquire('imap.example.com')
+            acquired.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.assertFalse(acquired.wait(0.2))
+        budget.release('imap.example.com')
+        self.assertTrue(acquired.wait(WAIT))
+
+    def test_pool_and_long_lived_holders_share_the_budget(self):
+        budget = HostConnectionBudget(2)
+        pool = AccountSyncPool(max_workers=2, account_timeout=30)
+        pool._hosts = budget
+        self.addCleanup(pool.shutdown, False)
+        # An IDLE connection holds one slot, so one sync runs at a time
+        self.assertTrue(budget.try_acquire('imap.example.com', keep_free=1))
+        task = BlockingTask()
+        self.addCleanup(task.release_all)
+        results = Results()
+        pool.submit(make_account('a'), task, 'fetch', results)
+        pool.submit(make_account('b'), task, 'fetch', results)
+        self.assertTrue(task.wait_started(1))
+        time.sleep(0.2)
+        self.assertEqual(len(task.started), 1)
+        self.assertFalse(budget.try_acquire('imap.example.com', keep_free=1))
+        task.release_all()
+        self.assertEqual(len(results.wait_for(2)), 2)
+        self.assertEqual(budget.in_use(), {'imap.example.com': 1})
+
+if __name__ == '__main__':
+    unittest.main()
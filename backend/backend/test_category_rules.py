@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Tests that the compiled category rules classify exactly like the original
+hierarchical categorizer, that KeywordMatcher finds the same keywords as
+plain substring checks, and that EmailService.categorize_many applies a
+given rule set version.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_category_rules
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.email_models import Email
+from backend.services.category_rules import COMPANY_NAME, SENDER_NAME, CategoryRuleSet
+from backend.services.email_service import EmailService
+from backend.services.keyword_matcher import KeywordMatcher
+
+def baseline_categorize(subject: str, sender: str, domain: str) -> tuple:
+    """
+    The if-chain of the original EmailService._enhanced_categorize_email.
+
+    Sub-categories derived from the sender are returned as the SENDER_NAME
+    and COMPANY_NAME placeholders, as CategoryRuleSet.classify does.
+    """
+    bank_keywords = ['bank', 'sbi', 'hdfc', 'icici', 'axis', 'kotak', 'yes', 'pnb', 'union']
+    bank_domains = ['sbi.co.in', 'hdfcbank.com', 'icicibank.com', 'axisbank.com', 'kotak.com', 'yesbank.in', 'pnb.co.in']
+    if (any(k in subject or k in sender for k in bank_keywords) or
+            any(d in domain for d in bank_domains)):
+        known_banks = {
+            'sbi': 'state_bank_of_india', 'hdfc': 'hdfc_bank', 'icici': 'icici_bank', 'axis': 'axis_bank',
+            'kotak': 'kotak_bank', 'yes': 'yes_bank', 'pnb': 'punjab_national_bank', 'union': 'union_bank',
+            'canara': 'canara_bank', 'bankofbaroda': 'bank_of_baroda', 'idbi': 'idbi_bank'
+        }
+        for keyword, bank_name in known_banks.items():
+            if keyword in subject or keyword in sender or keyword in domain:
+                return ('bank', bank_name)
+        return ('bank', SENDER_NAME)
+
+    if any(k in subject for k in ['invoice', 'receipt', 'statement', 'account', 'business', 'corporate']):
+        return ('company', COMPANY_NAME)
+
+    if any(k in subject for k in ['support', 'help', 'issue', 'problem', 'ticket', 'assistance']):
+        if any(w in subject for w in ['technical', 'tech', 'software', 'app']):
+            return ('support', 'technical')
+        if any(w in subject for w in ['billing', 'payment', 'invoice']):
+            return ('support', 'billing')
+        return ('support', 'general')
+
+    if any(k in subject for k in ['newsletter', 'news', 'update', 'digest', 'weekly', 'monthly']):
+        if any(w in subject for w in ['tech', 'technology', 'software']):
+            return ('newsletter', 'tech_news')
+        if any(w in subject for w in ['business', 'finance', 'market']):
+            return ('newsletter', 'business_news')
+        if any(w in subject for w in ['health', 'medical', 'fitness']):
+            return ('newsletter', 'health_news')
+        return ('newsletter', 'general_news')
+
+    if any(k in subject for k in ['invoice', 'payment', 'bill', 'receipt', 'statement', 'due']):
+        for word in ['invoice', 'payment', 'receipt']:
+            if word in subject:
+                return ('billing', word)
+        return ('billing', 'billing')
+
+    if any(k in subject for k in ['order', 'purchase', 'buy', 'shipping', 'delivery', 'tracking']):
+        if 'shipping' in subject or 'delivery' in subject:
+            return ('order', 'shipping')
+        if 'tracking' in subject:
+            return ('order', 'tracking')
+        if 'order' in subject:
+            return ('order', 'order_confirmation')
+        return ('order', 'order')
+
+    social = ['facebook', 'twitter', 'linkedin', 'instagram', 'youtube']
+    if (any(f'{p}.com' in domain for p in social) or
+            any(p in subject or p in sender for p in social)):
+        for platform in social:
+            if platform in subject or platform in sender or f'{platform}.com' in domain:
+                return ('social', platform)
+        return ('social', 'other_social')
+
+    if any(k in subject for k in ['security', 'password', 'login', 'verification', 'otp', '2fa']):
+        if 'otp' in subject or 'verification' in subject:
+            return ('security', 'otp')
+        if 'password' in subject:
+            return ('security', 'password')
+        if 'login' in subject:
+            return ('security', 'login')
+        return ('security', 'security')
+
+    if any(k in subject for k in ['meeting', 'appointment', 'schedule', 'calendar', 'call']):
+        if 'appointment' in subject:
+            return ('meeting', 'appointment')
+        if 'call' in subject:
+            return ('meeting', 'call')
+        return ('meeting', 'meeting')
+
+    if any(k in subject for k in ['job', 'career', 'application', 'resume', 'interview', 'position']):
+        if 'interview' in subject:
+            return ('career', 'interview')
+        if 'application' in subject:
+            return ('career', 'application')
+        return ('career', 'job')
+
+    if any(k in subject for k in ['notification', 'alert', 'reminder', 'update']):
+        if 'failed' in subject or 'error' in subject:
+            return ('notification', 'failure')
+        if 'success' in subject or 'completed' in subject:
+            return ('notification', 'success')
+        return ('notification', 'general')
+
+    return ('general', SENDER_NAME)
+
+def extract_domain(sender: str) -> str:
+    """Same as EmailService._extract_domain."""
+    if '@' in sender:
+        return sender.split('@')[-1].split('>')[0].strip()
+    return sender
+
+SUBJECTS = [
+    'Your HDFC credit card statement is ready',
+    'Invoice #4411 for your subscription',
+    'Need help: app crashes on login',
+    'Support ticket about billing',
+    'Weekly tech digest',
+    'Monthly market newsletter',
+    'Payment due tomorrow',
+    'Your order has shipped - tracking inside',
+    'Delivery scheduled for Friday',
+    'New login to your Facebook account',
+    'Your OTP for verification',
+    'Password reset requested',
+    'Meeting reminder: quarterly call',
+    'Appointment confirmed',
+    'Interview invitation for the backend position',
+    'Application received',
+    'Alert: backup failed',
+    'Reminder: job completed successfully',
+    'Lunch on Friday?',
+    'Yesterday\'s notes',
+    '',
+]
+
+SENDERS = [
+    'alerts@hdfcbank.com',
+    'State Bank <noreply@sbi.co.in>',
+    'billing@acme-corp.com',
+    '"Jane Doe" <jane@example.org>',
+    'notify@linkedin.com',
+    'no-reply@youtube.com',
+    'team@www.example.com',
+    'friend@gmail.com',
+    'unionstation@travel.io',
+]
+
+VOCABULARY = sorted({
+    keyword
+    for rule in CategoryRuleSet().rules
+    for match in [rule.match] + [sub_match for _, sub_match in rule.subs]
+    for _, keywords in match
+    for keyword in keywords
+} | {'hello', 'report', 'the', 'your', 'news letter', 'bankofbaroda', 'canara', 'idbi'})
+
+class CategoryRuleSetParityTest(unittest.TestCase):
+    """CategoryRuleSet with the default rules against the original categorizer."""
+
+    def setUp(self):
+        self.rules = CategoryRuleSet()
+
+    def assert_same(self, subject: str, sender: str):
+        subject, sender = subject.lower(), sender.lower()
+        domain = extract_domain(sender)
+        self.assertEqual(self.rules.classify(subject, sender, domain),
+                         baseline_categorize(subject, sender, domain),
+                         f"subject={subject!r} sender={sender!r}")
+
+    def test_representative_emails(self):
+        for subject in SUBJECTS:
+            for sender in SENDERS:
+                self.assert_same(subject, sender)
+
+    def test_random_keyword_combinations(self):
+        rng = random.Random(17)
+        for _ in range(5000):
+            subject = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(0, 5)))
+            local = ''.join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 2))).replace(' ', '')
+            host = rng.choice(VOCABULARY + ['example', 'mail']).replace(' ', '')
+            sender = f"{local}@{host}.{rng.choice(['com', 'co.in', 'in', 'org'])}"
+            self.assert_same(subject, sender)
+
+    def test_unmatched_email_falls_back_to_sender(self):
+        self.assertEqual(self.rules.classify('lunch on friday', 'friend@gmail.com', 'gmail.com'),
+                         ('general', SENDER_NAME))
+
+class KeywordMatcherTest(unittest.TestCase):
+    """KeywordMatcher.find against {k for k in keywords if k in text}."""
+
+    def assert_same(self, keywords, text: str):
+        self.assertEqual(KeywordMatcher(keywords).find(text),
+                         frozenset(k for k in keywords if k and k in text),
+                         f"keywords={keywords!r} text={text!r}")
+
+    def test_nested_and_overlapping_keywords(self):
+        keywords = ['news', 'newsletter', 'letter', 'tech', 'technology', 'log', 'login', 'ogi', 'a', 'app']
+        for text in ['newsletter', 'technology news', 'login', 'a tech app', 'blogging', 'letters', '', 'x']:
+            self.assert_same(keywords, text)
+
+    def test_special_characters_are_literal(self):
+        self.assert_same(['2fa', 'c++', 'a.b', '(x)', 'yes|no'], 'use 2fa with c++ on a.b (x) yes|no')
+        self.assert_same(['a.b'], 'axb')
+
+    def test_empty_inputs(self):
+        self.assertEqual(KeywordMatcher([]).find('anything'), frozenset())
+        self.assertEqual(KeywordMatcher(['', 'a']).find('abc'), frozenset({'a'}))
+        self.assertEqual(KeywordMatcher(['a']).find(''), frozenset())
+
+    def test_random_texts(self):
+        rng = random.Random(42)
+        alphabet = 'abcn .'
+        for _ in range(3000):
+            keywords = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))]
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            self.assert_same(keywords, text)
+
+class CategorizeManyTest(unittest.TestCase):
+    """EmailService.categorize_many with a small stored-style rule set."""
+
+    RULES = [
+        {'main': 'billing', 'match': {'subject': ['invoice'], 'sender': ['billing@']},
+         'subs': [{'name': 'overdue', 'match': {'subject': ['overdue']}}], 'default': 'billing'},
+        {'main': 'support', 'match': {'subject': ['invoice', 'ticket']}, 'subs': [], 'default': 'general'},
+        {'main': 'vendor', 'match': {'domain': ['acme.com']}, 'subs': [], 'default': COMPANY_NAME},
+    ]
+
+    def setUp(self):
+        self.service = EmailService()
+        self.rules = CategoryRuleSet(self.RULES, version=5)
+
+    def make_email(self, subject: str, sender: str) -> Email:
+        return Email(id=subject, account_email='me@example.com', subject=subject, sender=sender,
+                     date=datetime(2024, 5, 6), body='invoice ticket billing@ acme.com')
+
+    def test_results_follow_rule_order_and_input_order(self):
+        emails = [
+            self.make_email('Invoice OVERDUE', 'shop@example.com'),
+            # Both billing and support match; the rule listed first wins
+            self.make_email('Ticket about your invoice', 'shop@example.com'),
+            self.make_email('Ticket 42', 'shop@example.com'),
+            self.make_email('Hello', 'Billing@Shop.com'),
+        ]
+        self.assertEqual(self.service.categorize_many(emails, self.rules), [
+            ('billing', 'overdue'),
+            ('billing', 'billing'),
+            ('support', 'general'),
+            ('billing', 'billing'),
+        ])
+        self.assertEqual({email.rules_version for email in emails}, {5})
+
+    def test_body_is_not_matched(self):
+        [category] = self.service.categorize_many([self.make_email('Lunch', 'friend@example.org')], self.rules)
+        self.assertEqual(category[0], 'general')
+
+    def test_sender_placeholders_are_resolved(self):
+        fallback = self.make_email('Lunch', 'Alice Smith <alice@friends.org>')
+        vendor = self.make_email('Your order', 'Orders <orders@acme.com>')
+        (main, sub), (vendor_main, vendor_sub) = self.service.categorize_many([fallback, vendor], self.rules)
+        self.assertEqual((main, sub), ('general', self.service._extract_sender_name(fallback.sender)))
+        self.assertEqual(vendor_main, 'vendor')
+        self.assertNotIn(vendor_sub, (SENDER_NAME, COMPANY_NAME))
+
+if __name__ == '__main__':
+    unittest.main()
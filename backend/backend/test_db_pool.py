@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for ConnectionPool checkouts, shared connection() blocks and leaked
+connections, with stand-in raw connections.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_db_pool
+"""
+
+import gc
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mysql.connector import errors
+
+from backend.models.db_pool import ConnectionPool
+
+class FakeRawConnection:
+    in_transaction = False
+
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+        def connect():
+            raw = FakeRawConnection()
+            self.opened.append(raw)
+            return raw
+
+        self.pool = ConnectionPool(connect, size=2, timeout=0.1, ping_interval=30, recycle=0)
+
+    def in_use(self):
+        return self.pool.get_status()['in_use']
+
+    def test_connection_block_shares_one_checkout(self):
+        with self.pool.connection() as conn:
+            self.assertEqual(self.in_use(), 1)
+            borrowed = self.pool.get()
+            borrowed.close()
+            self.assertIs(borrowed._conn, conn)
+            self.assertEqual(self.in_use(), 1)
+        self.assertEqual(self.in_use(), 0)
+        self.assertEqual(self.pool.stats['checkouts'], 1)
+
+    def test_lazy_block_checks_out_on_first_use(self):
+        with self.pool.connection(lazy=True):
+            self.assertEqual(self.in_use(), 0)
+            self.pool.get().close()
+            self.assertEqual(self.in_use(), 1)
+            with self.pool.connection() as nested:
+                self.assertIs(nested, self.pool._local.conn)
+            self.assertEqual(self.in_use(), 1)
+        self.assertEqual(self.in_use(), 0)
+
+    def test_release_shared_returns_connection_early(self):
+        with self.pool.connection(lazy=True):
+            self.pool.get().close()
+            self.pool.release_shared()
+            self.assertEqual(self.in_use(), 0)
+            self.pool.get().close()
+            self.assertEqual(self.in_use(), 1)
+        self.assertEqual(self.in_use(), 0)
+        self.assertEqual(self.pool.stats['checkouts'], 2)
+
+    def test_exhausted_pool_raises_pool_error(self):
+        first, second = self.pool.get(), self.pool.get()
+        with self.assertRaises(errors.PoolError):
+            self.pool.get()
+        first.close()
+        second.close()
+
+    def test_leaked_connection_is_closed_not_reused(self):
+        conn = self.pool.get()
+        raw = conn._raw
+        del conn
+        gc.collect()
+        self.assertTrue(raw.closed)
+        self.assertEqual(self.pool.stats['leaked'], 1)
+        self.assertEqual(self.pool.get_status()['open'], 0)
+
+        conn = self.pool.get()
+        self.assertIsNot(conn._raw, raw)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
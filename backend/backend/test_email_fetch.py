@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for how EmailService turns IMAP UID FETCH responses into emails.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_email_fetch
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.email_models import EmailAccount
+from backend.services import email_service
+from backend.services.email_service import EmailService
+from backend.services.raw_store import FilesystemRawStore, RawMessageStore
+
+def make_message(uid: int, size: int = 0) -> bytes:
+    body = 'x' * max(0, size)
+    return (f"From: sender{uid}@example.com\r\nTo: me@example.com\r\nSubject: Message {uid}\r\n"
+            f"Message-ID: <{uid}@example.com>\r\nDate: Mon, 6 May 2024 10:00:00 +0000\r\n\r\n{body}\r\n").encode('ascii')
+
+def parse_uid_set(uid_set: str):
+    uids = []
+    for part in uid_set.split(','):
+        start, _, end = part.partition(':')
+        uids.extend(range(int(start), int(end or start) + 1))
+    return uids
+
+class FakeImap:
+    """
+    Answers UID FETCH like imaplib: one (prefix, literal) tuple per message,
+    and a trailing bytes element when attributes follow the literal.
+
+    layouts maps a UID to where its FLAGS and INTERNALDATE go: 'before' the
+    literal, 'after' it, or 'split' (FLAGS before, INTERNALDATE after).
+    """
+
+    def __init__(self, messages, layouts=None, unsolicited=None):
+        self.messages = messages
+        self.layouts = layouts or {}
+        self.unsolicited = unsolicited or []
+        self.fetches = []
+
+    def uid(self, command, uid_set, spec):
+        assert command == 'fetch'
+        uids = [uid for uid in parse_uid_set(uid_set) if uid in self.messages]
+        if spec == '(UID RFC822.SIZE)':
+            return 'OK', [f"{i + 1} (UID {uid} RFC822.SIZE {len(self.messages[uid])})".encode('ascii')
+                          for i, uid in enumerate(uids)]
+        self.fetches.append(parse_uid_set(uid_set))
+        data = []
+        for i, uid in enumerate(uids):
+            raw = self.messages[uid]
+            flags = b'FLAGS (\\Seen)' if uid % 2 else b'FLAGS ()'
+            date = b'INTERNALDATE "06-May-2024 10:00:00 +0000"'
+            size = f"RFC822.SIZE {len(raw)}".encode('ascii')
+            layout = self.layouts.get(uid, 'before')
+            head = [f"{i + 1} (UID {uid}".encode('ascii')]
+            tail = []
+            if layout == 'before':
+                head += [flags, date, size]
+            elif layout == 'after':
+                head += [size]
+                tail += [flags, date]
+            else:
+                head += [flags, size]
+                tail += [date]
+            prefix = b' '.join(head) + f" BODY[] {{{len(raw)}}}".encode('ascii')
+            data.append((prefix, raw))
+            data.append((b' ' + b' '.join(tail) + b')') if tail else b')')
+            data.extend(self.unsolicited)
+        return 'OK', data
+
+class EmailIdTest(unittest.TestCase):
+    def test_same_uid_in_other_account_or_validity_gets_other_id(self):
+        ids = {
+            EmailService.make_email_id('a@example.com', 100, 1),
+            EmailService.make_email_id('b@example.com', 100, 1),
+            EmailService.make_email_id('a@example.com', 101, 1),
+            EmailService.make_email_id('a@example.com', 100, 2),
+        }
+        self.assertEqual(len(ids), 4)
+
+    def test_id_is_stable(self):
+        self.assertEqual(EmailService.make_email_id('a@example.com', 100, 7),
+                         EmailService.make_email_id('a@example.com', 100, 7))
+
+class FetchPipelineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(email_service, 'raw_store', RawMessageStore(FilesystemRawStore(tmp.name, 'gzip')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = EmailService()
+        self.account = EmailAccount(email='me@example.com', password='x', imap_server='imap.example.com')
+
+    def fetch_all(self, mail, uids, **kwargs):
+        return [(chunk, emails) for chunk, emails in
+                self.service._fetch_uid_batches(mail, uids, self.account, uid_validity=7, **kwargs)]
+
+    def test_uid_set(self):
+        self.assertEqual(self.service._uid_set([3, 4, 5, 6, 7, 9, 12, 13, 14]), '3:7,9,12:14')
+        self.assertEqual(self.service._uid_set([1]), '1')
+        self.assertEqual(self.service._uid_set([]), '')
+
+    def test_plan_chunks_by_count_and_bytes(self):
+        uids = list(range(1, 8))
+        sizes = {uid: 10 for uid in uids}
+        self.assertEqual(self.service._plan_chunks(uids, sizes, 3, 1000), [[1, 2, 3], [4, 5, 6], [7]])
+        self.assertEqual(self.service._plan_chunks(uids, sizes, 50, 25), [[1, 2], [3, 4], [5, 6], [7]])
+        sizes[4] = 500
+        self.assertEqual(self.service._plan_chunks(uids, sizes, 50, 100),
+                         [[1, 2, 3], [4], [5, 6, 7]])
+
+    def test_attribute_order_does_not_matter(self):
+        messages = {uid: make_message(uid) for uid in (10, 11, 12, 13)}
+        mail = FakeImap(messages, layouts={11: 'after', 12: 'split'},
+                        unsolicited=[b'99 (FLAGS (\\Deleted))'])
+        [(chunk, emails)] = self.fetch_all(mail, [10, 11, 12, 13])
+        self.assertEqual(chunk, [10, 11, 12, 13])
+        self.assertEqual([e.imap_uid for e in emails], [10, 11, 12, 13])
+        for email_obj in emails:
+            self.assertEqual(email_obj.subject, f"Message {email_obj.imap_uid}")
+            self.assertEqual(email_obj.is_read, email_obj.imap_uid % 2 == 1)
+            self.assertEqual(email_obj.metadata['size'], len(messages[email_obj.imap_uid]))
+            self.assertEqual(email_obj.id, EmailService.make_email_id('me@example.com', 7, email_obj.imap_uid))
+            self.assertEqual(email_service.raw_store.get(email_obj.raw_ref), messages[email_obj.imap_uid])
+
+    def test_oversized_message_is_fetched_alone(self):
+        messages = {1: make_message(1), 2: make_message(2, 5000), 3: make_message(3), 4: make_message(4)}
+        mail = FakeImap(messages)
+        batches = self.fetch_all(mail, [1, 2, 3, 4], chunk_bytes=2000)
+        self.assertEqual(mail.fetches, [[1], [2], [3, 4]])
+        self.assertEqual([[e.imap_uid for e in emails] for _, emails in batches], [[1], [2], [3, 4]])
+
+    def test_missing_uid_is_left_out(self):
+        # UID 11 was expunged between SEARCH and FETCH
+        mail = FakeImap({uid: make_message(uid) for uid in (10, 12)})
+        [(chunk, emails)] = self.fetch_all(mail, [10, 11, 12])
+        self.assertEqual(chunk, [10, 11, 12])
+        self.assertEqual([e.imap_uid for e in emails], [10, 12])
+
+    def test_parse_ignores_bodyless_fetch_responses(self):
+        data = [b'5 (UID 20 FLAGS (\\Seen))',
+                (b'6 (UID 21 RFC822.SIZE 3 BODY[] {3}', b'abc'), b' FLAGS (\\Flagged))']
+        [item] = self.service._parse_fetch_response(data)
+        self.assertEqual(item['uid'], 21)
+        self.assertEqual(item['flags'], [b'\\Flagged'])
+        self.assertEqual(item['size'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
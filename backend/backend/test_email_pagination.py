@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for the email list cursor and DatabaseManager.get_email_page keyset
+pagination, against an in-memory stand-in for the emails table.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_email_pagination
+"""
+
+import base64
+import logging
+import os
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.db_models import DatabaseManager, decode_email_cursor, encode_email_cursor
+
+class EmailCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        for date, email_id in [
+            (datetime(2024, 5, 17, 9, 30, 12, 123456), '4811'),
+            (datetime(1999, 12, 31), 'a/b+c=d?'),
+            (None, '17'),
+            (datetime(2024, 1, 1), 'ünïcødé'),
+        ]:
+            token = encode_email_cursor(date, email_id)
+            self.assertNotIn('=', token)
+            self.assertEqual(decode_email_cursor(token), (date, email_id))
+
+    def test_numeric_id_comes_back_as_string(self):
+        self.assertEqual(decode_email_cursor(encode_email_cursor(None, 42)), (None, '42'))
+
+    def test_malformed_cursors(self):
+        def b64(text):
+            return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii').rstrip('=')
+
+        for token in ['', 'not a cursor', '!!!!', b64('not json'), b64('{"a": 1}'), b64('[1, 2, 3]'),
+                      b64('["yesterday", "5"]'), b64('"just a string"'), b64('[]')]:
+            with self.assertRaises(ValueError, msg=token):
+                decode_email_cursor(token)
+
+class FakeEmailCursor:
+    """Runs get_email_page's COUNT, dated-page and NULL-tail queries over a list of rows."""
+
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+        self.result = []
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        params = params or {}
+        if 'COUNT(*)' in query:
+            self.result = [{'total': len(self.rows)}]
+            return
+        self.assertNoNullOr(query)
+        if 'date IS NULL' in query:
+            rows = [r for r in self.rows if r['date'] is None]
+            if 'id < %(cursor_id)s' in query:
+                rows = [r for r in rows if r['id'] < params['cursor_id']]
+            rows.sort(key=lambda r: r['id'], reverse=True)
+        else:
+            rows = [r for r in self.rows if r['date'] is not None]
+            if 'cursor_date' in query:
+                seek = (params['cursor_date'], params['cursor_id'])
+                rows = [r for r in rows if (r['date'], r['id']) < seek]
+            rows.sort(key=lambda r: (r['date'], r['id']), reverse=True)
+        self.result = rows[:params['limit']]
+
+    @staticmethod
+    def assertNoNullOr(query):
+        if 'OR date IS NULL' in query:
+            raise AssertionError(f"Seek predicate ORs a NULL test: {query}")
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return list(self.result)
+
+class FakeConnection:
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+
+    def cursor(self, *args, **kwargs):
+        return FakeEmailCursor(self.rows, self.queries)
+
+    def close(self):
+        pass
+
+class EmailPageTest(unittest.TestCase):
+    def setUp(self):
+        start = datetime(2024, 3, 1, 12, 0)
+        self.rows = []
+        for i in range(23):
+            # Several emails share a date, and a few have none
+            date = None if i % 7 == 3 else start + timedelta(minutes=i // 3)
+            self.rows.append({'id': f'{i:03d}', 'date': date, 'subject': f'Email {i}'})
+        self.queries = []
+        self.db = DatabaseManager.__new__(DatabaseManager)
+        self.db.logger = logging.getLogger(__name__)
+        self.db._count_cache = {}
+        self.db._count_cache_lock = threading.Lock()
+        self.db.get_connection = lambda: FakeConnection(self.rows, self.queries)
+
+    def expected_order(self):
+        dated = sorted((r for r in self.rows if r['date'] is not None),
+                       key=lambda r: (r['date'], r['id']), reverse=True)
+        undated = sorted((r for r in self.rows if r['date'] is None), key=lambda r: r['id'], reverse=True)
+        return [r['id'] for r in dated + undated]
+
+    def walk(self, per_page):
+        seen = []
+        cursor = None
+        while True:
+            emails, total, cursor = self.db.get_email_page(per_page=per_page, cursor=cursor)
+            self.assertEqual(total, len(self.rows))
+            seen.extend(email.id for email in emails)
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_email_once_in_order(self):
+        for per_page in (1, 4, 5, 22, 23, 50):
+            self.assertEqual(self.walk(per_page), self.expected_order(), f"per_page={per_page}")
+
+    def test_tail_cursor_only_queries_undated_rows(self):
+        undated = [r for r in self.rows if r['date'] is None]
+        cursor = encode_email_cursor(None, max(r['id'] for r in undated))
+        self.queries.clear()
+        emails, _, next_cursor = self.db.get_email_page(per_page=50, cursor=cursor)
+        page_queries = [q for q in self.queries if 'COUNT(*)' not in q]
+        self.assertEqual(len(page_queries), 1)
+        self.assertIn('date IS NULL', page_queries[0])
+        self.assertEqual(len(emails), len(undated) - 1)
+        self.assertIsNone(next_cursor)
+
+    def test_full_dated_page_skips_tail_query(self):
+        self.db.get_email_page(per_page=3)
+        page_queries = [q for q in self.queries if 'COUNT(*)' not in q]
+        self.assertEqual(len(page_queries), 1)
+        self.assertIn('date IS NOT NULL', page_queries[0])
+
+if __name__ == '__main__':
+    unittest.main()
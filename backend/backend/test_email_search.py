@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the search box parser and its FULLTEXT/LIKE SQL.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_email_search
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.models.email_search import build_search_sql, parse_search
+
+# One boolean mode token: an optional operator, then a word, a word prefix or a quoted phrase
+BOOLEAN_TOKEN_RE = re.compile(r'^[+-]?(\w+\*?|"\w+( \w+)*")$')
+
+def match_params(clauses, params):
+    """Boolean mode strings of the MATCH clauses."""
+    return [params[name] for clause in clauses if 'MATCH(' in clause
+            for name in re.findall(r'%\((\w+)\)s', clause)]
+
+def like_params(clauses, params):
+    return [params[name] for clause in clauses if 'LIKE' in clause
+            for name in set(re.findall(r'%\((\w+)\)s', clause))]
+
+class SearchSqlTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'SEARCH_MIN_TOKEN_SIZE', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_clean_boolean(self, query):
+        clauses, params, _ = build_search_sql(query)
+        for value in match_params(clauses, params):
+            for token in re.findall(r'[+-]?"[^"]*"|\S+', value):
+                self.assertRegex(token, BOOLEAN_TOKEN_RE, f"query={query!r} param={value!r}")
+
+    def test_plain_words_are_required(self):
+        clauses, params, score_sql = build_search_sql('invoice march')
+        self.assertEqual(match_params(clauses, params), ['+invoice +march'])
+        self.assertIn('MATCH(subject, sender, body)', score_sql)
+
+    def test_operators_in_input_are_not_passed_through(self):
+        for query in ['+invoice', '~invoice', '>invoice <report', '(invoice report)', 'invoice)',
+                      '"invoice', 'inv"oice', '++--**', '@@@', 'report*', '*report', 'a*b*c*']:
+            self.assert_clean_boolean(query)
+        clauses, params, _ = build_search_sql('~invoice (report) >total<')
+        self.assertEqual(match_params(clauses, params), ['+invoice +report +total'])
+
+    def test_email_address_becomes_phrase(self):
+        clauses, params, _ = build_search_sql('from:alice@example.com')
+        self.assertEqual(match_params(clauses, params), ['+"alice example com"'])
+        self.assertIn('MATCH(sender)', clauses[0])
+
+    def test_prefix_and_negation(self):
+        clauses, params, _ = build_search_sql('repo* -newsletter')
+        self.assertEqual(match_params(clauses, params), ['+repo* -newsletter'])
+
+    def test_only_negated_terms(self):
+        clauses, params, score_sql = build_search_sql('-newsletter -"daily digest"')
+        self.assertEqual(len(clauses), 1)
+        self.assertTrue(clauses[0].startswith('NOT MATCH('))
+        self.assertEqual(match_params(clauses, params), ['newsletter "daily digest"'])
+        self.assertEqual(score_sql, '0')
+
+    def test_fields_group_into_separate_matches(self):
+        clauses, params, _ = build_search_sql('subject:invoice from:billing overdue')
+        self.assertEqual(sorted(match_params(clauses, params)), ['+billing', '+invoice', '+overdue'])
+        self.assertEqual(len([c for c in clauses if 'MATCH(' in c]), 3)
+
+    def test_unknown_field_is_text(self):
+        terms = parse_search('re:meeting')
+        self.assertEqual(len(terms), 1)
+        self.assertEqual(terms[0].words, ['re', 'meeting'])
+        self.assertTrue(terms[0].phrase)
+
+    def test_short_tokens_only_use_like(self):
+        clauses, params, score_sql = build_search_sql('to do it')
+        self.assertEqual(len(clauses), 3)
+        self.assertTrue(all('LIKE' in clause and 'MATCH' not in clause for clause in clauses))
+        self.assertTrue(all('body' not in clause for clause in clauses))
+        self.assertEqual(sorted(like_params(clauses, params)), ['%do%', '%it%', '%to%'])
+        self.assertEqual(score_sql, '0')
+
+    def test_short_token_mixed_with_long_ones(self):
+        clauses, params, _ = build_search_sql('invoice q3 -ad')
+        self.assertEqual(match_params(clauses, params), ['+invoice'])
+        like = [clause for clause in clauses if 'LIKE' in clause]
+        self.assertEqual(len(like), 2)
+        self.assertTrue(any(clause.startswith('NOT (') for clause in like))
+
+    def test_like_wildcards_are_escaped(self):
+        clauses, params, _ = build_search_sql('50%_off a\\b')
+        self.assertEqual(sorted(like_params(clauses, params)), ['%50\\%\\_off%', '%a\\\\b%'])
+
+    def test_symbols_without_words_are_ignored(self):
+        for query in ['', '   ', '-', '*', '""', '+-~<>()', '@']:
+            self.assertEqual(build_search_sql(query)[0], [], query)
+
+    def test_random_input_yields_clean_boolean_strings(self):
+        rng = random.Random(5)
+        alphabet = 'abcdefg +-><()~*"@:._%\\'
+        for _ in range(2000):
+            self.assert_clean_boolean(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 25))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for when BackgroundTaskManager starts, restarts and stops IMAP IDLE
+watchers as the configured accounts change, and for how a watcher handles
+rejected logins and the per-host connection budget.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_idle_watchers
+"""
+
+import dataclasses
+import imaplib
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.models.email_models import EmailAccount
+from backend.services import imap_session
+from backend.services.account_health import AccountHealthCache
+from backend.services.imap_session import ImapIdleWatcher
+from backend.utils import background_tasks
+from backend.utils.account_pool import HostConnectionBudget
+from backend.utils.background_tasks import BackgroundTaskManager
+
+class FakeWatcher:
+    def __init__(self, account, on_change, health=None):
+        self.account = account
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+class IdleWatcherUpdateTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.object(Config, 'IMAP_IDLE_ENABLED', True),
+                        mock.patch.object(background_tasks, 'ImapIdleWatcher', FakeWatcher)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.account = EmailAccount(email='a@example.com', password='secret', imap_server='imap.example.com')
+        self.start_watching()
+
+    def start_watching(self):
+        self.manager = BackgroundTaskManager()
+        self.manager._update_idle_watchers([self.account])
+        self.watcher = self.manager._idle_watchers['a@example.com']
+
+    def test_unchanged_account_keeps_watcher(self):
+        # A fresh row from the database with other sync state is the same login
+        reloaded = dataclasses.replace(self.account, last_fetched_uid=42, highest_modseq=7)
+        self.manager._update_idle_watchers([reloaded])
+        self.assertIs(self.manager._idle_watchers['a@example.com'], self.watcher)
+        self.assertTrue(self.watcher.running)
+
+    def test_connection_change_restarts_watcher(self):
+        for change in ({'imap_server': 'imap2.example.com'}, {'imap_port': 143}, {'password': 'new'}):
+            with self.subTest(change=change):
+                self.start_watching()
+                changed = dataclasses.replace(self.account, **change)
+                self.manager._update_idle_watchers([changed])
+                watcher = self.manager._idle_watchers['a@example.com']
+                self.assertIsNot(watcher, self.watcher)
+                self.assertFalse(self.watcher.running)
+                self.assertTrue(watcher.running)
+                self.assertEqual(watcher.account, changed)
+
+    def test_removed_account_stops_watcher(self):
+        self.manager._update_idle_watchers([])
+        self.assertEqual(self.manager._idle_watchers, {})
+        self.assertFalse(self.watcher.running)
+
+class FakeImapServer:
+    """Stands in for imaplib.IMAP4_SSL; logins fail unless the password is 'right'."""
+
+    def __init__(self):
+        self.logins = 0
+        self.connects = threading.Event()
+
+    def __call__(self, host, port, timeout=None):
+        self.connects.set()
+        return FakeImapConnection(self)
+
+class FakeImapConnection:
+    def __init__(self, server):
+        self.server = server
+        self.capabilities = ('IMAP4REV1',)
+
+    def login(self, user, password):
+        self.server.logins += 1
+        if password != 'right':
+            raise imaplib.IMAP4.error('[AUTHENTICATIONFAILED] Invalid credentials')
+
+    def capability(self):
+        return 'OK', [b'IMAP4rev1']
+
+    def logout(self):
+        pass
+
+class ImapIdleWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeImapServer()
+        patcher = mock.patch.object(imap_session.imaplib, 'IMAP4_SSL', self.server)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.health = AccountHealthCache(sessions=mock.Mock(capabilities=lambda email: ()), ttl=3600)
+        self.hosts = HostConnectionBudget(3)
+
+    def run_watcher(self, password: str) -> ImapIdleWatcher:
+        account = EmailAccount(email='a@example.com', password=password, imap_server='imap.example.com')
+        watcher = ImapIdleWatcher(account, lambda email, events: None, health=self.health, hosts=self.hosts)
+        self.addCleanup(watcher.stop)
+        watcher.start()
+        return watcher
+
+    def test_rejected_login_stops_watcher_and_is_recorded(self):
+        watcher = self.run_watcher('wrong')
+        watcher._thread.join(5)
+        self.assertFalse(watcher._thread.is_alive())
+        self.assertTrue(watcher.auth_failed)
+        self.assertFalse(watcher.idling)
+        self.assertEqual(self.server.logins, 1)
+        self.assertEqual(self.health.get(watcher.account)['status'], 'auth_failed')
+        self.assertEqual(self.hosts.in_use(), {})
+
+    def test_known_bad_credentials_are_not_tried(self):
+        account = EmailAccount(email='a@example.com', password='wrong', imap_server='imap.example.com')
+        self.health.record(account, imap_session.ImapAuthError('Invalid credentials'))
+        watcher = self.run_watcher('wrong')
+        watcher._thread.join(5)
+        self.assertTrue(watcher.auth_failed)
+        self.assertFalse(self.server.connects.is_set())
+
+    def test_changed_password_is_tried_despite_old_failure(self):
+        old = EmailAccount(email='a@example.com', password='wrong', imap_server='imap.example.com')
+        self.health.record(old, imap_session.ImapAuthError('Invalid credentials'))
+        watcher = self.run_watcher('right')
+        watcher._thread.join(5)
+        # Logged in; the fake server has no IDLE, so the watcher then gives up on it
+        self.assertEqual(self.server.logins, 1)
+        self.assertFalse(watcher.auth_failed)
+        self.assertIs(watcher.supported, False)
+
+    def test_watcher_leaves_a_slot_for_sync_work(self):
+        self.hosts.acquire('IMAP.example.com')
+        self.hosts.acquire('imap.example.com')
+        watcher = self.run_watcher('right')
+        self.assertFalse(self.server.connects.wait(0.3))
+        self.assertFalse(watcher.idling)
+        self.assertEqual(self.hosts.in_use(), {'imap.example.com': 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for apply_migrations' statement order, locking and failure handling,
+against a connection that records what it is asked to run.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_migrations
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.migrations import EMAIL_COUNTERS_REBUILD, LATEST_VERSION, MIGRATIONS, apply_migrations
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def execute(self, statement, params=None):
+        statement = ' '.join(statement.split())
+        self.conn.log.append(statement)
+        if self.conn.fail_on and self.conn.fail_on in statement:
+            raise RuntimeError('Lost connection to MySQL server during query')
+        if statement.startswith('SELECT version, applied_at FROM schema_migrations'):
+            self.result = [(version, None) for version in self.conn.applied]
+        elif statement.startswith('INSERT INTO schema_migrations'):
+            self.conn.applied.append(params[0])
+        elif statement.startswith(('SELECT GET_LOCK', 'SELECT RELEASE_LOCK')):
+            self.result = [(1,)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return list(self.result)
+
+class FakeConnection:
+    def __init__(self, applied=(), fail_on=None):
+        self.applied = list(applied)
+        self.fail_on = fail_on
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.log.append('COMMIT')
+
+    def rollback(self):
+        self.log.append('ROLLBACK')
+
+class ApplyMigrationsTest(unittest.TestCase):
+    def test_counter_triggers_and_backfill_run_under_table_locks(self):
+        conn = FakeConnection(applied=[m.version for m in MIGRATIONS if m.version != 7])
+        self.assertEqual(apply_migrations(conn), [7])
+
+        log = conn.log
+        lock = log.index('LOCK TABLES emails WRITE, email_counters WRITE')
+        unlock = log.index('UNLOCK TABLES')
+        inside = log[lock + 1:unlock]
+        self.assertEqual(len([s for s in inside if s.startswith('CREATE TRIGGER')]), 3)
+        self.assertIn('DELETE FROM email_counters', inside)
+        self.assertIn(' '.join(EMAIL_COUNTERS_REBUILD.split()), inside)
+        # UNLOCK TABLES commits the backfill; nothing commits it earlier
+        self.assertNotIn('COMMIT', inside)
+        # The table has to exist before it can be locked
+        self.assertTrue(log[lock - 1].startswith('CREATE TABLE IF NOT EXISTS email_counters'))
+
+    def test_failure_rolls_back_before_unlocking(self):
+        conn = FakeConnection(applied=[m.version for m in MIGRATIONS if m.version < 7], fail_on='DELETE FROM email_counters')
+        with self.assertRaises(RuntimeError):
+            apply_migrations(conn)
+        tail = conn.log[conn.log.index('DELETE FROM email_counters') + 1:]
+        self.assertEqual(tail[:2], ['ROLLBACK', 'UNLOCK TABLES'])
+        self.assertTrue(tail[2].startswith('SELECT RELEASE_LOCK'))
+        self.assertNotIn(7, conn.applied)
+
+    def test_up_to_date_database_runs_nothing(self):
+        conn = FakeConnection(applied=[m.version for m in MIGRATIONS])
+        self.assertEqual(apply_migrations(conn), [])
+        self.assertFalse(any(s.startswith(('ALTER', 'CREATE TRIGGER', 'LOCK TABLES')) for s in conn.log))
+        self.assertEqual(max(conn.applied), LATEST_VERSION)
+
+if __name__ == '__main__':
+    unittest.main()
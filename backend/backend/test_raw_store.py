@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed raw message store on the filesystem.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_raw_store
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.raw_store import FilesystemRawStore, RawMessageStore
+
+RAW = b'From: a@example.com\r\nSubject: hi\r\n\r\nbody\r\n'
+
+class RawMessageStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.backend = FilesystemRawStore(self.tmp.name, compression='gzip')
+        self.store = RawMessageStore(self.backend)
+
+    def age(self, ref: str, seconds: float):
+        digest = ref.split(':', 1)[1]
+        path = self.backend._path(digest, 'gz')
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_put_is_content_addressed(self):
+        ref = self.store.put(RAW)
+        self.assertTrue(ref.startswith('sha256:'))
+        self.assertEqual(self.store.put(RAW), ref)
+        self.assertEqual(self.store.get(ref), RAW)
+
+    def test_delete_removes_blob(self):
+        ref = self.store.put(RAW)
+        self.assertTrue(self.store.delete(ref, min_age=0))
+        self.assertIsNone(self.store.get(ref))
+        # Deleting again is harmless
+        self.assertTrue(self.store.delete(ref, min_age=0))
+
+    def test_recently_stored_blob_survives_grace_period(self):
+        ref = self.store.put(RAW)
+        self.assertFalse(self.store.delete(ref, min_age=60))
+        self.assertEqual(self.store.get(ref), RAW)
+
+        self.age(ref, 120)
+        self.assertTrue(self.store.delete(ref, min_age=60))
+        self.assertIsNone(self.store.get(ref))
+
+    def test_storing_again_restarts_grace_period(self):
+        ref = self.store.put(RAW)
+        self.age(ref, 120)
+        self.store.put(RAW)
+        self.assertFalse(self.store.delete(ref, min_age=60))
+        self.assertEqual(self.store.get(ref), RAW)
+
+    def test_invalid_refs(self):
+        self.assertIsNone(self.store.get(None))
+        self.assertIsNone(self.store.get('md5:abc'))
+        self.assertFalse(self.store.delete('md5:abc'))
+
+if __name__ == '__main__':
+    unittest.main()
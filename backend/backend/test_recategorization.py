@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests that RecategorizationJob holds its MySQL named lock on a connection
+of its own, even when started from a thread that already holds a pooled
+connection (an API request).
+
+Run from the backend directory:
+
+    python -m unittest backend.test_recategorization
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.db_pool import ConnectionPool
+from backend.services import recategorization
+from backend.services.category_rules import CategoryRuleSet
+
+class FakeCursor:
+    def __init__(self, raw):
+        self.raw = raw
+        self.result = None
+
+    def execute(self, sql, params=None):
+        if sql.startswith('SELECT GET_LOCK'):
+            self.raw.log.append(('get_lock', self.raw, threading.current_thread().name))
+            self.result = (1,)
+        elif sql.startswith('SELECT RELEASE_LOCK'):
+            self.raw.log.append(('release_lock', self.raw, threading.current_thread().name))
+            self.result = (1,)
+
+    def fetchone(self):
+        return self.result
+
+class FakeRawConnection:
+    """Stands in for a mysql.connector connection; records named lock calls."""
+
+    in_transaction = False
+
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+class FakeDatabase:
+    """The DatabaseManager methods RecategorizationJob uses, with no emails to process."""
+
+    def __init__(self):
+        self.log = []
+        self.pool = ConnectionPool(lambda: FakeRawConnection(self.log), size=4, timeout=5,
+                                   ping_interval=30, recycle=0)
+        self.checkpoint = None
+
+    def get_connection(self):
+        return self.pool.get()
+
+    def connection(self):
+        return self.pool.connection()
+
+    def count_emails_for_recategorization(self, rules_version):
+        return 0
+
+    def get_emails_for_recategorization(self, rules_version, after_id='', limit=500, email_ids=None):
+        return []
+
+    def get_job_checkpoint(self, name):
+        return dict(self.checkpoint) if self.checkpoint else None
+
+    def save_job_checkpoint(self, name, state):
+        self.checkpoint = dict(state)
+        return True
+
+class FakeRuleSets:
+    def current(self):
+        return CategoryRuleSet()
+
+class RecategorizationLockTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(recategorization, 'category_rules', FakeRuleSets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = FakeDatabase()
+        self.job = recategorization.RecategorizationJob(self.db)
+
+    def test_lock_taken_on_job_thread_connection_inside_request(self):
+        with self.db.connection() as request_conn:
+            self.job.start()
+        self.job._thread.join(5)
+        self.assertFalse(self.job.is_running())
+
+        self.assertEqual([entry[0] for entry in self.db.log], ['get_lock', 'release_lock'])
+        (_, lock_raw, lock_thread), (_, release_raw, release_thread) = self.db.log
+        self.assertIsNot(lock_raw, request_conn._raw)
+        self.assertIs(release_raw, lock_raw)
+        self.assertEqual(lock_thread, 'recategorization')
+        self.assertEqual(release_thread, 'recategorization')
+        self.assertEqual(self.db.checkpoint['status'], 'completed')
+        self.assertEqual(self.db.pool.get_status()['in_use'], 0)
+
+    def test_lock_held_elsewhere_does_not_start(self):
+        def refuse(sql, params=None):
+            self.db.log.append(('refused', None, threading.current_thread().name))
+            cursor.result = (0,)
+        cursor = FakeCursor(None)
+        cursor.execute = refuse
+        with mock.patch.object(FakeRawConnection, 'cursor', lambda raw, *a, **k: cursor):
+            status = self.job.start()
+
+        self.assertFalse(self.job.is_running())
+        self.assertEqual(status['status'], 'idle')
+        self.assertIsNone(self.db.checkpoint)
+        self.assertEqual(self.db.pool.get_status()['in_use'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tests for SyncScheduler's adaptive intervals, jitter and IDLE handling,
+with a seeded random generator and a hand-driven clock.
+
+Run from the backend directory:
+
+    python -m unittest backend.test_sync_scheduler
+"""
+
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.utils.sync_scheduler import FETCH, READ_SYNC, SyncScheduler
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class SyncSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'IMAP_IDLE_SAFETY_INTERVAL', 600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+
+    def make(self, jitter: float = 0.0, seed: int = 1) -> SyncScheduler:
+        return SyncScheduler(min_interval=60, max_interval=1800, read_sync_interval=300, target_emails=1,
+                             jitter=jitter, rng=random.Random(seed), clock=self.clock)
+
+    def next_run(self, scheduler: SyncScheduler, account: str, task: str) -> float:
+        return scheduler._next[(account, task)]
+
+    def run_task(self, scheduler: SyncScheduler, account: str, task: str, after: float, fetched=None) -> float:
+        """
+        Advance the clock by at least after and until the task is due, run it
+        and return the interval until its next run. Other tasks that came due
+        at the same time finish as failed, which keeps their intervals.
+        """
+        self.clock.now = max(self.clock.now + after, self.next_run(scheduler, account, task))
+        due = scheduler.pop_due()
+        self.assertIn(account, due[task])
+        for other_task, accounts in due.items():
+            for other in accounts:
+                if (other, other_task) != (account, task):
+                    scheduler.done(other, other_task)
+        scheduler.done(account, task, fetched=fetched)
+        return self.next_run(scheduler, account, task) - self.clock.now
+
+    def fetch(self, scheduler: SyncScheduler, account: str, fetched, after: float) -> float:
+        return self.run_task(scheduler, account, FETCH, after, fetched)
+
+    def test_new_accounts_start_within_min_interval(self):
+        scheduler = self.make()
+        accounts = [f'user{i}@example.com' for i in range(50)]
+        scheduler.set_accounts(accounts)
+        offsets = [self.next_run(scheduler, a, t) - self.clock.now for a in accounts for t in (FETCH, READ_SYNC)]
+        self.assertTrue(all(0 <= offset < 60 for offset in offsets))
+        self.assertGreater(len(set(offsets)), 1)
+
+    def test_busy_account_is_clamped_to_min_interval(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com'])
+        self.fetch(scheduler, 'a@example.com', 0, after=60)
+        for _ in range(5):
+            interval = self.fetch(scheduler, 'a@example.com', 500, after=60)
+        self.assertEqual(interval, 60)
+
+    def test_dormant_account_slows_down_to_max_interval(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com'])
+        intervals = [self.fetch(scheduler, 'a@example.com', 0, after=60)]
+        for _ in range(40):
+            intervals.append(self.fetch(scheduler, 'a@example.com', 0, after=intervals[-1]))
+        self.assertTrue(all(later >= earlier - 1e-6 for earlier, later in zip(intervals, intervals[1:])))
+        self.assertEqual(intervals[-1], 1800)
+        self.assertTrue(all(60 <= interval <= 1800 for interval in intervals))
+
+    def test_failed_fetch_keeps_interval(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com'])
+        self.fetch(scheduler, 'a@example.com', 0, after=60)
+        interval = self.fetch(scheduler, 'a@example.com', 0, after=120)
+        self.assertEqual(self.fetch(scheduler, 'a@example.com', None, after=interval), interval)
+
+    def test_jitter_stays_within_bounds(self):
+        scheduler = self.make(jitter=0.1, seed=7)
+        scheduler.set_accounts(['a@example.com'])
+        offsets = [self.run_task(scheduler, 'a@example.com', READ_SYNC, 0) for _ in range(200)]
+        self.assertTrue(all(270 <= offset <= 330 for offset in offsets))
+        self.assertLess(min(offsets), 285)
+        self.assertGreater(max(offsets), 315)
+
+    def test_same_seed_gives_same_schedule(self):
+        runs = []
+        for _ in range(2):
+            self.clock.now = 1000.0
+            scheduler = self.make(jitter=0.2, seed=3)
+            scheduler.set_accounts(['a@example.com', 'b@example.com'])
+            self.fetch(scheduler, 'a@example.com', 2, after=0)
+            runs.append(dict(scheduler._next))
+        self.assertEqual(runs[0], runs[1])
+
+    def test_pop_due_takes_tasks_off_until_done(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com', 'b@example.com'])
+        self.clock.now += 60
+        due = scheduler.pop_due()
+        self.assertEqual(sorted(due[FETCH]), ['a@example.com', 'b@example.com'])
+        self.assertEqual(sorted(due[READ_SYNC]), ['a@example.com', 'b@example.com'])
+        self.assertIsNone(scheduler.next_due())
+        self.assertEqual(scheduler.pop_due(self.clock.now + 10000), {FETCH: [], READ_SYNC: []})
+
+        scheduler.done('a@example.com', READ_SYNC)
+        self.assertEqual(scheduler.next_due(), self.clock.now + 300)
+
+    def test_run_now_brings_task_forward(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com'])
+        self.clock.now += 60
+        scheduler.pop_due()
+        scheduler.done('a@example.com', FETCH, fetched=0)
+        self.assertEqual(scheduler.pop_due()[FETCH], [])
+
+        self.clock.now += 5
+        scheduler.run_now('a@example.com', FETCH)
+        self.assertEqual(scheduler.next_due(), self.clock.now)
+        self.assertEqual(scheduler.pop_due()[FETCH], ['a@example.com'])
+
+        # Unknown accounts are not scheduled
+        scheduler.run_now('other@example.com', FETCH)
+        self.assertIsNone(scheduler.next_due())
+
+    def test_idling_account_waits_for_safety_interval(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com'])
+        scheduler.set_idling('a@example.com', True)
+        self.assertEqual(self.fetch(scheduler, 'a@example.com', 500, after=60), 600)
+        self.assertEqual(self.run_task(scheduler, 'a@example.com', READ_SYNC, 0), 600)
+        self.assertTrue(scheduler.get_status()['a@example.com']['idling'])
+
+        scheduler.set_idling('a@example.com', False)
+        self.fetch(scheduler, 'a@example.com', 500, after=0)
+        self.assertEqual(self.fetch(scheduler, 'a@example.com', 500, after=60), 60)
+
+    def test_removed_account_is_dropped(self):
+        scheduler = self.make()
+        scheduler.set_accounts(['a@example.com', 'b@example.com'])
+        scheduler.set_accounts(['b@example.com'])
+        self.clock.now += 60
+        self.assertEqual(scheduler.pop_due()[FETCH], ['b@example.com'])
+        scheduler.done('a@example.com', FETCH, fetched=1)
+        self.assertNotIn('a@example.com', scheduler.get_status())
+
+    def test_max_interval_is_never_below_min(self):
+        scheduler = SyncScheduler(min_interval=120, max_interval=30, rng=random.Random(0), clock=self.clock)
+        self.assertEqual(scheduler.max_interval, 120)
+
+if __name__ == '__main__':
+    unittest.main()
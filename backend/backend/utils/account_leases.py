@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set
+
+from ..config import Config
+from ..models.db_models import db_manager
+
+logger = logging.getLogger(__name__)
+
+class AccountLeaseManager:
+    """
+    Shards account sync across worker processes through leases in the database.
+
+    Each worker heartbeats into sync_workers and holds time-limited leases
+    in account_leases for the accounts it syncs. Every
+    SYNC_LEASE_HEARTBEAT_INTERVAL seconds a background thread renews the
+    worker's leases, releases any beyond its fair share (accounts divided by
+    live workers, rounded up) and takes over unleased or expired accounts up
+    to that share. Free accounts are tried in an order hashed per worker, so
+    workers rarely contend for the same one, and the database decides every
+    takeover so an account never has two owners. An account beyond the share
+    first leaves owned(), so no new sync of it starts, and its lease is
+    released at a later heartbeat once it is no longer busy (see start());
+    until then it stays renewed so no other worker syncs it alongside. A
+    worker that dies stops renewing; its leases expire after SYNC_LEASE_TTL
+    seconds and the others pick the accounts up. stop() releases everything
+    at once.
+
+    If renewals fail (e.g. the database is unreachable), owned() turns empty
+    before the leases can expire, so the worker stops syncing rather than
+    overlap a new owner.
+    """
+
+    def __init__(self, db=None, worker_id: str = None, ttl: int = None, heartbeat_interval: int = None):
+        self.db = db or db_manager
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl or Config.SYNC_LEASE_TTL
+        self.heartbeat_interval = min(heartbeat_interval or Config.SYNC_LEASE_HEARTBEAT_INTERVAL, self.ttl / 3)
+        self._owned: Set[str] = set()
+        # Beyond the share: leased but no longer synced, released once not busy
+        self._handing_off: Set[str] = set()
+        self._valid_until = 0.0
+        self._workers: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_change = None
+        self._busy = None
+
+    def _rank(self, account_email: str) -> str:
+        return hashlib.sha1(f"{self.worker_id}:{account_email}".encode('utf-8')).hexdigest()
+
+    def start(self, on_change: Optional[Callable[[], None]] = None,
+              busy: Optional[Callable[[], Set[str]]] = None):
+        """
+        Take this worker's first leases and keep them renewed in a background thread.
+
+        Args:
+            on_change: Called from the heartbeat thread when the set of owned
+                accounts changes
+            busy: Returns the accounts this worker is syncing right now; their
+                leases are not given up while rebalancing
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._on_change = on_change
+        self._busy = busy
+        self._stop.clear()
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name='account-leases', daemon=True)
+        self._thread.start()
+        logger.info(f"Sync worker {self.worker_id} started with {len(self._owned)} account leases")
+
+    def stop(self):
+        """Stop renewing and release every lease so other workers take over immediately."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._owned = set()
+            self._handing_off = set()
+            self._valid_until = 0.0
+        self.db.release_account_leases(self.worker_id)
+        logger.info(f"Sync worker {self.worker_id} released its account leases")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Account lease heartbeat failed for {self.worker_id}: {str(e)}")
+
+    def heartbeat(self) -> bool:
+        """
+        Renew leases and rebalance this worker's share of the accounts.
+
+        Returns:
+            True if the leases were renewed
+        """
+        started = time.monotonic()
+        workers = self.db.heartbeat_sync_worker(self.worker_id, self.ttl)
+        leases = self.db.get_account_leases() if workers is not None else None
+        accounts = [account.email for account in self.db.get_email_accounts()] if leases is not None else []
+        if leases is None:
+            self._set_owned(None, started)
+            return False
+
+        share = math.ceil(len(accounts) / max(1, len(workers)))
+        current = set(accounts)
+        mine = sorted((email for email, lease in leases.items()
+                       if lease['owner'] == self.worker_id and not lease['expired']), key=self._rank)
+        release = [email for email in mine if email not in current]
+        mine = [email for email in mine if email in current]
+        # Accounts dropped from owned() at an earlier heartbeat go once their
+        # sync finished; newly surplus ones are dropped now and wait a turn, so
+        # a sync dispatched just before is seen as busy
+        busy = self._busy() if self._busy else set()
+        with self._lock:
+            handing_off = self._handing_off
+        excess = mine[share:]
+        release += [email for email in excess if email in handing_off and email not in busy]
+        handing_off = {email for email in excess if email not in release}
+        mine = mine[:share]
+        if release:
+            self.db.release_account_leases(self.worker_id, release)
+            logger.info(f"Sync worker {self.worker_id} released {len(release)} account leases")
+
+        free = sorted((email for email in accounts if email not in leases or leases[email]['expired']), key=self._rank)
+        claim = free[:max(0, share - len(mine))]
+        held = self.db.acquire_account_leases(self.worker_id, claim, self.ttl)
+        with self._lock:
+            self._workers = workers
+            self._handing_off = handing_off
+        self._set_owned(held, started)
+        return held is not None
+
+    def _set_owned(self, held: Optional[List[str]], started: float):
+        with self._lock:
+            previous = self._owned_now()
+            if held is not None:
+                self._owned = set(held) - self._handing_off
+                # Leases were extended at about `started`; stop using them a heartbeat before they lapse
+                self._valid_until = started + self.ttl - self.heartbeat_interval
+            changed = self._owned_now() != previous
+        if changed:
+            logger.info(f"Sync worker {self.worker_id} now owns {len(self.owned())} accounts")
+            if self._on_change:
+                self._on_change()
+
+    def _owned_now(self) -> Set[str]:
+        if time.monotonic() >= self._valid_until:
+            return set()
+        return set(self._owned)
+
+    def owned(self) -> Set[str]:
+        """Accounts this worker currently holds a valid lease for."""
+        with self._lock:
+            return self._owned_now()
+
+    def get_status(self) -> Dict:
+        """Get this worker's id, live workers and owned accounts."""
+        with self._lock:
+            return {
+                'worker_id': self.worker_id,
+                'live_workers': list(self._workers),
+                'owned_accounts': sorted(self._owned_now()),
+                'handing_off': sorted(self._handing_off),
+                'lease_valid_for': max(0.0, round(self._valid_until - time.monotonic(), 1)),
+                'ttl': self.ttl,
+                'heartbeat_interval': self.heartbeat_interval
+            }
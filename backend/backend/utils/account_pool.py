@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Set
+
+from ..config import Config
+from ..models.email_models import EmailAccount
+
+logger = logging.getLogger(__name__)
+
+class HostConnectionBudget:
+    """
+    Caps the IMAP connections open to each host at once.
+
+    Sync work takes a slot for as long as it runs. Long-lived holders such
+    as IDLE watchers use try_acquire() with keep_free, so they never take
+    the slots sync work needs to make progress.
+    """
+
+    def __init__(self, limit: int = None):
+        self.limit = limit or Config.SYNC_MAX_CONNECTIONS_PER_HOST
+        self._in_use: Dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _key(host: str) -> str:
+        return (host or '').lower()
+
+    def acquire(self, host: str):
+        """Wait for a free slot on host."""
+        key = self._key(host)
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_use.get(key, 0) < self.limit)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def try_acquire(self, host: str, keep_free: int = 0) -> bool:
+        """Take a slot on host only if keep_free others would still be free afterwards."""
+        key = self._key(host)
+        with self._cond:
+            if self._in_use.get(key, 0) + 1 + keep_free > self.limit:
+                return False
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            return True
+
+    def release(self, host: str):
+        key = self._key(host)
+        with self._cond:
+            count = self._in_use.get(key, 0) - 1
+            if count > 0:
+                self._in_use[key] = count
+            else:
+                self._in_use.pop(key, None)
+            self._cond.notify_all()
+
+    def in_use(self) -> Dict[str, int]:
+        """Connections currently counted per host."""
+        with self._cond:
+            return dict(self._in_use)
+
+class AccountSyncPool:
+    """Runs per-account sync work concurrently with global and per-IMAP-host limits."""
+
+    def __init__(self, max_workers: int = None, max_per_host: int = None, account_timeout: float = None):
+        """
+        Initialize the pool.
+
+        Args:
+            max_workers: Global cap on accounts synced at once
+            max_per_host: Cap on concurrent connections to one IMAP server for
+                this pool alone; by default the pool shares host_connections
+                with every other pool and the IDLE watchers in the process
+            account_timeout: Seconds a single account may run before it is reported as timed out
+        """
+        self.max_workers = max_workers or Config.SYNC_MAX_WORKERS
+        self._hosts = host_connections if max_per_host is None else HostConnectionBudget(max_per_host)
+        self.max_per_host = self._hosts.limit
+        self.account_timeout = account_timeout or Config.SYNC_ACCOUNT_TIMEOUT
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='account-sync')
+        self._lock = threading.Lock()
+        # Keys of (task, account) still running, possibly from a timed-out earlier cycle
+        self._in_flight = set()
+        # submit()ted work the watchdog checks against account_timeout
+        self._watched: Dict[tuple, Dict] = {}
+        self._watchdog = None
+        self._closed = threading.Event()
+
+    def _run_one(self, key, account: EmailAccount, func: Callable, started: Dict):
+        try:
+            self._hosts.acquire(account.imap_server)
+            try:
+                started[key] = time.monotonic()
+                return func(account)
+            finally:
+                self._hosts.release(account.imap_server)
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def run(self, accounts: List[EmailAccount], func: Callable, task_name: str = 'sync',
+            on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+        """
+        Run func(account) for every account and wait for the results.
+
+        Accounts still running from a previous call are skipped instead of
+        being queued a second time. An account that exceeds account_timeout is
+        reported as 'timeout'; its thread is left to finish on its own (IMAP
+        sockets carry Config.IMAP_TIMEOUT so it cannot hang forever).
+
+        Args:
+            accounts: Accounts to process
+            func: Callable taking an EmailAccount
+            task_name: Label used in logs and to detect overlapping runs
+            on_result: Called with (account email, result) as each account
+                finishes, from the calling thread
+
+        Returns:
+            Dictionary keyed by account email with status, result/error and elapsed seconds
+        """
+        results = {}
+        futures = {}
+        started = {}
+
+        def finish(account_email: str, result: Dict):
+            results[account_email] = result
+            if on_result:
+                on_result(account_email, result)
+
+        for account in accounts:
+            key = (task_name, account.email)
+            with self._lock:
+                if key in self._in_flight:
+                    finish(account.email, {'status': 'busy', 'elapsed': 0.0})
+                    continue
+                self._in_flight.add(key)
+            future = self._executor.submit(self._run_one, key, account, func, started)
+            futures[future] = (key, account)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                key, account = futures[future]
+                elapsed = now - started.get(key, now)
+                try:
+                    result = {'status': 'ok', 'result': future.result(), 'elapsed': elapsed}
+                except Exception as e:
+                    logger.error(f"{task_name} failed for {account.email}: {str(e)}")
+                    result = {'status': 'error', 'error': str(e), 'elapsed': elapsed}
+                finish(account.email, result)
+            for future in list(pending):
+                key, account = futures[future]
+                start = started.get(key)
+                if start is not None and now - start > self.account_timeout:
+                    logger.warning(f"{task_name} for {account.email} exceeded {self.account_timeout}s, not waiting for it")
+                    finish(account.email, {'status': 'timeout', 'elapsed': now - start})
+                    pending.discard(future)
+
+        return results
+
+    def submit(self, account: EmailAccount, func: Callable, task_name: str = 'sync',
+               on_result: Optional[Callable[[str, Dict], None]] = None) -> bool:
+        """
+        Start func(account) without waiting for it.
+
+        A watchdog reports an account that runs longer than account_timeout
+        as 'timeout' through on_result, like run() does. Its thread is left to
+        finish; when it does, on_result gets the real result with 'late' set,
+        and until then the account counts as still running.
+
+        Args:
+            account: Account to process
+            func: Callable taking an EmailAccount
+            task_name: Label used in logs and to detect overlapping runs
+            on_result: Called with (account email, result) when it finishes,
+                times out or is cancelled by shutdown, from a pool thread;
+                result is as in run() ('cancelled' status for dropped work)
+
+        Returns:
+            False if the account is still running this task and nothing was started
+        """
+        key = (task_name, account.email)
+        started = {}
+        watch = {'account_email': account.email, 'started': started, 'on_result': on_result, 'timed_out': False}
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            self._watched[key] = watch
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watchdog_loop, name='account-sync-watchdog', daemon=True)
+                self._watchdog.start()
+
+        def finish(future):
+            elapsed = time.monotonic() - started.get(key, time.monotonic())
+            try:
+                result = {'status': 'ok', 'result': future.result(), 'elapsed': elapsed}
+            except CancelledError:
+                with self._lock:
+                    self._in_flight.discard(key)
+                result = {'status': 'cancelled', 'elapsed': 0.0}
+            except Exception as e:
+                logger.error(f"{task_name} failed for {account.email}: {str(e)}")
+                result = {'status': 'error', 'error': str(e), 'elapsed': elapsed}
+            with self._lock:
+                self._watched.pop(key, None)
+                if watch['timed_out']:
+                    result['late'] = True
+            if on_result:
+                on_result(account.email, result)
+
+        try:
+            future = self._executor.submit(self._run_one, key, account, func, started)
+        except RuntimeError:
+            # Shut down
+            with self._lock:
+                self._in_flight.discard(key)
+                self._watched.pop(key, None)
+            return False
+        future.add_done_callback(finish)
+        return True
+
+    def _watchdog_loop(self):
+        """Report submit()ted accounts that exceed account_timeout."""
+        while not self._closed.wait(0.5):
+            now = time.monotonic()
+            timed_out = []
+            with self._lock:
+                for key, watch in self._watched.items():
+                    start = watch['started'].get(key)
+                    if not watch['timed_out'] and start is not None and now - start > self.account_timeout:
+                        watch['timed_out'] = True
+                        timed_out.append((key, watch, now - start))
+            for (task_name, account_email), watch, elapsed in timed_out:
+                logger.warning(f"{task_name} for {account_email} exceeded {self.account_timeout}s, not waiting for it")
+                if watch['on_result']:
+                    try:
+                        watch['on_result'](account_email, {'status': 'timeout', 'elapsed': elapsed})
+                    except Exception as e:
+                        logger.error(f"Timeout callback failed for {account_email}: {str(e)}")
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting work, drop queued accounts and wait for running ones.
+
+        Returns:
+            True if nothing was left running within timeout seconds
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._closed.set()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._in_flight:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def shutdown(self, wait_for_running: bool = True):
+        """Stop accepting work and optionally wait for running accounts to finish."""
+        self._closed.set()
+        self._executor.shutdown(wait=wait_for_running, cancel_futures=True)
+
+    def in_flight_accounts(self) -> Set[str]:
+        """Emails of the accounts with any task still running, timed-out ones included."""
+        with self._lock:
+            return {account_email for _, account_email in self._in_flight}
+
+    def get_status(self) -> Dict:
+        """Get pool limits and the accounts currently in flight."""
+        with self._lock:
+            in_flight = sorted(f"{task}:{email}" for task, email in self._in_flight)
+        return {
+            'max_workers': self.max_workers,
+            'max_per_host': self.max_per_host,
+            'connections_per_host': self._hosts.in_use(),
+            'account_timeout': self.account_timeout,
+            'in_flight': in_flight
+        }
+
+# Per-host connection budget shared by the process's sync pools and IDLE watchers
+host_connections = HostConnectionBudget()
@@ -1,18 +1,26 @@
+import functools
 import logging
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, List, Dict
 
 from ..config import Config
 from ..models.db_models import db_manager
+from ..models.email_models import EmailAccount, account_fingerprint
+from ..services.account_health import account_health
 from ..services.email_service import EmailService
+from ..services.imap_session import ImapIdleWatcher, imap_sessions
+from ..services.recategorization import recategorization_job
+from .account_leases import AccountLeaseManager
+from .account_pool import AccountSyncPool
+from .sync_scheduler import FETCH, READ_SYNC, SyncScheduler
 
 logger = logging.getLogger(__name__)
 
 class BackgroundTaskManager:
     """Manages background tasks for the application."""
-    
+
     def __init__(self):
         """Initialize the background task manager."""
         self.logger = logging.getLogger(__name__)
@@ -20,88 +28,264 @@ class BackgroundTaskManager:
         self._thread = None
         self._email_service = None
         self._interval = Config.BACKGROUND_TASK_INTERVAL
-        
+        self._pool = None
+        self._last_results = {}
+        self._scheduler = SyncScheduler()
+        self._accounts: Dict[str, EmailAccount] = {}
+        # (account, task) that came due again while still running; rerun as soon as it finishes
+        self._rerun = set()
+        self._rerun_lock = threading.Lock()
+        # With leases, only accounts this process holds a lease for are synced
+        self._leases = AccountLeaseManager() if Config.SYNC_LEASES_ENABLED else None
+        self._leases_changed = threading.Event()
+        # IDLE push state: watchers per account and changes waiting to be synced
+        self._idle_watchers: Dict[str, ImapIdleWatcher] = {}
+        self._pushed: Dict[str, set] = {}
+        self._push_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_reconcile = time.monotonic()
+        self._reconcile_thread = None
+
     def start(self):
         """Start the background task manager."""
         if self._running:
             return
-            
+
         self._running = True
+        if not self._pool:
+            self._pool = AccountSyncPool()
+        if self._leases:
+            self._leases.start(on_change=self._on_leases_changed, busy=self._busy_accounts)
         self._thread = threading.Thread(target=self._run_tasks)
         self._thread.daemon = True
         self._thread.start()
-        
+        # Continue a re-categorization run cut short by the last shutdown
+        recategorization_job.resume()
+
         self.logger.info("Background task manager started")
-    
-    def stop(self):
-        """Stop the background task manager."""
+
+    def stop(self, timeout: float = None) -> bool:
+        """
+        Stop the background task manager, draining accounts that are being synced.
+
+        Accounts queued but not started are dropped; those already running
+        get up to timeout seconds to finish. If they do not, the leases and
+        IMAP sessions are left as they are (the leases expire on their own),
+        so no other worker takes over an account that is still being synced.
+
+        Args:
+            timeout: Seconds to wait for running accounts, default SYNC_SHUTDOWN_TIMEOUT
+
+        Returns:
+            True if everything finished within the timeout
+        """
+        timeout = Config.SYNC_SHUTDOWN_TIMEOUT if timeout is None else timeout
         self._running = False
+        self._wake.set()
+        for watcher in self._idle_watchers.values():
+            watcher.stop()
+        self._idle_watchers = {}
+        started = time.monotonic()
         if self._thread:
             self._thread.join()
             self._thread = None
-    
+        # The next start() resumes an interrupted (not a paused) run
+        recategorization_job.stop(timeout, interrupt=True)
+        if self._pool:
+            remaining = max(0.0, timeout - (time.monotonic() - started))
+            if not self._pool.drain(remaining):
+                in_flight = self._pool.get_status()['in_flight']
+                self.logger.warning(f"Background tasks did not drain within {timeout}s, still running: {in_flight}")
+                return False
+            self._pool = None
+        # Release only once nothing of ours is running, so the next owner never overlaps
+        if self._leases:
+            self._leases.stop()
+        imap_sessions.close_all()
+        self.logger.info("Background task manager stopped")
+        return True
+
     def _run_tasks(self):
-        """Run background tasks in a loop."""
-        self.logger.info(f"Background tasks started with {self._interval}s interval")
-        
+        """
+        Run background tasks in a loop.
+
+        Fetch and read status sync run per account when the SyncScheduler
+        says they are due, so each account keeps its own adaptive cadence.
+        Due accounts are handed to the pool without waiting for them (a slow
+        account does not hold up the others) and the loop sleeps until the
+        earliest next run. The account list and IDLE watchers are refreshed
+        every interval; an IDLE push brings the account's fetch (EXISTS) or
+        read sync (EXPUNGE, FETCH) forward.
+        """
+        self.logger.info(f"Background tasks started, refreshing accounts every {self._interval}s")
+        next_refresh = 0.0
+
         while self._running:
             try:
-                self._fetch_emails()
-                self._sync_read_status()
-                time.sleep(self._interval)
+                if not self._email_service:
+                    self._email_service = EmailService()
+
+                now = time.monotonic()
+                if now >= next_refresh or self._leases_changed.is_set():
+                    self._leases_changed.clear()
+                    next_refresh = now + self._interval
+                    self._refresh_accounts(now)
+                    self._reconcile_counters(now)
+
+                for account_email, events in self._take_pushed().items():
+                    if 'EXISTS' in events:
+                        self._scheduler.run_now(account_email, FETCH)
+                    if events & {'EXPUNGE', 'FETCH'}:
+                        self._scheduler.run_now(account_email, READ_SYNC)
+
+                due = self._scheduler.pop_due()
+                for task, account_emails in due.items():
+                    if account_emails:
+                        self._dispatch(task, account_emails)
             except Exception as e:
                 self.logger.error(f"Error in background tasks: {str(e)}")
-                time.sleep(self._interval)
-    
-    def _sync_read_status(self):
-        """Sync read status from email server to local database."""
-        try:
-            self.logger.info("Starting read status sync")
-            
-            if not self._email_service:
-                self._email_service = EmailService()
-            
-            accounts = db_manager.get_email_accounts()
-            if not accounts:
-                self.logger.warning("No email accounts configured for read status sync")
-                return
-            
-            for account in accounts:
-                try:
-                    self._email_service.sync_read_status_from_server(account)
-                except Exception as e:
-                    self.logger.error(f"Error syncing read status for {account.email}: {str(e)}")
-            
-        except Exception as e:
-            self.logger.error(f"Background read status sync failed: {str(e)}")
-    
-    def _fetch_emails(self):
-        """Fetch emails from all configured accounts."""
-        try:
-            self.logger.info("Starting automatic email fetch")
-            
-            if not self._email_service:
-                self._email_service = EmailService()
-            
-            accounts = db_manager.get_email_accounts()
-            if not accounts:
-                self.logger.warning("No email accounts configured")
-                return
-            
-            for account in accounts:
-                try:
-                    self._email_service.fetch_emails_from_account(account)
-                except Exception as e:
-                    self.logger.error(f"Error fetching emails for {account.email}: {str(e)}")
-            
-        except Exception as e:
-            self.logger.error(f"Background email fetch failed: {str(e)}")
-    
+
+            next_run = self._scheduler.next_due()
+            wake_at = next_refresh if next_run is None else min(next_run, next_refresh)
+            self._wake.wait(max(0.0, wake_at - time.monotonic()))
+            self._wake.clear()
+
+    def _busy_accounts(self) -> set:
+        """Lease heartbeat callback: accounts with a sync still running in this process."""
+        pool = self._pool
+        return pool.in_flight_accounts() if pool else set()
+
+    def _on_leases_changed(self):
+        """Lease heartbeat callback: refresh the account list now."""
+        self._leases_changed.set()
+        self._wake.set()
+
+    def _refresh_accounts(self, now: float):
+        """Reload the accounts this process syncs into the scheduler and IDLE watchers."""
+        accounts = db_manager.get_email_accounts()
+        if self._leases:
+            owned = self._leases.owned()
+            accounts = [account for account in accounts if account.email in owned]
+        self._accounts = {account.email: account for account in accounts}
+        self._update_idle_watchers(accounts)
+        self._scheduler.set_accounts(self._accounts, now)
+        for account_email in self._accounts:
+            self._scheduler.set_idling(account_email, self._is_idling(account_email))
+
+    def _dispatch(self, task: str, account_emails: List[str]):
+        """Start a task on the pool for each due account; completions reschedule them."""
+        # A lease can lapse between refreshes; those accounts are dropped at the next one
+        owned = self._leases.owned() if self._leases else None
+        started = 0
+        for account_email in account_emails:
+            account = self._accounts.get(account_email)
+            if account is None or (owned is not None and account_email not in owned):
+                self._scheduler.done(account_email, task)
+                continue
+            if task == FETCH:
+                func = self._fetch_account
+            else:
+                func = self._email_service.sync_read_status_from_server
+            if self._pool.submit(account, func, task, on_result=functools.partial(self._task_done, task)):
+                started += 1
+            else:
+                # Still running (e.g. an IDLE push during a fetch); _task_done reruns it on completion
+                with self._rerun_lock:
+                    self._rerun.add((account_email, task))
+        self.logger.info(f"Started {task} for {started} of {len(account_emails)} due accounts")
+
+    def _fetch_account(self, account: EmailAccount) -> List:
+        return account_health.track(account, self._email_service.fetch_emails_from_account)
+
+    def _task_done(self, task: str, account_email: str, result: Dict):
+        """Pool callback: record the result and schedule the account's next run."""
+        if result['status'] == 'cancelled':
+            return
+        self._last_results.setdefault(task, {})[account_email] = {k: v for k, v in result.items() if k != 'result'}
+        # A late result was already rescheduled when it timed out
+        if not result.get('late'):
+            fetched = None
+            if task == FETCH and result['status'] == 'ok':
+                fetched = len(result['result'])
+                self._last_run = datetime.now().isoformat()
+                self.logger.debug(f"Fetched {fetched} emails for {account_email} in {result['elapsed']:.1f}s")
+            self._scheduler.done(account_email, task, fetched)
+        with self._rerun_lock:
+            rerun = (account_email, task) in self._rerun
+            self._rerun.discard((account_email, task))
+        if rerun:
+            self._scheduler.run_now(account_email, task)
+        self._wake.set()
+
+    def _reconcile_counters(self, now: float):
+        """
+        Reconcile the stats counters every COUNTER_RECONCILE_INTERVAL seconds.
+
+        The reconciliation scans the emails table, so it runs in its own
+        thread rather than holding up the scheduler; the database side makes
+        sure only one process does it per interval.
+        """
+        if not Config.COUNTER_RECONCILE_INTERVAL or now - self._last_reconcile < Config.COUNTER_RECONCILE_INTERVAL:
+            return
+        if self._reconcile_thread and self._reconcile_thread.is_alive():
+            return
+        self._last_reconcile = now
+
+        def reconcile():
+            # A run started by any process within this interval (less one refresh tick) counts
+            drifted = db_manager.reconcile_email_counters(Config.COUNTER_RECONCILE_INTERVAL - self._interval)
+            if drifted is not None:
+                self._last_results['reconcile_counters'] = {'drifted_groups': drifted, 'at': datetime.now().isoformat()}
+
+        self._reconcile_thread = threading.Thread(target=reconcile, name='counter-reconcile', daemon=True)
+        self._reconcile_thread.start()
+
+    def _on_idle_change(self, account_email: str, events: set):
+        """IDLE watcher callback: queue the account and wake the task loop."""
+        with self._push_lock:
+            self._pushed.setdefault(account_email, set()).update(events)
+        self._wake.set()
+
+    def _take_pushed(self) -> Dict[str, set]:
+        with self._push_lock:
+            pushed, self._pushed = self._pushed, {}
+        return pushed
+
+    def _is_idling(self, account_email: str) -> bool:
+        watcher = self._idle_watchers.get(account_email)
+        return bool(watcher and watcher.idling)
+
+    def _update_idle_watchers(self, accounts: List[EmailAccount]):
+        """Start IDLE watchers for new accounts and restart or stop those for changed or removed ones."""
+        if not Config.IMAP_IDLE_ENABLED:
+            return
+        current = {account.email: account for account in accounts}
+        for account_email in list(self._idle_watchers):
+            watcher = self._idle_watchers[account_email]
+            account = current.get(account_email)
+            # Any connection setting change needs a new login
+            if account is None or account_fingerprint(account) != account_fingerprint(watcher.account):
+                watcher.stop()
+                del self._idle_watchers[account_email]
+        for account_email, account in current.items():
+            watcher = self._idle_watchers.get(account_email)
+            if watcher is None:
+                watcher = ImapIdleWatcher(account, self._on_idle_change, health=account_health)
+                watcher.start()
+                self._idle_watchers[account_email] = watcher
+
     def get_status(self) -> dict:
         """Get the status of background tasks."""
         return {
             'running': self._running,
             'last_run': getattr(self, '_last_run', None),
             'interval': self._interval,
-            'thread_alive': self._thread and self._thread.is_alive()
+            'thread_alive': self._thread and self._thread.is_alive(),
+            'pool': self._pool.get_status() if self._pool else None,
+            'last_results': self._last_results,
+            'idle_accounts': sorted(email for email in self._idle_watchers if self._is_idling(email)),
+            'schedule': self._scheduler.get_status(),
+            'leases': self._leases.get_status() if self._leases else None,
+            'imap_sessions': imap_sessions.get_status(),
+            'account_health': account_health.get_status()
         }
@@ -0,0 +1,110 @@
+import json
+import logging
+import random
+import threading
+from typing import Dict, Iterable, Optional
+
+from ..config import Config
+
+logger = logging.getLogger('email_automation.persistence_trace')
+
+def _split(value: str) -> set:
+    return {item.strip() for item in (value or '').split(',') if item.strip()}
+
+class PersistenceTracer:
+    """
+    Opt-in trace of what the persistence layer writes.
+
+    Off by default. When enabled for some accounts and/or email ids, a
+    sampled fraction of matching writes logs one JSON line per row. The line
+    holds each field's type and size, never its contents, so traces stay
+    small and do not leak message bodies into logs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.accounts = _split(Config.PERSISTENCE_TRACE_ACCOUNTS)
+        self.email_ids = _split(Config.PERSISTENCE_TRACE_EMAIL_IDS)
+        self.trace_all = Config.PERSISTENCE_TRACE_ALL
+        self.sample_rate = Config.PERSISTENCE_TRACE_SAMPLE_RATE
+        self.traced = 0
+
+    @property
+    def active(self) -> bool:
+        return self.trace_all or bool(self.accounts) or bool(self.email_ids)
+
+    def configure(self, accounts: Optional[Iterable[str]] = None, email_ids: Optional[Iterable[str]] = None,
+                  trace_all: Optional[bool] = None, sample_rate: Optional[float] = None):
+        """
+        Change what is traced at runtime; arguments left as None keep their current value.
+
+        Args:
+            accounts: Account emails whose writes are traced
+            email_ids: Email ids whose writes are traced
+            trace_all: Trace every write regardless of account or id
+            sample_rate: Fraction (0-1) of matching writes that are logged
+        """
+        with self._lock:
+            if accounts is not None:
+                self.accounts = {a for a in accounts if a}
+            if email_ids is not None:
+                self.email_ids = {str(i) for i in email_ids if i}
+            if trace_all is not None:
+                self.trace_all = bool(trace_all)
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+
+    def disable(self):
+        self.configure(accounts=[], email_ids=[], trace_all=False)
+
+    def should_trace(self, account_email: str, email_id: str) -> bool:
+        """Cheap check callers make before building a trace record."""
+        if not self.active:
+            return False
+        if not (self.trace_all or account_email in self.accounts or str(email_id) in self.email_ids):
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @staticmethod
+    def describe(value) -> Dict:
+        """Type and size of a value, without its contents."""
+        description = {'type': type(value).__name__}
+        if isinstance(value, (str, bytes, list, dict, tuple)):
+            description['size'] = len(value)
+        elif isinstance(value, (bool, int, float)) or value is None:
+            description['value'] = value
+        return description
+
+    def trace(self, event: str, account_email: str, email_id: str, fields: Dict, **extra):
+        """
+        Log one structured trace line.
+
+        Args:
+            event: Operation name, e.g. 'save_email'
+            account_email: Account the row belongs to
+            email_id: Row id
+            fields: Column name to value; only types and sizes are logged
+            **extra: Additional scalar context such as rowcount or status
+        """
+        record = {
+            'event': event,
+            'account': account_email,
+            'id': str(email_id),
+            'fields': {name: self.describe(value) for name, value in fields.items()}
+        }
+        record.update(extra)
+        self.traced += 1
+        logger.info(json.dumps(record, default=str))
+
+    def get_status(self) -> Dict:
+        return {
+            'active': self.active,
+            'trace_all': self.trace_all,
+            'accounts': sorted(self.accounts),
+            'email_ids': sorted(self.email_ids),
+            'sample_rate': self.sample_rate,
+            'traced': self.traced
+        }
+
+# Global persistence tracer
+persistence_trace = PersistenceTracer()
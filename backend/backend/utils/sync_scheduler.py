@@ -0,0 +1,188 @@
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..config import Config
+
+# Task types, each with its own per-account cadence
+FETCH = 'fetch'
+READ_SYNC = 'read_sync'
+TASK_TYPES = (FETCH, READ_SYNC)
+
+# Weight of the newest observation in the arrival rate average
+_RATE_SMOOTHING = 0.3
+
+class _AccountSchedule:
+    """Adaptive polling state for one account."""
+
+    def __init__(self, rate: float):
+        self.rate = rate  # smoothed new emails per second
+        self.last_fetch = None
+        self.fetch_interval = None
+        self.idling = False
+
+class SyncScheduler:
+    """
+    Priority queue of per-account sync tasks with adaptive fetch intervals.
+
+    Every (account, task type) pair has one next-run time on a heap. After a
+    fetch the account's arrival rate is updated from the number of new
+    emails and the time since its previous fetch (exponentially smoothed),
+    and the next fetch is planned for when about SYNC_TARGET_EMAILS_PER_FETCH
+    new emails are expected, bounded by SYNC_MIN_INTERVAL and
+    SYNC_MAX_INTERVAL. Busy accounts are therefore polled often and dormant
+    ones slow down with every empty fetch. Read status sync runs on its own
+    SYNC_READ_STATUS_INTERVAL. Accounts covered by an IDLE watcher are
+    polled no more often than IMAP_IDLE_SAFETY_INTERVAL, and run_now()
+    brings a task forward when the server pushes a change.
+
+    Every interval is jittered by +/- SYNC_JITTER and new accounts start at a
+    random offset, so accounts do not log in all at once.
+    """
+
+    def __init__(self, min_interval: float = None, max_interval: float = None,
+                 read_sync_interval: float = None, target_emails: float = None, jitter: float = None,
+                 rng: random.Random = None, clock: Callable[[], float] = None):
+        self.min_interval = min_interval or Config.SYNC_MIN_INTERVAL
+        self.max_interval = max(self.min_interval, max_interval or Config.SYNC_MAX_INTERVAL)
+        self.read_sync_interval = read_sync_interval or Config.SYNC_READ_STATUS_INTERVAL
+        self.target_emails = target_emails or Config.SYNC_TARGET_EMAILS_PER_FETCH
+        self.jitter = Config.SYNC_JITTER if jitter is None else jitter
+        # Injectable so tests can seed the jitter and drive time
+        self._rng = rng or random.Random()
+        self._clock = clock or time.monotonic
+        self._accounts: Dict[str, _AccountSchedule] = {}
+        # (run at, sequence, account email, task type); entries no longer in _next are stale
+        self._heap = []
+        self._next: Dict[tuple, float] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _jittered(self, interval: float) -> float:
+        return interval * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, account_email: str, task: str, run_at: float):
+        key = (account_email, task)
+        current = self._next.get(key)
+        if current is not None and current <= run_at:
+            return
+        self._next[key] = run_at
+        self._seq += 1
+        heapq.heappush(self._heap, (run_at, self._seq, account_email, task))
+
+    def set_accounts(self, account_emails: Iterable[str], now: float = None):
+        """Add newly configured accounts (at a random offset) and drop removed ones."""
+        now = self._clock() if now is None else now
+        account_emails = set(account_emails)
+        with self._lock:
+            for account_email in list(self._accounts):
+                if account_email not in account_emails:
+                    del self._accounts[account_email]
+                    for task in TASK_TYPES:
+                        self._next.pop((account_email, task), None)
+            for account_email in account_emails - set(self._accounts):
+                self._accounts[account_email] = _AccountSchedule(self.target_emails / self.min_interval)
+                for task in TASK_TYPES:
+                    self._push(account_email, task, now + self._rng.uniform(0, self.min_interval))
+
+    def set_idling(self, account_email: str, idling: bool):
+        """Mark whether an IDLE watcher currently reports changes for the account."""
+        with self._lock:
+            state = self._accounts.get(account_email)
+            if state is not None:
+                state.idling = idling
+
+    def run_now(self, account_email: str, task: str):
+        """Bring an account's task forward to now, e.g. after an IDLE push."""
+        with self._lock:
+            if account_email in self._accounts:
+                self._push(account_email, task, self._clock())
+
+    def pop_due(self, now: float = None) -> Dict[str, List[str]]:
+        """
+        Take every task that is due.
+
+        Returns:
+            Dictionary of task type to account emails; the tasks are off the
+            schedule until their completion is recorded with done()
+        """
+        now = self._clock() if now is None else now
+        due = {task: [] for task in TASK_TYPES}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                run_at, _, account_email, task = heapq.heappop(self._heap)
+                key = (account_email, task)
+                if self._next.get(key) != run_at:
+                    continue
+                del self._next[key]
+                due[task].append(account_email)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Monotonic time of the earliest scheduled task, None if nothing is scheduled."""
+        with self._lock:
+            while self._heap:
+                run_at, _, account_email, task = self._heap[0]
+                if self._next.get((account_email, task)) == run_at:
+                    return run_at
+                heapq.heappop(self._heap)
+            return None
+
+    def _fetch_interval(self, state: _AccountSchedule) -> float:
+        if state.rate > 0:
+            interval = self.target_emails / state.rate
+        else:
+            interval = self.max_interval
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        if state.idling:
+            interval = max(interval, Config.IMAP_IDLE_SAFETY_INTERVAL)
+        return interval
+
+    def done(self, account_email: str, task: str, fetched: int = None, now: float = None):
+        """
+        Record a finished task and schedule the account's next run of it.
+
+        Args:
+            account_email: Account the task ran for
+            task: Task type
+            fetched: New emails a successful fetch returned; None if it failed,
+                which keeps the current interval
+        """
+        now = self._clock() if now is None else now
+        with self._lock:
+            state = self._accounts.get(account_email)
+            if state is None:
+                return
+            if task == FETCH:
+                if fetched is not None:
+                    if state.last_fetch is not None and now > state.last_fetch:
+                        observed = fetched / (now - state.last_fetch)
+                        state.rate = _RATE_SMOOTHING * observed + (1 - _RATE_SMOOTHING) * state.rate
+                    state.last_fetch = now
+                state.fetch_interval = self._fetch_interval(state)
+                interval = state.fetch_interval
+            else:
+                interval = self.read_sync_interval
+                if state.idling:
+                    interval = max(interval, Config.IMAP_IDLE_SAFETY_INTERVAL)
+            self._push(account_email, task, now + self._jittered(interval))
+
+    def get_status(self) -> Dict:
+        """Get each account's arrival rate, fetch interval and seconds until each task."""
+        now = self._clock()
+        with self._lock:
+            return {
+                account_email: {
+                    'emails_per_hour': round(state.rate * 3600, 2),
+                    'fetch_interval': round(state.fetch_interval, 1) if state.fetch_interval else None,
+                    'idling': state.idling,
+                    'next_run_in': {
+                        task: round(max(0.0, self._next[(account_email, task)] - now), 1)
+                        if (account_email, task) in self._next else None
+                        for task in TASK_TYPES
+                    }
+                }
+                for account_email, state in self._accounts.items()
+            }
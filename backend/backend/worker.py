@@ -0,0 +1,52 @@
+"""
+Standalone sync worker: runs the background sync engine without the web app.
+
+    python -m backend.worker
+
+Only the sync side is imported (no Flask, flasgger or routes), so the
+worker starts quickly and web and sync processes scale independently.
+Several workers share the accounts through account leases. SIGTERM or
+SIGINT stops taking new work, drains the accounts being synced for up to
+SYNC_SHUTDOWN_TIMEOUT seconds and releases the worker's leases.
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+
+from .config import Config
+from .utils.background_tasks import BackgroundTaskManager
+from .utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def main() -> int:
+    setup_logging()
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, stopping sync worker")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    manager = BackgroundTaskManager()
+    manager.start()
+    logger.info(f"Sync worker running (pid {os.getpid()})")
+
+    # Wake periodically so the signal handler runs promptly in the main thread
+    while not stop.wait(1):
+        pass
+
+    if manager.stop(Config.SYNC_SHUTDOWN_TIMEOUT):
+        logger.info("Sync worker stopped")
+        return 0
+
+    # Syncs still running would keep the interpreter alive; their leases expire on their own
+    logging.shutdown()
+    os._exit(1)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+EXPLAIN the queries DatabaseManager issues and report plans that scan or
+sort the emails table.
+
+Runs a representative read workload (list pages for every folder, access
+controlled lists, dedupe lookups, category views, stats) against the
+configured database, records each SELECT it issues and EXPLAINs it. Exits
+with status 1 when any plan has a problem, so it can gate deploys.
+
+Usage: python scripts/check_query_plans.py [--verbose]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.models.db_models import db_manager, encode_email_cursor
+from backend.models.query_plan import QueryRecorder, check_queries
+
+verbose = '--verbose' in sys.argv
+
+# Sample values so lookups hit real keys
+conn = db_manager.get_connection()
+cursor = conn.cursor(dictionary=True)
+cursor.execute('SELECT email FROM email_accounts LIMIT 1')
+row = cursor.fetchone()
+account = row['email'] if row else 'nobody@example.com'
+cursor.execute('SELECT user_id FROM user_email_access LIMIT 1')
+row = cursor.fetchone()
+user_id = row['user_id'] if row else 0
+cursor.execute('SELECT id, message_id, email_hash, verification_hash, main_category, sub_category, category '
+               'FROM emails LIMIT 1')
+sample = cursor.fetchone() or {}
+conn.close()
+
+main_category = sample.get('main_category') or 'general'
+sub_category = sample.get('sub_category') or 'general'
+
+folders = {
+    'inbox': {'is_trashed': False},
+    'trash': {'is_trashed': True},
+    'archive': {'is_archived': True, 'is_trashed': False},
+    'spam': {'is_spam': True, 'is_trashed': False},
+    'starred': {'is_starred': True, 'is_trashed': False},
+    'unread': {'is_read': False, 'is_trashed': False},
+}
+
+with QueryRecorder(db_manager) as recorder:
+    for filters in folders.values():
+        emails, total, next_cursor = db_manager.get_email_page(filters)
+        if next_cursor:
+            db_manager.get_email_page(filters, cursor=next_cursor)
+        # A page inside the tail of emails without a date
+        db_manager.get_email_page(filters, cursor=encode_email_cursor(None, sample.get('id') or 'none'))
+        db_manager.get_email_page(dict(filters, account=account))
+        db_manager.get_email_page(filters, user_id=user_id)
+    db_manager.get_emails({'is_trashed': False}, page=5)
+    db_manager.get_user_accessible_emails(user_id, {'is_trashed': False}, page=5)
+    db_manager.email_exists(message_id=sample.get('message_id') or '<none>')
+    db_manager.email_exists(email_hash=sample.get('email_hash') or 'none')
+    db_manager.verification_hash_exists(sample.get('verification_hash') or 'none')
+    db_manager.find_existing_email_ids(message_ids=[sample.get('message_id') or '<none>'],
+                                       email_hashes=[sample.get('email_hash') or 'none'])
+    db_manager.get_email_by_id(sample.get('id') or 'none')
+    db_manager.get_read_status_by_uid(account)
+    db_manager.get_emails_by_category(sample.get('category') or 'general')
+    db_manager.get_main_categories_with_counts()
+    db_manager.get_sub_categories_with_counts(main_category)
+    db_manager.get_emails_by_main_category(main_category)
+    db_manager.get_emails_by_main_category(main_category, account_email=account)
+    db_manager.get_emails_by_category_hierarchy(main_category, sub_category)
+    db_manager.get_emails_by_category_hierarchy(main_category, sub_category, account_email=account)
+    db_manager.get_email_stats()
+
+conn = db_manager.get_connection()
+reports = check_queries(conn, recorder.queries)
+conn.close()
+
+failed = 0
+for report in reports:
+    if report['problems']:
+        failed += 1
+    if report['problems'] or verbose:
+        print(f"{'PROBLEM' if report['problems'] else 'ok'}: {report['query'][:200]}")
+        for problem in report['problems']:
+            print(f"    - {problem}")
+        if verbose:
+            for plan_row in report['plan']:
+                print(f"    {plan_row.get('table')}: type={plan_row.get('type')} key={plan_row.get('key')} "
+                      f"rows={plan_row.get('rows')} extra={plan_row.get('Extra')}")
+
+print(f"{len(reports)} queries checked, {failed} with problems")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,17 @@
+"""
+Apply pending schema migrations and print the migration status.
+
+Importing db_manager runs init_database, which applies pending migrations;
+this script makes that an explicit deploy step and shows the result.
+
+Usage: python scripts/migrate.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.models.db_models import db_manager
+
+for migration in db_manager.get_schema_status():
+    state = f"applied {migration['applied_at']}" if migration['applied'] else 'PENDING'
+    print(f"{migration['version']:>4}  {migration['name']:<32} {state}")
@@ -0,0 +1,37 @@
+"""
+Move raw message sources stored inline in emails.raw_data into the raw store.
+
+Safe to re-run and to run while the app is up: each email is switched to
+its raw_ref only after its blob has been written.
+
+Usage: python scripts/migrate_raw_store.py [batch_size]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.models.db_models import db_manager
+from backend.services.raw_store import raw_store
+
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+moved = 0
+failed = set()
+
+while True:
+    rows = [row for row in db_manager.get_inline_raw_data(batch_size + len(failed)) if row[0] not in failed]
+    if not rows:
+        break
+    for email_id, raw_data in rows:
+        try:
+            raw_ref = raw_store.put(raw_data.encode('utf-8'))
+        except Exception as e:
+            print(f"Failed to store raw source of email {email_id}: {e}")
+            failed.add(email_id)
+            continue
+        if db_manager.set_raw_ref(email_id, raw_ref):
+            moved += 1
+        else:
+            failed.add(email_id)
+    print(f"Moved {moved} raw sources so far")
+
+print(f"Done: {moved} moved, {len(failed)} failed")
@@ -1,7 +1,8 @@
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import { Button } from "@/components/ui/button";
 import { Archive, Trash2, Mail, Star, Reply, Forward, MoreHorizontal, Printer, Tag, ArrowLeft, ArrowRight, AlertCircle, Move, Eye, ExternalLink, Circle, User, ChevronDown } from "lucide-react";
 import DOMPurify from "dompurify";
+import { emailAPI } from "@/lib/api";
 
 interface Email {
   id: string;
@@ -9,13 +10,14 @@ interface Email {
   subject: string;
   sender: string;
   date: string;
-  body: string;
+  body?: string;
+  snippet?: string;
   category: string;
   main_category: string;
   sub_category: string;
   is_read: boolean;
   tags: string[];
-  metadata: any;
+  metadata?: any;
   created_at: string;
   is_starred: boolean;
 }
@@ -119,18 +121,32 @@ export default function EmailDrawer({ email, emailList, currentIndex, onClose, o
     console.warn('performAction is not available - this should not happen');
   });
   
+  // List responses only carry a snippet; load the full email when opened
+  const [fullEmail, setFullEmail] = useState<Email | null>(null);
+  useEffect(() => {
+    if (email.body !== undefined) return;
+    let cancelled = false;
+    emailAPI.getEmail(email.id)
+      .then(response => { if (!cancelled) setFullEmail(response.email); })
+      .catch(err => console.error('Failed to load email body:', err));
+    return () => { cancelled = true; };
+  }, [email.id, email.body]);
+  const loaded = fullEmail?.id === email.id ? fullEmail : null;
+  const body = email.body ?? loaded?.body ?? '';
+  const metadata = email.metadata ?? loaded?.metadata;
+
   // Detect if body is HTML or plain text
-  const isHtml = /<\s*\w+.*?>/.test(email.body);
+  const isHtml = /<\s*\w+.*?>/.test(body);
   let displayBody = '';
   if (isHtml) {
-    displayBody = sanitizeHtml(email.body);
+    displayBody = sanitizeHtml(body);
   } else {
-    displayBody = sanitizeHtml(formatPlainText(email.body));
+    displayBody = sanitizeHtml(formatPlainText(body));
   }
   // Gmail-style thread blockquote
   displayBody = threadToBlockquote(displayBody);
   const hasContent = displayBody.trim().length > 0;
-  const attachments = Array.isArray(email.metadata?.attachments) ? email.metadata.attachments : [];
+  const attachments = Array.isArray(metadata?.attachments) ? metadata.attachments : [];
   const formatDate = (date: string) => new Date(date).toLocaleString();
 
   const handlePrint = () => {
@@ -315,22 +331,22 @@ export default function EmailDrawer({ email, emailList, currentIndex, onClose, o
                   <td className="py-1 pr-2 font-medium text-gray-500 align-top">Subject:</td>
                   <td className="py-1 text-gray-800">{email.subject}</td>
                 </tr>
-                {email.metadata?.mailed_by && (
+                {metadata?.mailed_by && (
                   <tr className="hover:bg-gray-100">
                     <td className="py-1 pr-2 font-medium text-gray-500 align-top">Mailed-by:</td>
-                    <td className="py-1 text-gray-800">{email.metadata.mailed_by}</td>
+                    <td className="py-1 text-gray-800">{metadata.mailed_by}</td>
                   </tr>
                 )}
-                {email.metadata?.signed_by && (
+                {metadata?.signed_by && (
                   <tr className="hover:bg-gray-100">
                     <td className="py-1 pr-2 font-medium text-gray-500 align-top">Signed-by:</td>
-                    <td className="py-1 text-gray-800">{email.metadata.signed_by}</td>
+                    <td className="py-1 text-gray-800">{metadata.signed_by}</td>
                   </tr>
                 )}
-                {email.metadata?.security && (
+                {metadata?.security && (
                   <tr className="hover:bg-gray-100">
                     <td className="py-1 pr-2 font-medium text-gray-500 align-top">Security:</td>
-                    <td className="py-1 text-gray-800">{email.metadata.security}</td>
+                    <td className="py-1 text-gray-800">{metadata.security}</td>
                   </tr>
                 )}
               </tbody>
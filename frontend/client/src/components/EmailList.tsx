@@ -13,14 +13,15 @@ interface Email {
   subject: string;
   sender: string;
   date: string;
-  body: string;
+  body?: string;
+  snippet?: string;
   category: string;
   main_category: string;
   sub_category: string;
   is_read: boolean;
   is_starred: boolean;
   tags: string[];
-  metadata: any;
+  metadata?: any;
   created_at: string;
 }
 
@@ -212,7 +213,7 @@ export default function EmailList({ emails, onEmailClick, markAsUnread, performA
                     className={`block w-full truncate whitespace-nowrap overflow-hidden text-ellipsis ${!email.is_read ? 'font-bold' : 'font-normal'} text-gray-900`}
                   >
                     {email.subject}
-                    <span className="text-gray-500 font-normal text-sm"> - {truncateText(email.body, 60)}</span>
+                    <span className="text-gray-500 font-normal text-sm"> - {truncateText(email.snippet ?? email.body ?? '', 60)}</span>
                   </span>
                 </div>
                 {/* Date/Time or Hover Actions */}
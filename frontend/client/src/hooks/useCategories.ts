@@ -225,8 +225,7 @@ export const useBatchCategorization = () => {
 
   const categorizeBatch = async (params?: {
     email_ids?: string[];
-    limit?: number;
-    priority?: 'recent' | 'unread' | 'all';
+    restart?: boolean;
   }) => {
     try {
       setCategorizing(true);
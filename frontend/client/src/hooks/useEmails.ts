@@ -19,11 +19,20 @@ export const useEmails = (initialFilters: Partial<EmailFilters> = {}) => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [filters, setFilters] = useState<Partial<EmailFilters>>(initialFilters);
-  const [pagination, setPagination] = useState({
+  const [pagination, setPagination] = useState<{
+    page: number | null;
+    per_page: number;
+    total: number;
+    pages: number;
+    next_cursor: string | null;
+    has_more: boolean;
+  }>({
     page: 1,
     per_page: 20,
     total: 0,
     pages: 0,
+    next_cursor: null,
+    has_more: false,
   });
   const { user } = useAuth();
 
@@ -71,10 +80,8 @@ export const useEmails = (initialFilters: Partial<EmailFilters> = {}) => {
       setLoading(true);
       setError(null);
       console.log('🔧 useEmails - Fetching emails with filters:', filters);
-      const response = await emailAPI.getEmails({
-        ...filters,
-        page: filters.page || 1,
-      });
+      // Pages are fetched by cursor; filters.cursor is the previous page's next_cursor
+      const response = await emailAPI.getEmails(filters);
       console.log('🔧 useEmails - Received emails:', response.emails.length);
       setEmails(response.emails);
       setPagination(response.pagination);
@@ -193,9 +200,16 @@ export const useEmailFetch = () => {
       setFetching(true);
       setError(null);
       
-      const response = await emailAPI.fetchEmails({ limit });
-      setResult(response);
-      return response;
+      // The fetch runs as a background job; poll it until it finishes
+      const { job_id } = await emailAPI.fetchEmails({ limit });
+      let job = await emailAPI.getFetchJob(job_id);
+      while (job.status !== 'completed') {
+        setResult(job);
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = await emailAPI.getFetchJob(job_id);
+      }
+      setResult(job);
+      return job;
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : 'Failed to fetch emails';
       setError(errorMessage);
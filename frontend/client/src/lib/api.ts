@@ -77,6 +77,7 @@ export const authAPI = {
 export const emailAPI = {
   // Get all emails with filtering and pagination
   getEmails: async (params: {
+    cursor?: string;
     page?: number;
     per_page?: number;
     category?: string;
@@ -144,14 +145,19 @@ export const emailAPI = {
     });
   },
 
+  // Get progress of a queued email fetch
+  getFetchJob: async (jobId: string) => {
+    return apiCall(`/emails/fetch/${jobId}`);
+  },
+
   // Get email accounts
   getAccounts: async () => {
     return apiCall('/emails/accounts');
   },
 
-  // Test email accounts
-  testAccounts: async () => {
-    return apiCall('/emails/accounts/test', {
+  // Test email accounts (results cached by the server are reused unless refresh is set)
+  testAccounts: async (refresh = false) => {
+    return apiCall(`/emails/accounts/test${refresh ? '?refresh=true' : ''}`, {
       method: 'POST',
     });
   },
@@ -163,11 +169,10 @@ export const emailAPI = {
     });
   },
 
-  // Batch categorize emails
+  // Categorize specific emails, or start the background re-categorization job
   categorizeBatch: async (params: {
     email_ids?: string[];
-    limit?: number;
-    priority?: 'recent' | 'unread' | 'all';
+    restart?: boolean;
   } = {}) => {
     return apiCall('/emails/categorize/batch', {
       method: 'POST',
@@ -175,6 +180,18 @@ export const emailAPI = {
     });
   },
 
+  // Get background re-categorization progress
+  getCategorizationStatus: async () => {
+    return apiCall('/emails/categorize/status');
+  },
+
+  // Pause background re-categorization
+  stopCategorization: async () => {
+    return apiCall('/emails/categorize/stop', {
+      method: 'POST',
+    });
+  },
+
   // Get uncategorized emails
   getUncategorized: async (params: {
     limit?: number;
@@ -271,15 +288,15 @@ export const settingsAPI = {
   },
 
   // Test email account
-  testEmailAccount: async (email: string) => {
-    return apiCall(`/settings/email-accounts/${encodeURIComponent(email)}/test`, {
+  testEmailAccount: async (email: string, refresh = false) => {
+    return apiCall(`/settings/email-accounts/${encodeURIComponent(email)}/test${refresh ? '?refresh=true' : ''}`, {
       method: 'POST',
     });
   },
 
   // Test all email accounts
-  testAllEmailAccounts: async () => {
-    return apiCall('/settings/email-accounts/test-all', {
+  testAllEmailAccounts: async (refresh = false) => {
+    return apiCall(`/settings/email-accounts/test-all${refresh ? '?refresh=true' : ''}`, {
       method: 'POST',
     });
   },
@@ -318,18 +335,32 @@ export const adminAPI = {
     return apiCall('/admin/categories');
   },
 
-  // Update category rules (admin only)
-  updateCategoryRules: async (category: string, rules: {
-    keywords: string[];
-    sender_patterns: string[];
-    priority: number;
+  // Update one category's rule; publishes a new rule set version (admin only)
+  updateCategoryRules: async (category: string, rule: {
+    match: Record<string, string[]>;
+    subs?: { name: string; match: Record<string, string[]> }[];
+    default?: string;
+    position?: number;
   }) => {
     return apiCall(`/admin/categories/${category}`, {
       method: 'PUT',
-      body: JSON.stringify(rules),
+      body: JSON.stringify(rule),
     });
   },
 
+  // Publish a complete category rule list as a new version (admin only)
+  replaceCategoryRules: async (rules: any[], baseVersion?: number) => {
+    return apiCall('/admin/categories', {
+      method: 'PUT',
+      body: JSON.stringify({ rules, base_version: baseVersion }),
+    });
+  },
+
+  // Get one stored category rule set version (admin only)
+  getCategoryRulesVersion: async (version: number) => {
+    return apiCall(`/admin/categories/versions/${version}`);
+  },
+
   // Delete category (admin only)
   deleteCategory: async (category: string) => {
     return apiCall(`/admin/categories/${category}`, {
@@ -337,13 +368,6 @@ export const adminAPI = {
     });
   },
 
-  // Reset categorization stats (admin only)
-  resetCategorizationStats: async () => {
-    return apiCall('/admin/categories/stats/reset', {
-      method: 'POST',
-    });
-  },
-
   // Get system status (admin only)
   getSystemStatus: async () => {
     return apiCall('/admin/system/status');
@@ -454,6 +478,7 @@ export const emailAccountAPI = {
 
 export const emailFetchAPI = {
   fetchEmails: emailAPI.fetchEmails,
+  getFetchJob: emailAPI.getFetchJob,
 };
 
 export const emailStatsAPI = {
@@ -470,6 +495,8 @@ export const categoryAPI = {
 
 export const categorizationAPI = {
   categorizeBatch: emailAPI.categorizeBatch,
+  getCategorizationStatus: emailAPI.getCategorizationStatus,
+  stopCategorization: emailAPI.stopCategorization,
   getUncategorizedEmails: emailAPI.getUncategorized,
 };
 
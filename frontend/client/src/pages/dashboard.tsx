@@ -44,6 +44,8 @@ const Dashboard: React.FC = () => {
   const [showSettings, setShowSettings] = useState(false);
   const [showNotifications, setShowNotifications] = useState(false);
   const [page, setPage] = useState(1);
+  // cursors[i] is the next_cursor that loads page i + 2
+  const [cursors, setCursors] = useState<string[]>([]);
   const [perPage, setPerPage] = useState(25);
   const [selectedAccount, setSelectedAccount] = useState<string>('all');
   const [accounts, setAccounts] = useState<{ email: string; active: boolean }[]>([]);
@@ -58,7 +60,7 @@ const Dashboard: React.FC = () => {
             selectedCategory === 'unread' ? 'unread' : 'inbox',
     account: selectedAccount === 'all' ? undefined : selectedAccount,
     search: searchQuery || undefined,
-    page,
+    cursor: page > 1 ? cursors[page - 2] : undefined,
     per_page: perPage,
   };
   
@@ -462,9 +464,14 @@ const Dashboard: React.FC = () => {
               <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" fill="none" viewBox="0 0 24 24" stroke="currentColor"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M15 19l-7-7 7-7" /></svg>
             </button>
             <button
-              onClick={() => page < pagination.pages && setPage(page + 1)}
-              disabled={page === pagination.pages}
-              className={`p-2 rounded hover:bg-gray-100 ${page === pagination.pages ? 'opacity-50 cursor-not-allowed' : ''}`}
+              onClick={() => {
+                const nextCursor = pagination.next_cursor;
+                if (!nextCursor) return;
+                setCursors(prev => [...prev.slice(0, page - 1), nextCursor]);
+                setPage(page + 1);
+              }}
+              disabled={!pagination.has_more}
+              className={`p-2 rounded hover:bg-gray-100 ${!pagination.has_more ? 'opacity-50 cursor-not-allowed' : ''}`}
               aria-label="Next page"
             >
               <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" fill="none" viewBox="0 0 24 24" stroke="currentColor"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M9 5l7 7-7 7" /></svg>
@@ -4,18 +4,20 @@ export interface Email {
   subject: string;
   sender: string;
   date: string;
-  body: string;
+  body?: string;     // only on GET /emails/:id
+  snippet?: string;  // list responses carry a preview instead of the body
   category: string;
   main_category: string;
   sub_category: string;
   is_read: boolean;
   is_starred: boolean;
   tags: string[];
-  metadata: any;
+  metadata?: any;
   created_at: string;
 }
 
 export interface EmailFilters {
+  cursor?: string;
   page?: number;
   per_page?: number;
   category?: string;